@@ -0,0 +1,30 @@
+"""
+管理端點的權限檢查
+
+管理端點需在標頭 X-Admin-Token 帶入與 ADMIN_TOKEN 設定相同的權杖；
+未設定 ADMIN_TOKEN 時一律拒絕。
+"""
+
+import hmac
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+
+def token_matches(config, provided):
+    """provided 是否為有效的管理權杖（不需要請求情境，WSGI 中介層也可使用）"""
+    token = config.get('ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(provided or '', token)
+
+
+def is_admin_request():
+    return token_matches(current_app.config, request.headers.get('X-Admin-Token', ''))
+
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': '需要管理員權限'}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -1,10 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload
 from flask_cors import CORS
-from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError
-from linebot.models import MessageEvent, TextMessage, TextSendMessage
 import pandas as pd
+try:
+    from linebot import LineBotApi, WebhookHandler
+    from linebot.exceptions import InvalidSignatureError
+    from linebot.models import MessageEvent, TextMessage, TextSendMessage
+except ImportError:  # 未安裝 line-bot-sdk 時不提供 Line Bot Webhook
+    LineBotApi = None
 import os
 import logging
 from dotenv import load_dotenv
@@ -32,8 +36,9 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
 # Line Bot 設定
-line_bot_api = LineBotApi(os.getenv('LINE_CHANNEL_ACCESS_TOKEN'))
-handler = WebhookHandler(os.getenv('LINE_CHANNEL_SECRET'))
+if LineBotApi:
+    line_bot_api = LineBotApi(os.getenv('LINE_CHANNEL_ACCESS_TOKEN'))
+    handler = WebhookHandler(os.getenv('LINE_CHANNEL_SECRET'))
 
 # 資料模型
 class Tournament(db.Model):
@@ -96,7 +101,11 @@ class Group(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
     group_name = db.Column(db.String(10))
-    participants = db.relationship('Participant', backref='group', lazy=True)
+    # 組員依差點排序（沒有差點的排最後），由資料庫排序，不必每次在 Python 中排序
+    participants = db.relationship(
+        'Participant', backref='group', lazy=True,
+        order_by=[Participant.handicap.is_(None), Participant.handicap]
+    )
 
     def to_dict(self):
         return {
@@ -111,9 +120,16 @@ class Group(db.Model):
                 'handicap': p.handicap,
                 'group_number': p.group_number,
                 'check_in_status': p.check_in_status
-            } for p in sorted(self.participants, key=lambda x: x.handicap if x.handicap is not None else float('inf'))]
+            } for p in self.participants]
         }
 
+def groups_with_participants(tournament_id):
+    """賽事的所有組別與組員，以單一 JOIN 查詢一次載入（組員已依差點排序）"""
+    return Group.query.filter_by(tournament_id=tournament_id)\
+        .options(joinedload(Group.participants))\
+        .order_by(Group.group_name)\
+        .all()
+
 # 創建資料庫表格
 with app.app_context():
     # 刪除所有現有表格
@@ -521,9 +537,7 @@ def auto_group(tournament_id):
 @app.route('/api/tournaments/<int:tournament_id>/groups', methods=['GET'])
 def get_groups(tournament_id):
     try:
-        groups = Group.query.filter_by(tournament_id=tournament_id)\
-            .order_by(Group.group_name)\
-            .all()
+        groups = groups_with_participants(tournament_id)
             
         return jsonify([{
             'id': group.id,
@@ -536,7 +550,7 @@ def get_groups(tournament_id):
                 'handicap': p.handicap,
                 'group_number': p.group_number,
                 'check_in_status': p.check_in_status
-            } for p in sorted(group.participants, key=lambda x: x.handicap if x.handicap is not None else float('inf'))]
+            } for p in group.participants]
         } for group in groups]), 200
         
     except Exception as e:
@@ -627,8 +641,8 @@ def move_participant(participant_id):
             if target_group.tournament_id != participant.tournament_id:
                 return jsonify({'error': '不能移動到不同賽事的組別'}), 400
             
-            # 檢查目標組別人數是否已達上限
-            if len(target_group.participants) >= 4:
+            # 檢查目標組別人數是否已達上限（只計數，不載入組員）
+            if Participant.query.filter_by(group_id=target_group_id).count() >= 4:
                 return jsonify({'error': '目標組別已達4人上限'}), 400
         
         # 更新參賽者的組別
@@ -639,11 +653,11 @@ def move_participant(participant_id):
         warning = None
         if old_group_id:
             old_group = Group.query.get(old_group_id)
-            if old_group and len(old_group.participants) < 3:
+            if old_group and Participant.query.filter_by(group_id=old_group_id).count() < 3:
                 warning = f'警告：組別 {old_group.group_name} 現在少於3人'
         
         # 返回更新後的組別資訊
-        groups = Group.query.filter_by(tournament_id=participant.tournament_id).all()
+        groups = groups_with_participants(participant.tournament_id)
         return jsonify({
             'groups': [g.to_dict() for g in groups],
             'warning': warning
@@ -677,9 +691,7 @@ def save_groups(tournament_id):
 @app.route('/api/tournaments/<int:tournament_id>/check-in', methods=['GET'])
 def get_check_in_list(tournament_id):
     try:
-        groups = Group.query.filter_by(tournament_id=tournament_id)\
-            .order_by(Group.group_name)\
-            .all()
+        groups = groups_with_participants(tournament_id)
             
         check_in_list = []
         for group in groups:
@@ -689,8 +701,8 @@ def get_check_in_list(tournament_id):
                 'members': []
             }
             
-            # 按照差點排序組員
-            sorted_participants = sorted(group.participants, key=lambda x: x.handicap if x.handicap is not None else float('inf'))
+            # 組員已依差點排序
+            sorted_participants = group.participants
             
             # 確保每組最多4個成員
             for i in range(4):
@@ -732,33 +744,34 @@ def update_check_in_status(participant_id):
         return jsonify({'error': f'更新報到狀態失敗: {str(e)}'}), 500
 
 # Line Bot Webhook
-@app.route("/callback", methods=['POST'])
-def callback():
-    signature = request.headers['X-Line-Signature']
-    body = request.get_data(as_text=True)
-    
-    try:
-        handler.handle(body, signature)
-    except InvalidSignatureError:
-        return 'Invalid signature', 400
-    
-    return 'OK'
+if LineBotApi:
+    @app.route("/callback", methods=['POST'])
+    def callback():
+        signature = request.headers['X-Line-Signature']
+        body = request.get_data(as_text=True)
 
-@handler.add(MessageEvent, message=TextMessage)
-def handle_message(event):
-    text = event.message.text
-    
-    # 這裡可以加入處理 Line 訊息的邏輯
-    if text.startswith('查詢賽事'):
-        tournaments = Tournament.query.all()
-        reply_text = '目前賽事：\n' + '\n'.join([f"{t.name} ({t.date})" for t in tournaments])
-    else:
-        reply_text = '無法理解您的指令'
-    
-    line_bot_api.reply_message(
-        event.reply_token,
-        TextSendMessage(text=reply_text)
-    )
+        try:
+            handler.handle(body, signature)
+        except InvalidSignatureError:
+            return 'Invalid signature', 400
+
+        return 'OK'
+
+    @handler.add(MessageEvent, message=TextMessage)
+    def handle_message(event):
+        text = event.message.text
+
+        # 這裡可以加入處理 Line 訊息的邏輯
+        if text.startswith('查詢賽事'):
+            tournaments = Tournament.query.all()
+            reply_text = '目前賽事：\n' + '\n'.join([f"{t.name} ({t.date})" for t in tournaments])
+        else:
+            reply_text = '無法理解您的指令'
+
+        line_bot_api.reply_message(
+            event.reply_token,
+            TextSendMessage(text=reply_text)
+        )
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -30,90 +30,222 @@ V1.2 - 完善分組表格式，加入性別標示
 """
 
 import sys
-import io
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-
 import os
+import json
 from datetime import datetime
 from io import BytesIO
-import pandas as pd
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from flask import Flask, request, jsonify, send_file
+import click
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file
 from flask_cors import CORS
-from sqlalchemy import func
+from sqlalchemy import func, case
 from config import config
-from extensions import db, init_extensions
+from extensions import db, init_extensions, read_only
+from db_engine import pool_metrics
+from admin import admin_required
+from health import readiness
+from profiling import RequestProfiler
+from querylog import slow_query_log
+from groups_view import groups_json
+from snapshots import snapshot_cache
+from streaming import json_stream_response
+from compression import compressor, cache_compressed
+from coalescing import move_coalescer, STALE
+from group_stats import group_stats, delete_group_stats, check_group_stats, rebuild_group_stats
+from models import Tournament, Participant, Pairing, RegistrationCounter, GroupPosition, Job
+from grouping import GROUP_SIZE, sort_and_chunk, pairing_aware_groups, group_cost
+from pairing import refresh_pairing_index, load_pairing_matrix
+from registration import allocate_registration_numbers, peek_next_registration_number
+import operations
+from operations import (
+    NotFoundError, StaleOrderError, touch_tournament, bump_revision,
+    assign_order_keys, next_order_key, set_group_positions, ordered_group_codes,
+    move_group_to, schedule_rebalance_if_needed
+)
+from ordering import key_between
+from roster_io import (
+    read_roster, replace_roster, read_pregroups, apply_pregroups,
+    ordered_for_export, build_groups_workbook, build_groups_diagram
+)
+from jobs import jobs, import_participants_job, export_groups_job, bulk_import_job, XLSX_MIMETYPE
+from bulk_import import collect_sheets, bulk_import, format_report
 import re
-import tempfile
-
-# 創建應用程式
-app = Flask(__name__)
-
-# 獲取環境配置
-env = os.getenv('FLASK_ENV', 'development').strip()
-app.config.from_object(config[env])
-
-# 確保實例文件夾存在
-if not os.path.exists('instance'):
-    os.makedirs('instance')
-
-print(f"數據庫路徑: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
-# 初始化擴展
-init_extensions(app)
+# 所有路由註冊在藍圖上，由 create_app() 掛載到應用程式
+bp = Blueprint('api', __name__, cli_group=None)
 
-# 健康檢查端點
-@app.route('/health', methods=['GET'])
-def health_check():
-    app.logger.info('收到健康檢查請求')
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
-    }), 200
+ALLOWED_ORIGINS = ["http://localhost:3000", "https://gold-tawny.vercel.app"]
 
-# 配置 CORS
-CORS(app, resources={
+CORS_RESOURCES = {
     r"/api/*": {
-        "origins": ["http://localhost:3000", "https://gold-tawny.vercel.app"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Accept", "Authorization"],
+        "allow_headers": ["Content-Type", "Accept", "Authorization", "X-Admin-Token", "X-Profile"],
         "supports_credentials": True,
         "max_age": 3600,
-        "expose_headers": ["Content-Type", "Content-Length", "Content-Disposition"]
+        "expose_headers": ["Content-Type", "Content-Length", "Content-Disposition", "X-Total-Count", "X-Page", "X-Per-Page", "X-Profile-Id", "X-Revision", "ETag"]
     },
     r"/health": {
         "origins": "*",
         "methods": ["GET"],
         "max_age": 3600
     }
-})
+}
+
+
+def _configure_console():
+    """Windows 主控台預設編碼無法輸出中文，改以 UTF-8 輸出（不替換 stdout/stderr 物件）"""
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8', errors='replace')
+
+
+def create_app(config_name=None, test_config=None):
+    """
+    建立應用程式
+
+    不連線資料庫、不啟動執行緒（連線池與背景工作執行緒都在第一次使用時才建立），
+    可搭配 gunicorn --preload 在主程序中建立後再 fork 給各 worker。
+    """
+    _configure_console()
+
+    # 創建應用程式
+    app = Flask(__name__)
+
+    # 獲取環境配置
+    env = (config_name or os.getenv('FLASK_ENV', 'development')).strip()
+    app.config.from_object(config[env])
+    if test_config:
+        app.config.update(test_config)
+
+    # 確保實例文件夾存在
+    os.makedirs('instance', exist_ok=True)
+
+    # 初始化擴展
+    init_extensions(app)
+    jobs.init_app(app)
+    slow_query_log.init_app(app)
+    snapshot_cache.init_app(app)
+    compressor.init_app(app)
+    move_coalescer.init_app(app)
+
+    # 配置 CORS
+    CORS(app, resources=CORS_RESOURCES)
+
+    app.register_blueprint(bp)
+
+    # 管理員可指定剖析單一請求（未指定時幾乎沒有額外負擔）
+    RequestProfiler(app)
+    return app
+
+
+def __getattr__(name):
+    """相容 `gunicorn app:app` 與 FLASK_APP=app.py：第一次存取 app 時才建立應用程式"""
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 健康檢查端點
+# 存活檢查不碰資料庫、不寫日誌，探測頻繁也沒有額外負擔
+@bp.route('/health', methods=['GET'])
+@bp.route('/health/live', methods=['GET'])
+def health_check():
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+# 就緒檢查：資料庫探測（結果短暫快取）、連線池使用率、最後一次寫入距今時間；寫入鎖被長時間持有時為 degraded，仍回應 200
+@bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    ready, checks = readiness(current_app.config)
+    return jsonify({
+        'status': ('degraded' if checks['degraded'] else 'ready') if ready else 'not_ready',
+        'timestamp': datetime.now().isoformat(),
+        'checks': checks
+    }), 200 if ready else 503
+
+# 連線池統計（取得連線等待時間與使用率）
+@bp.route('/api/v1/admin/metrics/pool', methods=['GET'])
+@admin_required
+def get_pool_metrics():
+    metrics = pool_metrics(db.engine)
+    if metrics is None:
+        return jsonify({'error': '目前的連線池不支援統計'}), 404
+    return jsonify(metrics)
+
+# 賽事快照快取統計（命中率與重建時間）
+@bp.route('/api/v1/admin/metrics/snapshots', methods=['GET'])
+@admin_required
+def get_snapshot_metrics():
+    return jsonify(snapshot_cache.stats())
+
+# 回應壓縮統計
+@bp.route('/api/v1/admin/metrics/compression', methods=['GET'])
+@admin_required
+def get_compression_metrics():
+    return jsonify(compressor.stats)
+
+# 拖曳移動合併統計
+@bp.route('/api/v1/admin/metrics/moves', methods=['GET'])
+@admin_required
+def get_move_metrics():
+    return jsonify(move_coalescer.stats)
+
+# 慢查詢紀錄（含執行計畫）；DELETE 清除
+@bp.route('/api/v1/admin/slow-queries', methods=['GET', 'DELETE'])
+@admin_required
+def slow_queries():
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+        return jsonify({'message': '已清除慢查詢紀錄'})
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'threshold_ms': slow_query_log.threshold_ms,
+        'queries': slow_query_log.recent(limit)
+    })
+
+# 最近的請求剖析結果（X-Profile 標頭產生）
+@bp.route('/api/v1/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    return jsonify(current_app.extensions['profiler'].list_profiles())
+
+# 下載剖析結果（.prof 或 .folded）
+@bp.route('/api/v1/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    path = current_app.extensions['profiler'].profile_path(profile_id)
+    if path is None:
+        return jsonify({'error': '找不到剖析結果'}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=os.path.basename(path))
 
 # 確保所有響應都包含 CORS 頭部
-@app.after_request
+@bp.after_app_request
 def add_cors_headers(response):
     origin = request.headers.get('Origin')
-    allowed_origins = ["http://localhost:3000", "https://gold-tawny.vercel.app"]
     
-    if origin in allowed_origins:
+    if origin in ALLOWED_ORIGINS:
         response.headers['Access-Control-Allow-Origin'] = origin
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Accept, Authorization'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Accept, Authorization, X-Admin-Token, X-Profile'
         response.headers['Access-Control-Allow-Credentials'] = 'true'
         response.headers['Access-Control-Max-Age'] = '3600'
-        response.headers['Access-Control-Expose-Headers'] = 'Content-Type, Content-Length, Content-Disposition'
+        response.headers['Access-Control-Expose-Headers'] = 'Content-Type, Content-Length, Content-Disposition, X-Total-Count, X-Page, X-Per-Page, X-Profile-Id, X-Revision, ETag'
         
     return response
 
 # 處理 OPTIONS 請求
-@app.route('/api/v1/tournaments', methods=['OPTIONS'])
+@bp.route('/api/v1/tournaments', methods=['OPTIONS'])
 def handle_options():
     response = jsonify({'status': 'ok'})
     return response
 
 # 獲取賽事列表
-@app.route('/api/v1/tournaments', methods=['GET'])
+@bp.route('/api/v1/tournaments', methods=['GET'])
+@read_only
 def get_tournaments():
     try:
         print('================== 請求開始 ==================')
@@ -126,25 +258,70 @@ def get_tournaments():
         print('============================================')
         
         print("收到獲取賽事列表請求")
-        tournaments = Tournament.query.all()
+        query = db.session.query(Tournament.id, Tournament.name, Tournament.date)
+
+        # 日期區間篩選
+        if request.args.get('date_from'):
+            query = query.filter(Tournament.date >= datetime.strptime(request.args['date_from'], '%Y-%m-%d').date())
+        if request.args.get('date_to'):
+            query = query.filter(Tournament.date <= datetime.strptime(request.args['date_to'], '%Y-%m-%d').date())
+
+        query = query.order_by(Tournament.id)
+
+        # 分頁（未指定 page 時回傳全部）
+        total = None
+        if request.args.get('page'):
+            page = max(int(request.args['page']), 1)
+            per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
+            total = query.count()
+            query = query.offset((page - 1) * per_page).limit(per_page)
+
+        tournaments = query.all()
+
+        # 只對本頁的賽事做一次 GROUP BY 統計人數
+        counts = {}
+        if tournaments:
+            rows = db.session.query(
+                Participant.tournament_id,
+                func.count(Participant.id),
+                func.sum(case((Participant.check_in_status == 'checked_in', 1), else_=0)),
+                func.count(func.distinct(case((Participant.group_code != '未分組', Participant.group_code)))),
+                func.sum(case((Participant.gender.in_(('F', '女')), 1), else_=0))
+            ).filter(
+                Participant.tournament_id.in_([t.id for t in tournaments])
+            ).group_by(Participant.tournament_id).all()
+            counts = {row[0]: row[1:] for row in rows}
+
         result = []
         for tournament in tournaments:
+            participant_count, checked_in_count, group_count, female_count = counts.get(tournament.id, (0, 0, 0, 0))
             result.append({
                 'id': tournament.id,
                 'name': tournament.name,
-                'date': tournament.date.strftime('%Y-%m-%d') if tournament.date else None
+                'date': tournament.date.strftime('%Y-%m-%d') if tournament.date else None,
+                'participant_count': participant_count,
+                'checked_in_count': checked_in_count or 0,
+                'group_count': group_count,
+                'female_count': female_count or 0
             })
-        print(f"返回賽事列表: {result}")
+        print(f"返回賽事列表: {len(result)} 筆")
         
         response = jsonify(result)
+        if total is not None:
+            response.headers['X-Total-Count'] = str(total)
+            response.headers['X-Page'] = str(page)
+            response.headers['X-Per-Page'] = str(per_page)
         return response
         
+    except ValueError as e:
+        return jsonify({'error': f'查詢參數錯誤：{str(e)}'}), 400
+
     except Exception as e:
         print(f"獲取賽事列表時發生錯誤: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 # 建立新賽事
-@app.route('/api/v1/tournaments', methods=['POST'])
+@bp.route('/api/v1/tournaments', methods=['POST'])
 def create_tournament():
     try:
         print('================== 請求開始 ==================')
@@ -182,7 +359,8 @@ def create_tournament():
         return jsonify({'error': str(e)}), 500
 
 # 獲取賽事的參賽者列表
-@app.route('/api/v1/tournaments/<int:tournament_id>/participants', methods=['GET'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants', methods=['GET'])
+@read_only
 def get_tournament_participants(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -194,17 +372,30 @@ def get_tournament_participants(tournament_id):
             print(f'  {name}: {value}')
         print('============================================')
         
-        participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.display_order).all()
-        print(f"\n獲取賽事 {tournament_id} 的參賽者列表")
-        print(f"總共找到 {len(participants)} 位參賽者")
-        
-        result = []
-        for p in participants:
-            participant_dict = p.to_dict()
-            print(f"參賽者資料：姓名={p.name}, 預分組編號={p.pre_group_code}")
-            result.append(participant_dict)
-            
-        return jsonify(result)
+        roster = Participant.query.filter_by(tournament_id=tournament_id).order_by(
+            Participant.order_key, Participant.display_order, Participant.id
+        )
+
+        # ?stream=1：不經快照，分批讀取並逐筆寫出（記憶體用量與人數無關）
+        if request.args.get('stream') == '1':
+            return json_stream_response(roster, Participant.to_dict)
+
+        def build():
+            participants = roster.all()
+            print(f"\n獲取賽事 {tournament_id} 的參賽者列表")
+            print(f"總共找到 {len(participants)} 位參賽者")
+            return json.dumps([p.to_dict() for p in participants], ensure_ascii=False).encode('utf-8')
+
+        # 同一版本的名單只查詢、序列化一次
+        cached = snapshot_cache.view(tournament_id, 'participants', build)
+        if cached is None:
+            return jsonify([])
+
+        revision, body = cached
+        cache_compressed('participants', tournament_id, revision)
+        response = Response(body, mimetype='application/json')
+        response.headers['X-Revision'] = str(revision)
+        return response
         
     except Exception as e:
         print(f"獲取參賽者列表時發生錯誤：{str(e)}")
@@ -212,8 +403,68 @@ def get_tournament_participants(tournament_id):
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+# 多場賽事（例如整季）的參賽者，以串流 JSON 回應
+# ?tournament_id=1&tournament_id=2 指定賽事，?from=、?to=（YYYY-MM-DD）限定賽事日期
+@bp.route('/api/v1/participants', methods=['GET'])
+@read_only
+def get_participants_across_tournaments():
+    try:
+        query = Participant.query.join(Tournament, Participant.tournament_id == Tournament.id)
+
+        tournament_ids = request.args.getlist('tournament_id', type=int)
+        if tournament_ids:
+            query = query.filter(Participant.tournament_id.in_(tournament_ids))
+        try:
+            if request.args.get('from'):
+                query = query.filter(Tournament.date >= datetime.strptime(request.args['from'], '%Y-%m-%d').date())
+            if request.args.get('to'):
+                query = query.filter(Tournament.date <= datetime.strptime(request.args['to'], '%Y-%m-%d').date())
+        except ValueError:
+            return jsonify({'error': '日期格式應為 YYYY-MM-DD'}), 400
+
+        query = query.order_by(
+            Tournament.date, Tournament.id,
+            Participant.order_key, Participant.display_order, Participant.id
+        )
+        return json_stream_response(query, Participant.to_dict)
+
+    except Exception as e:
+        print(f"獲取參賽者列表時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 報到畫面的分組檢視：依組別順序的組員、人數、平均差點與報到進度
+@bp.route('/api/v1/tournaments/<int:tournament_id>/groups', methods=['GET'])
+@read_only
+def get_tournament_groups(tournament_id):
+    try:
+        cached = snapshot_cache.view(tournament_id, 'groups', lambda: groups_json(tournament_id))
+        if cached is None:
+            return jsonify({'error': '找不到賽事'}), 404
+
+        revision, body = cached
+        cache_compressed('groups', tournament_id, revision)
+        response = Response(body, mimetype='application/json')
+        response.headers['X-Revision'] = str(revision)
+        response.set_etag(f'{tournament_id}-{revision}')
+        return response.make_conditional(request)
+
+    except Exception as e:
+        print(f"獲取分組資料時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 各組統計：人數、已報到、女性人數與平均差點（只讀取組數那麼多列）
+@bp.route('/api/v1/tournaments/<int:tournament_id>/group-stats', methods=['GET'])
+@read_only
+def get_group_stats(tournament_id):
+    try:
+        return jsonify([stat.to_dict() for stat in group_stats(tournament_id)])
+
+    except Exception as e:
+        print(f"獲取分組統計時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # 匯入參賽者
-@app.route('/api/v1/tournaments/<int:tournament_id>/participants/import', methods=['POST'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/import', methods=['POST'])
 def import_participants(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -232,66 +483,34 @@ def import_participants(tournament_id):
         if file.filename == '':
             return jsonify({'error': '未選擇檔案'}), 400
             
-        if not file.filename.endswith('.xlsx'):
+        if file.filename.lower().endswith('.xls'):
+            return jsonify({'error': '不支援舊版 Excel 檔案 (.xls)，請另存為 .xlsx 後再上傳'}), 400
+        if not file.filename.lower().endswith('.xlsx'):
             return jsonify({'error': '請上傳 Excel 檔案 (.xlsx)'}), 400
 
-        # 讀取 Excel 檔案
-        df = pd.read_excel(file)
-        print(f"Excel 欄位：{df.columns.tolist()}")
-        print("Excel 資料預覽：")
-        print(df.head())
-        
-        # 檢查必要欄位
-        required_columns = ['姓名', '差點']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return jsonify({'error': f'缺少必要欄位：{", ".join(missing_columns)}'}), 400
+        if not Tournament.query.get(tournament_id):
+            return jsonify({'error': '找不到賽事'}), 404
 
-        # 清除既有的參賽者資料
-        Participant.query.filter_by(tournament_id=tournament_id).delete()
-        
-        # 匯入新的參賽者資料
-        for index, row in df.iterrows():
-            # 解析差點
-            handicap = parse_handicap(row['差點'])
-            
-            # 解析性別（如果有）
-            gender = row.get('性別', '男')
-            if pd.isna(gender) or str(gender).strip() == '':
-                gender = '男'
-            
-            # 直接處理預分組編號
-            pre_group_code = None
-            if '預分組編號' in df.columns:
-                raw_value = row['預分組編號']
-                print(f"\n第 {index+1} 筆資料的預分組編號原始值：{raw_value}，類型：{type(raw_value)}")
-                
-                if not pd.isna(raw_value):  # 檢查是否為 NaN
-                    if isinstance(raw_value, (int, float)):
-                        pre_group_code = str(int(raw_value))  # 轉換數字為字串
-                    else:
-                        pre_group_code = str(raw_value).strip()  # 其他類型轉換為字串
-                    
-                    if pre_group_code == '' or pre_group_code.lower() == 'nan':
-                        pre_group_code = None
-                    
-                print(f"處理後的預分組編號：{pre_group_code}")
-            
-            # 建立參賽者
-            participant = Participant(
-                tournament_id=tournament_id,
-                name=clean_text(str(row['姓名'])),
-                gender=gender,
-                handicap=handicap,
-                member_number=str(row.get('會員編號', '')),
-                registration_number=f'A{index+1:02d}',
-                pre_group_code=pre_group_code,
-                display_order=index
-            )
-            db.session.add(participant)
+        # ?async=1：保存上傳檔案後改由背景工作匯入，立即回傳工作編號
+        if request.args.get('async') == '1':
+            job_id = jobs.new_job_id()
+            upload_path = jobs.upload_path(job_id, '.xlsx')
+            file.save(upload_path)
+            job = jobs.submit('import_participants', import_participants_job, tournament_id, upload_path,
+                              tournament_id=tournament_id, job_id=job_id)
+            return jsonify(job.to_dict()), 202, {'Location': f'/api/v1/jobs/{job.id}'}
+
+        # 讀取 Excel 檔案並檢查必要欄位
+        try:
+            rows = read_roster(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # 以新的名單取代既有的參賽者資料
+        imported = replace_roster(tournament_id, rows)
         
         db.session.commit()
-        return jsonify({'message': '匯入成功'}), 200
+        return jsonify({'message': '匯入成功', 'imported': imported}), 200
         
     except Exception as e:
         db.session.rollback()
@@ -300,8 +519,93 @@ def import_participants(tournament_id):
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+# 匯入預編組表：以姓名或會員編號比對，一次寫入所有參賽者的預編組代號
+@bp.route('/api/v1/tournaments/<int:tournament_id>/pregroups/import', methods=['POST'])
+def import_pregroups(tournament_id):
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': '未找到檔案'}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': '未選擇檔案'}), 400
+
+        # 舊版 .xls 需要 xlrd，未列入相依套件，請使用者另存為 .xlsx
+        if file.filename.lower().endswith('.xls'):
+            return jsonify({'error': '不支援舊版 Excel 檔案 (.xls)，請另存為 .xlsx 後再上傳'}), 400
+        if not file.filename.lower().endswith('.xlsx'):
+            return jsonify({'error': '請上傳 Excel 檔案 (.xlsx)'}), 400
+
+        if not Tournament.query.get(tournament_id):
+            return jsonify({'error': '找不到賽事'}), 404
+
+        try:
+            pregroups = read_pregroups(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        result = apply_pregroups(tournament_id, pregroups)
+
+        db.session.commit()
+        return jsonify({'message': '匯入成功', 'pregroups': len(pregroups), **result}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"匯入預編組時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 批次匯入多場賽事的報名表（zip 檔）
+@bp.route('/api/v1/tournaments/import-bulk', methods=['POST'])
+def import_bulk():
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': '未找到檔案'}), 400
+
+        file = request.files['file']
+        if not file.filename.lower().endswith('.zip'):
+            return jsonify({'error': '請上傳 zip 檔'}), 400
+
+        # 選填：檔名 → 賽事編號的對照（JSON）
+        mapping = json.loads(request.form['mapping']) if request.form.get('mapping') else None
+        if mapping is not None and not (isinstance(mapping, dict) and all(
+            isinstance(tournament_id, int) and not isinstance(tournament_id, bool)
+            for tournament_id in mapping.values()
+        )):
+            return jsonify({'error': 'mapping 格式錯誤，需為 {檔名: 賽事編號} 的 JSON 物件，賽事編號為整數'}), 400
+        create_missing = request.args.get('create_missing') == '1'
+        dry_run = request.args.get('dry_run') == '1'
+        workers = current_app.config['BULK_IMPORT_WORKERS']
+
+        # ?async=1：保存上傳檔案後改由背景工作匯入，立即回傳工作編號
+        if request.args.get('async') == '1':
+            job_id = jobs.new_job_id()
+            upload_path = jobs.upload_path(job_id, '.zip')
+            file.save(upload_path)
+            job = jobs.submit('import_bulk', bulk_import_job, upload_path, mapping, create_missing, dry_run, workers,
+                              job_id=job_id)
+            return jsonify(job.to_dict()), 202, {'Location': f'/api/v1/jobs/{job.id}'}
+
+        try:
+            sheets = collect_sheets(BytesIO(file.read()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        report = bulk_import(sheets, mapping=mapping, create_missing=create_missing,
+                             dry_run=dry_run, workers=workers)
+        return jsonify(report), 200
+
+    except json.JSONDecodeError:
+        return jsonify({'error': 'mapping 格式錯誤，需為 JSON 物件'}), 400
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"批次匯入時發生錯誤：{str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 # 獲取下一個報名序號
-@app.route('/api/v1/tournaments/<int:tournament_id>/next-registration-number', methods=['GET'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/next-registration-number', methods=['GET'])
 def get_next_registration_number(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -313,33 +617,102 @@ def get_next_registration_number(tournament_id):
             print(f'  {name}: {value}')
         print('============================================')
         
-        # 獲取當前賽事的所有參賽者
-        participants = Participant.query.filter_by(tournament_id=tournament_id).all()
-        
-        # 如果沒有參賽者，從 A01 開始
-        if not participants:
-            return jsonify({'next_number': 'A01'})
-            
-        # 找出最大的報名序號
-        max_number = 0
-        for p in participants:
-            if p.registration_number and p.registration_number.startswith('A'):
-                try:
-                    number = int(p.registration_number[1:])
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-                    
-        # 返回下一個序號
-        next_number = f'A{(max_number + 1):02d}'
+        # 從計數器預覽下一個序號，實際序號在新增參賽者時才配發
+        next_number = peek_next_registration_number(tournament_id)
         return jsonify({'next_number': next_number})
         
     except Exception as e:
+        db.session.rollback()
         print(f"獲取下一個報名序號時出錯：{str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# 配發報名序號（可一次配發多個）
+@bp.route('/api/v1/tournaments/<int:tournament_id>/registration-numbers', methods=['POST'])
+def allocate_registration_number_block(tournament_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        count = data.get('count', 1)
+        max_block = current_app.config['REGISTRATION_MAX_BLOCK']
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            return jsonify({'error': '配發數量必須是大於 0 的整數'}), 400
+        if count > max_block:
+            return jsonify({'error': f'一次最多配發 {max_block} 個報名序號'}), 400
+
+        tournament = Tournament.query.get(tournament_id)
+        if not tournament:
+            return jsonify({'error': '找不到指定的賽事'}), 404
+
+        numbers = allocate_registration_numbers(tournament_id, count)
+        db.session.commit()
+
+        return jsonify({'registration_numbers': numbers}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"配發報名序號時出錯：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 新增參賽者（現場報名），報名序號由伺服器配發
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants', methods=['POST'])
+def create_participants(tournament_id):
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': '無效的請求資料'}), 400
+
+        tournament = Tournament.query.get(tournament_id)
+        if not tournament:
+            return jsonify({'error': '找不到指定的賽事'}), 404
+
+        # 支援單筆或批次（{"participants": [...]}）新增
+        is_batch = 'participants' in data
+        items = data['participants'] if is_batch else [data]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': 'participants 必須是參賽者資料的清單'}), 400
+        if len(items) > current_app.config['REGISTRATION_MAX_BLOCK']:
+            return jsonify({'error': f"一次最多新增 {current_app.config['REGISTRATION_MAX_BLOCK']} 位參賽者"}), 400
+        if not items or any(not item.get('name') for item in items):
+            return jsonify({'error': '請輸入姓名'}), 400
+
+        numbers = allocate_registration_numbers(tournament_id, len(items))
+        next_order = (db.session.query(func.max(Participant.display_order)).filter_by(
+            tournament_id=tournament_id
+        ).scalar() or 0) + 1
+
+        order_key = None
+        participants = []
+        for offset, (item, registration_number) in enumerate(zip(items, numbers)):
+            order_key = key_between(order_key, None) if order_key else next_order_key(tournament_id)
+            handicap = item.get('handicap')
+            participant = Participant(
+                tournament_id=tournament_id,
+                name=item['name'],
+                gender=item.get('gender') or 'M',
+                handicap=float(handicap) if handicap not in (None, '') else None,
+                member_number=item.get('member_number') or '',
+                registration_number=registration_number,
+                pre_group_code=item.get('pre_group_code') or None,
+                notes=item.get('notes') or None,
+                display_order=next_order + offset,
+                order_key=order_key
+            )
+            db.session.add(participant)
+            participants.append(participant)
+
+        touch_tournament(tournament_id)
+        db.session.commit()
+
+        if is_batch:
+            return jsonify({'participants': [p.to_dict() for p in participants]}), 201
+        return jsonify({'participant': participants[0].to_dict()}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"新增參賽者時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # 刪除賽事
-@app.route('/api/v1/tournaments/<int:tournament_id>', methods=['DELETE'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>', methods=['DELETE'])
 def delete_tournament(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -358,6 +731,12 @@ def delete_tournament(tournament_id):
         # 先刪除所有相關的參賽者
         print("刪除相關的參賽者")
         Participant.query.filter_by(tournament_id=tournament_id).delete()
+        RegistrationCounter.query.filter_by(tournament_id=tournament_id).delete()
+        Pairing.query.filter_by(tournament_id=tournament_id).delete()
+        GroupPosition.query.filter_by(tournament_id=tournament_id).delete()
+        delete_group_stats(tournament_id)
+        # 背景工作紀錄參照賽事（外鍵），刪除已結束的工作、其餘解除關聯
+        jobs.discard_tournament_jobs(tournament_id)
         
         # 再刪除賽事本身
         print("刪除賽事本身")
@@ -377,7 +756,7 @@ def delete_tournament(tournament_id):
         return jsonify({'error': str(e)}), 500
 
 # 刪除參賽者
-@app.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>', methods=['DELETE'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>', methods=['DELETE'])
 def delete_participant(tournament_id, participant_id):
     try:
         print('================== 請求開始 ==================')
@@ -389,17 +768,14 @@ def delete_participant(tournament_id, participant_id):
             print(f'  {name}: {value}')
         print('============================================')
         
-        participant = Participant.query.get(participant_id)
-        if not participant:
-            return jsonify({'error': '找不到指定的參賽者'}), 404
-            
-        if participant.tournament_id != tournament_id:
-            return jsonify({'error': '參賽者不屬於指定的賽事'}), 400
-            
-        if participant.check_in_status == 'checked_in':
-            return jsonify({'error': '已報到的參賽者不能刪除'}), 400
-            
-        db.session.delete(participant)
+        try:
+            operations.delete(operations.get_participant(tournament_id, participant_id))
+        except NotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        touch_tournament(tournament_id, pairings=True)
         db.session.commit()
         
         return jsonify({'message': '參賽者已成功刪除'})
@@ -408,8 +784,124 @@ def delete_participant(tournament_id, participant_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# 批次操作：依序執行多個子操作，全部成功才提交（任一失敗即整批回復）
+def _batch_check_in(tournament_id, item):
+    participant = operations.get_participant(tournament_id, item['participant_id'])
+    operations.check_in(participant, item['check_in_status'], item.get('check_in_time'))
+    return participant, None
+
+
+def _batch_move(tournament_id, item):
+    participant = operations.get_participant(tournament_id, item['participant_id'])
+    group_code = item.get('group_code', participant.group_code)
+    if 'prev_id' in item or 'next_id' in item:
+        order_key = operations.move_to_position(
+            participant, group_code, prev_id=item.get('prev_id'), next_id=item.get('next_id')
+        )
+        return participant, order_key
+    operations.move(participant, group_code)
+    return participant, None
+
+
+def _batch_notes(tournament_id, item):
+    participant = operations.get_participant(tournament_id, item['participant_id'])
+    operations.set_notes(participant, item.get('notes', ''))
+    return participant, None
+
+
+def _batch_delete(tournament_id, item):
+    operations.delete(operations.get_participant(tournament_id, item['participant_id']))
+    return None, None
+
+
+def _batch_reorder(tournament_id, item):
+    # 組別代碼整批改寫不經過 session，先寫出前面子操作的異動
+    db.session.flush()
+    updated = operations.reorder(tournament_id, order=item.get('order'),
+                                 group1=item.get('group1'), group2=item.get('group2'))
+    # 已載入的參賽者組別可能被改寫，之後的子操作需重新讀取
+    db.session.expire_all()
+    return None, updated
+
+
+BATCH_OPERATIONS = {
+    'check_in': _batch_check_in,
+    'move': _batch_move,
+    'notes': _batch_notes,
+    'delete': _batch_delete,
+    'reorder': _batch_reorder,
+}
+
+
+@bp.route('/api/v1/batch', methods=['POST'])
+def run_batch():
+    data = request.get_json(silent=True) or {}
+    tournament_id = data.get('tournament_id')
+    items = data.get('operations')
+    if not isinstance(tournament_id, int) or not isinstance(items, list) or not items:
+        return jsonify({'error': '需要 tournament_id 與 operations'}), 400
+    if len(items) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': f"一次最多 {current_app.config['BATCH_MAX_OPERATIONS']} 個操作"}), 400
+
+    index = None
+    try:
+        if not Tournament.query.get(tournament_id):
+            return jsonify({'error': '找不到指定的賽事'}), 404
+
+        results = []
+        order_keys = []
+        for index, item in enumerate(items):
+            handler = BATCH_OPERATIONS.get(item.get('op')) if isinstance(item, dict) else None
+            if handler is None:
+                raise ValueError(f"不支援的操作：{item.get('op') if isinstance(item, dict) else item}")
+            participant, value = handler(tournament_id, item)
+            results.append({'op': item['op'], 'participant_id': item.get('participant_id'),
+                            'participant': participant, 'value': value})
+            if item['op'] == 'move' and value is not None:
+                order_keys.append(value)
+
+        index = None
+        # 組別代碼整批改寫不改變誰和誰同組；移動與刪除才需要重建同組索引
+        revision = bump_revision(tournament_id, pairings=any(item['op'] in ('move', 'delete') for item in items))
+
+        # 提交前序列化（提交後物件會過期，逐一重新載入）
+        db.session.flush()
+        response = []
+        for result in results:
+            entry = {'op': result['op'], 'participant_id': result['participant_id']}
+            if result['participant'] is not None and result['participant'] in db.session:
+                entry['participant'] = result['participant'].to_dict()
+            if result['op'] == 'reorder':
+                entry['updated_participants'] = result['value']
+            response.append(entry)
+
+        db.session.commit()
+        for order_key in order_keys:
+            if schedule_rebalance_if_needed(tournament_id, order_key):
+                break
+
+        return jsonify({'message': '批次操作完成', 'revision': revision, 'results': response})
+
+    except NotFoundError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'index': index}), 404
+    except StaleOrderError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'index': index}), 409
+    except KeyError as e:
+        # 子操作缺少必要欄位屬於請求格式錯誤，不是找不到資料
+        db.session.rollback()
+        return jsonify({'error': f'操作缺少欄位：{e.args[0]}', 'index': index}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'index': index}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"批次操作時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e), 'index': index}), 500
+
 # 更新報到狀態
-@app.route('/api/v1/participants/<int:participant_id>/check-in', methods=['PUT'])
+@bp.route('/api/v1/participants/<int:participant_id>/check-in', methods=['PUT'])
 def update_check_in_status(participant_id):
     try:
         print('================== 請求開始 ==================')
@@ -425,16 +917,13 @@ def update_check_in_status(participant_id):
         check_in_status = data.get('check_in_status')
         check_in_time = data.get('check_in_time')
         
-        participant = Participant.query.get(participant_id)
-        if not participant:
-            return jsonify({'error': '找不到指定的參賽者'}), 404
-            
-        participant.check_in_status = check_in_status
-        if check_in_time:
-            participant.check_in_time = datetime.fromisoformat(check_in_time.replace('Z', '+00:00'))
-        else:
-            participant.check_in_time = None
-            
+        try:
+            participant = operations.get_participant(None, participant_id)
+        except NotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+
+        operations.check_in(participant, check_in_status, check_in_time)
+        touch_tournament(participant.tournament_id)
         db.session.commit()
         
         return jsonify({
@@ -448,7 +937,7 @@ def update_check_in_status(participant_id):
         return jsonify({'error': str(e)}), 500
 
 # 自動分組
-@app.route('/api/v1/tournaments/<int:tournament_id>/auto-group', methods=['POST'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/auto-group', methods=['POST'])
 def auto_group(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -470,31 +959,50 @@ def auto_group(tournament_id):
         if not participants:
             return jsonify({'error': '沒有參賽者可供分組'}), 400
 
-        # 先按預分組編號排序，再按差點排序
-        sorted_participants = sorted(participants, 
-            key=lambda p: (
-                p.pre_group_code if p.pre_group_code else 'Z999',  # 沒有預分組的排最後
-                float(p.handicap if p.handicap is not None else 999.0)
+        # 分組模式：handicap（預設，按預分組編號與差點排序）或 pairing（避開過去同組的組合）
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', 'handicap')
+        if mode not in ('handicap', 'pairing'):
+            return jsonify({'error': f'不支援的分組模式：{mode}'}), 400
+
+        if mode == 'pairing':
+            # 先補齊較早賽事的同組索引，再載入本場參賽者之間的同組次數
+            refresh_pairing_index(before_date=tournament.date)
+            matrix = load_pairing_matrix(
+                [p.member_number for p in participants],
+                exclude_tournament_id=tournament_id
             )
-        )
+            groups = pairing_aware_groups(participants, matrix, GROUP_SIZE)
+            repeat_pairings = sum(group_cost(matrix, members) for members in groups)
+        else:
+            groups = sort_and_chunk(participants, GROUP_SIZE)
+            repeat_pairings = None
 
-        # 計算每組人數（預設 4 人一組）
-        group_size = 4
-        total_groups = (len(sorted_participants) + group_size - 1) // group_size
+        total_groups = len(groups)
 
         # 進行分組
-        for i, participant in enumerate(sorted_participants):
-            group_number = (i // group_size) + 1
-            participant.group_code = str(group_number)
-            participant.display_order = i + 1
+        display_order = 1
+        ordered = []
+        for group_number, members in enumerate(groups, start=1):
+            for participant in members:
+                participant.group_code = str(group_number)
+                participant.display_order = display_order
+                display_order += 1
+                ordered.append(participant)
+
+        assign_order_keys(ordered)
+        set_group_positions(tournament_id, [str(n) for n in range(1, total_groups + 1)])
 
         # 儲存變更
+        touch_tournament(tournament_id, pairings=True)
         db.session.commit()
 
         return jsonify({
             'message': '自動分組完成',
+            'mode': mode,
             'total_groups': total_groups,
-            'total_participants': len(sorted_participants)
+            'total_participants': len(participants),
+            'repeat_pairings': repeat_pairings
         })
 
     except Exception as e:
@@ -502,8 +1010,31 @@ def auto_group(tournament_id):
         print('自動分組錯誤:', str(e))
         return jsonify({'error': '自動分組失敗：' + str(e)}), 500
 
+# 重建歷史同組索引（預設全部重建，成本高，限管理員）
+@bp.route('/api/v1/pairing-history/rebuild', methods=['POST'])
+@admin_required
+def rebuild_pairing_history():
+    try:
+        data = request.get_json(silent=True) or {}
+        before_date = None
+        if data.get('before_date'):
+            before_date = datetime.strptime(data['before_date'], '%Y-%m-%d').date()
+
+        indexed = refresh_pairing_index(before_date=before_date, force=data.get('force', True))
+        db.session.commit()
+
+        return jsonify({
+            'message': '同組索引重建完成',
+            'indexed_tournaments': indexed
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        print('重建同組索引錯誤:', str(e))
+        return jsonify({'error': '重建同組索引失敗：' + str(e)}), 500
+
 # 儲存分組
-@app.route('/api/v1/tournaments/<int:tournament_id>/groups/save', methods=['PUT'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/groups/save', methods=['PUT'])
 def save_groups(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -527,29 +1058,42 @@ def save_groups(tournament_id):
         if not tournament:
             return jsonify({'error': '找不到指定的賽事'}), 404
             
+        # 一次載入整份名單
+        roster = {p.id: p for p in Participant.query.filter_by(tournament_id=tournament_id)}
+
         # 更新所有參賽者的顯示順序和分組
         display_order = 1
+        ordered = []
+        saved_codes = []
         
         # 按照 group_order 的順序處理各組
         for group_code in group_order:
             group = next((g for g in groups if g['group_code'] == group_code), None)
             if group:
+                saved_codes.append(group_code)
                 for participant_id in group['participant_ids']:
-                    participant = Participant.query.get(participant_id)
-                    if participant and participant.tournament_id == tournament_id:
+                    participant = roster.get(participant_id)
+                    if participant:
                         participant.group_code = group_code
                         participant.display_order = display_order
                         display_order += 1
+                        ordered.append(participant)
         
         # 處理未分組的參賽者
         unassigned_group = next((g for g in groups if g['group_code'] == '未分組'), None)
         if unassigned_group:
             for participant_id in unassigned_group['participant_ids']:
-                participant = Participant.query.get(participant_id)
-                if participant and participant.tournament_id == tournament_id:
+                participant = roster.get(participant_id)
+                if participant:
                     participant.group_code = None
                     participant.display_order = display_order
                     display_order += 1
+                    ordered.append(participant)
+
+        # 整份分組儲存時重新分配排序鍵，之後的單一移動只需寫入一列
+        assign_order_keys(ordered)
+        set_group_positions(tournament_id, saved_codes)
+        touch_tournament(tournament_id, pairings=True)
         
         db.session.commit()
         
@@ -564,7 +1108,7 @@ def save_groups(tournament_id):
         return jsonify({'error': '儲存分組失敗：' + str(e)}), 500
 
 # 更新分組順序
-@app.route('/api/v1/tournaments/<int:tournament_id>/groups/reorder', methods=['PUT'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/groups/reorder', methods=['PUT'])
 def reorder_groups(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -579,31 +1123,27 @@ def reorder_groups(tournament_id):
         data = request.get_json()
         group1 = data.get('group1')
         group2 = data.get('group2')
-
-        if not group1 or not group2:
-            return jsonify({'error': '缺少組別資訊'}), 400
-
-        # 獲取兩個組別的參賽者
-        participants1 = Participant.query.filter_by(
-            tournament_id=tournament_id,
-            group_code=group1
-        ).all()
-
-        participants2 = Participant.query.filter_by(
-            tournament_id=tournament_id,
-            group_code=group2
-        ).all()
-
-        # 交換組別代碼
-        for p in participants1:
-            p.group_code = group2
-
-        for p in participants2:
-            p.group_code = group1
-
+        order = data.get('order')
+
+        # order：完整的新組別順序（order[i] 的組別改為第 i+1 組）；或交換 group1、group2 兩個組別
+        try:
+            updated = operations.reorder(tournament_id, order=order, group1=group1, group2=group2)
+        except StaleOrderError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
+        # 更新賽事版本號
+        revision = bump_revision(tournament_id)
         db.session.commit()
 
-        return jsonify({'message': '組別順序更新成功'})
+        return jsonify({
+            'message': '組別順序更新成功',
+            'updated_participants': updated,
+            'revision': revision
+        })
 
     except Exception as e:
         db.session.rollback()
@@ -611,7 +1151,7 @@ def reorder_groups(tournament_id):
         return jsonify({'error': '更新組別順序失敗：' + str(e)}), 500
 
 # 更新參賽者組別
-@app.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>', methods=['PUT'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>', methods=['PUT'])
 def update_participant_group(tournament_id, participant_id):
     try:
         print('================== 請求開始 ==================')
@@ -626,17 +1166,16 @@ def update_participant_group(tournament_id, participant_id):
         data = request.json
         print(f"接收到的數據：{data}")
         
-        participant = Participant.query.get(participant_id)
-        if not participant:
-            return jsonify({'error': '找不到指定的參賽者'}), 404
-            
-        if participant.tournament_id != tournament_id:
-            return jsonify({'error': '參賽者不屬於指定的賽事'}), 400
-            
-        target_group = data.get('group_code')
-        
+        try:
+            participant = operations.get_participant(tournament_id, participant_id)
+        except NotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         # 更新參賽者組別
-        participant.group_code = target_group
+        operations.move(participant, data.get('group_code'))
+        touch_tournament(tournament_id, pairings=True)
         db.session.commit()
         
         print("更新完成")
@@ -650,7 +1189,126 @@ def update_participant_group(tournament_id, participant_id):
         print('更新參賽者組別錯誤:', str(e))
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/v1/tournaments/<int:tournament_id>/save_groups', methods=['POST', 'OPTIONS'])
+# 拖曳移動單一參賽者：只寫入被移動的那一列
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>/position', methods=['PUT'])
+def move_participant_position(tournament_id, participant_id):
+    try:
+        data = request.get_json() or {}
+
+        try:
+            participant = operations.get_participant(tournament_id, participant_id)
+            order_key = operations.move_to_position(
+                participant, data.get('group_code', participant.group_code),
+                prev_id=data.get('prev_id'),
+                next_id=data.get('next_id')
+            )
+        except NotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except StaleOrderError as e:
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        touch_tournament(tournament_id, pairings=True)
+        db.session.commit()
+        schedule_rebalance_if_needed(tournament_id, order_key)
+
+        return jsonify({
+            'message': '移動成功',
+            'participant': participant.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"移動參賽者時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 拖曳中連續移動參賽者：只登記移動並立即回應 202，由背景寫入執行緒合併後寫入（見 coalescing.py）
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>/move', methods=['PUT'])
+def move_participant_coalesced(tournament_id, participant_id):
+    data = request.get_json() or {}
+    drag_id = data.get('drag_id')
+    seq = data.get('seq')
+    if not isinstance(drag_id, str) or not 0 < len(drag_id) <= 64:
+        return jsonify({'error': 'drag_id 必須是 1 到 64 個字元的字串'}), 400
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq <= 0:
+        return jsonify({'error': 'seq 必須是正整數'}), 400
+
+    move = {
+        'tournament_id': tournament_id,
+        'drag_id': drag_id,
+        'seq': seq,
+        'group_code': data.get('group_code'),
+        'prev_id': data.get('prev_id'),
+        'next_id': data.get('next_id'),
+    }
+    outcome = move_coalescer.submit(current_app._get_current_object(), participant_id, move)
+    if outcome == STALE:
+        return jsonify({'error': '已有更新的移動', 'drag_id': drag_id, 'seq': seq, 'stale': True}), 409
+    return jsonify({'drag_id': drag_id, 'seq': seq, 'queued': True}), 202
+
+# 查詢拖曳移動的結果：applied、failed、pending 或 superseded
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>/move', methods=['GET'])
+def get_move_status(tournament_id, participant_id):
+    drag_id = request.args.get('drag_id')
+    seq = request.args.get('seq', type=int)
+    if not drag_id or seq is None or seq <= 0:
+        return jsonify({'error': '缺少 drag_id 或 seq'}), 400
+
+    try:
+        participant = Participant.query.filter_by(id=participant_id, tournament_id=tournament_id).first()
+        if participant is None:
+            return jsonify({'error': '找不到指定的參賽者'}), 404
+
+        status = operations.move_status(
+            participant, drag_id, seq,
+            pending=move_coalescer.is_pending(participant_id, drag_id)
+        )
+        return jsonify(dict(
+            status,
+            drag_id=drag_id,
+            seq=seq,
+            participant_id=participant_id,
+            group_code=participant.group_code,
+            order_key=participant.order_key
+        ))
+
+    except Exception as e:
+        print(f"查詢拖曳移動結果時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# 拖曳移動組別：只寫入該組別的位置
+@bp.route('/api/v1/tournaments/<int:tournament_id>/groups/<group_code>/position', methods=['PUT'])
+def move_group_position(tournament_id, group_code):
+    try:
+        data = request.get_json() or {}
+
+        try:
+            order_key = move_group_to(
+                tournament_id, group_code,
+                prev_code=data.get('prev_code'),
+                next_code=data.get('next_code')
+            )
+        except NotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError:
+            return jsonify({'error': '相鄰組別順序已變更，請重新整理'}), 409
+
+        touch_tournament(tournament_id)
+        db.session.commit()
+        schedule_rebalance_if_needed(tournament_id, order_key)
+
+        return jsonify({
+            'message': '移動成功',
+            'group_order': ordered_group_codes(tournament_id)
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"移動組別時發生錯誤：{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/v1/tournaments/<int:tournament_id>/save_groups', methods=['POST', 'OPTIONS'])
 def save_groups_api(tournament_id):
     # 處理 OPTIONS 請求
     if request.method == 'OPTIONS':
@@ -679,6 +1337,10 @@ def save_groups_api(tournament_id):
         groups_data = data['groups']
         print(f"接收到的分組數據: {groups_data}")
         
+        # 一次載入整份名單
+        roster = {p.id: p for p in Participant.query.filter_by(tournament_id=tournament_id)}
+        ordered = []
+
         # 更新所有參賽者的分組
         for group_info in groups_data:
             group_code = group_info['group_code']
@@ -687,11 +1349,18 @@ def save_groups_api(tournament_id):
             
             # 更新每個參賽者的分組
             for display_order, participant_id in enumerate(participant_ids, start=1):
-                participant = Participant.query.get(participant_id)
+                participant = roster.get(participant_id)
                 if participant:
                     participant.group_code = group_code
                     participant.display_order = display_order
+                    ordered.append(participant)
                     print(f"更新參賽者 {participant_id} 到組別 {group_code}, 順序 {display_order}")
+
+        assign_order_keys(ordered)
+        set_group_positions(tournament_id, [
+            g['group_code'] for g in groups_data if g['group_code'] and g['group_code'] != '未分組'
+        ])
+        touch_tournament(tournament_id, pairings=True)
         
         db.session.commit()
         response = jsonify({'message': '分組儲存成功'})
@@ -702,7 +1371,8 @@ def save_groups_api(tournament_id):
         print(f"保存分組時發生錯誤：{str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/v1/tournaments/<int:tournament_id>/export_groups', methods=['GET'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/export_groups', methods=['GET'])
+@read_only
 def export_groups(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -719,117 +1389,25 @@ def export_groups(tournament_id):
         if not tournament:
             return jsonify({'error': '找不到賽事'}), 404
 
-        # 獲取所有參賽者並按分組和顯示順序排序
-        participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(
-            func.cast(Participant.group_code, db.Integer).asc(),  # 將組別轉換為數字進行排序
-            Participant.display_order.asc(),
-            Participant.registration_number.asc()
-        ).all()
+        # ?async=1：改由背景工作產生，立即回傳工作編號
+        if request.args.get('async') == '1':
+            job = jobs.submit('export_groups', export_groups_job, tournament_id, tournament_id=tournament_id)
+            return jsonify(job.to_dict()), 202, {'Location': f'/api/v1/jobs/{job.id}'}
+
+        # 獲取所有參賽者並按分組和顯示順序排序；同一版本的分組表只產生一次
+        cached = snapshot_cache.view(
+            tournament_id, 'export_groups',
+            lambda: build_groups_workbook(tournament.name, ordered_for_export(tournament_id)).getvalue()
+        )
+        # 查詢賽事後、取得快照前賽事被刪除
+        if cached is None:
+            return jsonify({'error': '找不到賽事'}), 404
+
+        _, content = cached
 
-        # 創建一個新的 Excel 工作簿
-        wb = openpyxl.Workbook()
-        
-        # 創建分組名單工作表（放在最前面）
-        ws_list = wb.active
-        ws_list.title = "分組名單"
-        
-        # 設置標題
-        ws_list.append([f"{tournament.name} 分組名單"])
-        ws_list.append(["姓名", "性別", "備註"])
-        
-        # 設置標題樣式
-        title_font = Font(name='微軟正黑體', size=14, bold=True)
-        header_font = Font(name='微軟正黑體', size=12, bold=True)
-        ws_list['A1'].font = title_font
-        ws_list.merge_cells('A1:C1')
-        ws_list['A1'].alignment = Alignment(horizontal='center')
-        
-        for cell in ws_list[2]:
-            cell.font = header_font
-            
-        # 按組別分類參賽者
-        current_group = None
-        row_idx = 3
-        
-        for p in participants:
-            if p.group_code != current_group:
-                current_group = p.group_code
-                group_name = f"第 {current_group} 組" if current_group else "未分組"
-                ws_list.append([group_name])
-                ws_list.merge_cells(f'A{row_idx}:C{row_idx}')
-                ws_list[f'A{row_idx}'].font = Font(name='微軟正黑體', size=12, bold=True)
-                ws_list[f'A{row_idx}'].fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-                row_idx += 1
-            
-            # 添加參賽者資料
-            gender = "女" if p.gender == "F" else "男"
-            ws_list.append([p.name, gender, p.notes or ''])
-            
-            # 如果是女生，設置粉紅色背景
-            if p.gender == "F":
-                for cell in ws_list[row_idx]:
-                    cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-            
-            row_idx += 1
-        
-        # 調整欄寬
-        ws_list.column_dimensions['A'].width = 20
-        ws_list.column_dimensions['B'].width = 10
-        ws_list.column_dimensions['C'].width = 30
-        
-        # 創建詳細資料工作表
-        ws_detail = wb.create_sheet("詳細資料")
-        
-        # 設置標題
-        ws_detail.append([f"{tournament.name} 分組詳細資料"])
-        ws_detail.append(["報名序號", "會員編號", "姓名", "差點", "預分組", "分組", "性別", "備註"])
-        
-        # 設置標題樣式
-        ws_detail['A1'].font = title_font
-        ws_detail.merge_cells('A1:H1')
-        ws_detail['A1'].alignment = Alignment(horizontal='center')
-        
-        for cell in ws_detail[2]:
-            cell.font = header_font
-        
-        # 添加參賽者資料
-        for p in participants:
-            gender = "女" if p.gender == "F" else "男"
-            ws_detail.append([
-                p.registration_number,
-                p.member_number,
-                p.name,
-                p.handicap,
-                p.pre_group_code or '',
-                p.group_code or '',
-                gender,
-                p.notes or ''
-            ])
-            
-            # 如果是女生，設置粉紅色背景
-            if p.gender == "F":
-                row = ws_detail[ws_detail.max_row]
-                for cell in row:
-                    cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-        
-        # 調整欄寬
-        ws_detail.column_dimensions['A'].width = 15
-        ws_detail.column_dimensions['B'].width = 15
-        ws_detail.column_dimensions['C'].width = 20
-        ws_detail.column_dimensions['D'].width = 10
-        ws_detail.column_dimensions['E'].width = 10
-        ws_detail.column_dimensions['F'].width = 10
-        ws_detail.column_dimensions['G'].width = 10
-        ws_detail.column_dimensions['H'].width = 30
-        
-        # 保存到 BytesIO
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-        
         return send_file(
-            excel_file,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            BytesIO(content),
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
             download_name=f'{tournament.name}_分組名單.xlsx'
         )
@@ -839,7 +1417,8 @@ def export_groups(tournament_id):
         return jsonify({'error': str(e)}), 500
 
 # 匯出分組圖
-@app.route('/api/v1/tournaments/<int:tournament_id>/export_groups_diagram', methods=['GET'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/export_groups_diagram', methods=['GET'])
+@read_only
 def export_groups_diagram(tournament_id):
     try:
         print('================== 請求開始 ==================')
@@ -854,133 +1433,28 @@ def export_groups_diagram(tournament_id):
         # 獲取賽事資訊
         tournament = Tournament.query.get_or_404(tournament_id)
         
-        # 獲取所有參賽者並按分組和顯示順序排序
-        participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(
-            func.cast(Participant.group_code, db.Integer).asc(),
-            Participant.display_order.asc(),
-            Participant.registration_number.asc()
-        ).all()
-
-        # 按組別分組
-        groups = {}
-        for p in participants:
-            if p.group_code and p.group_code != '未分組':
-                if p.group_code not in groups:
-                    groups[p.group_code] = []
-                groups[p.group_code].append(p)
+        # 獲取所有參賽者並按分組和顯示順序排序；同一版本的分組圖只產生一次
+        cached = snapshot_cache.view(
+            tournament_id, 'export_groups_diagram',
+            lambda: build_groups_diagram(ordered_for_export(tournament_id))
+        )
+        # 查詢賽事後、取得快照前賽事被刪除
+        if cached is None:
+            return jsonify({'error': '找不到賽事'}), 404
 
-        if not groups:
+        revision, html = cached
+        if html is None:
             return jsonify({'error': '沒有已分組的參賽者'}), 400
 
-        # 生成 HTML
-        html = '''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>分組圖</title>
-            <style>
-                body { 
-                    font-family: Arial, "Microsoft JhengHei", sans-serif; 
-                    padding: 20px;
-                    background-color: #f5f5f5;
-                }
-                .group-container {
-                    display: flex;
-                    flex-wrap: wrap;
-                    gap: 20px;
-                    margin-bottom: 20px;
-                }
-                .group-card {
-                    background: white;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    padding: 16px;
-                    width: 300px;
-                }
-                .group-header {
-                    margin-bottom: 16px;
-                    color: #1976d2;
-                    font-size: 1.2em;
-                    font-weight: bold;
-                }
-                .group-code {
-                    color: #666;
-                    font-size: 0.9em;
-                }
-                .participant {
-                    display: flex;
-                    align-items: center;
-                    padding: 8px 0;
-                    border-bottom: 1px solid #eee;
-                }
-                .participant:last-child {
-                    border-bottom: none;
-                }
-                .gender-icon {
-                    margin: 0 8px;
-                    color: #2196f3;
-                }
-                .gender-icon.female {
-                    color: #f06292;
-                }
-                .handicap {
-                    margin-left: auto;
-                    color: #666;
-                }
-                .drag-handle {
-                    color: #ccc;
-                    margin-right: 8px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="group-container">
-        '''
-
-        # 添加每個分組的卡片
-        for group_code in sorted(groups.keys(), key=lambda x: int(x)):
-            group = groups[group_code]
-            html += f'''
-                <div class="group-card">
-                    <div class="group-header">
-                        第 {group_code} 組 {len(group)} 人
-                        <div class="group-code">預分組: G{int(group_code):02d}</div>
-                    </div>
-            '''
-            
-            # 添加組內的參賽者
-            for p in group:
-                gender_icon = '♀' if p.gender == "F" else '♂'
-                gender_class = 'female' if p.gender == "F" else ''
-                html += f'''
-                    <div class="participant">
-                        <span class="drag-handle">≡</span>
-                        <span>{p.name}</span>
-                        <span class="gender-icon {gender_class}">{gender_icon}</span>
-                        <span class="handicap">差點: {p.handicap}</span>
-                    </div>
-                '''
-            
-            html += '</div>'
-
-        html += '''
-            </div>
-        </body>
-        </html>
-        '''
-
-        # 創建一個臨時文件來保存 HTML
-        with tempfile.NamedTemporaryFile(suffix='.html', delete=False, mode='w', encoding='utf-8') as f:
-            f.write(html)
-            temp_path = f.name
-
+        # 直接由記憶體送出（不再寫入不會被刪除的暫存檔），並交由 compression.py 壓縮
+        cache_compressed('export_groups_diagram', tournament_id, revision)
         response = send_file(
-            temp_path,
+            BytesIO(html.encode('utf-8')),
             mimetype='text/html',
             as_attachment=True,
             download_name=f'{tournament.name}_分組圖.html'
         )
+        response.direct_passthrough = False
 
         # 設置 headers 避免快取
         response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -993,8 +1467,36 @@ def export_groups_diagram(tournament_id):
         print(f"匯出分組圖時發生錯誤：{str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# 查詢背景工作狀態與進度
+@bp.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': '找不到工作'}), 404
+    if jobs.is_orphaned(job) and jobs.fail_orphaned(job_id):
+        db.session.refresh(job)
+    return jsonify(job.to_dict())
+
+# 下載背景工作的產出檔案
+@bp.route('/api/v1/jobs/<job_id>/download', methods=['GET'])
+def download_job_result(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': '找不到工作'}), 404
+    if job.status != 'succeeded':
+        return jsonify({'error': '工作尚未完成', 'status': job.status}), 409
+    if not job.result_path or not os.path.exists(job.result_path):
+        return jsonify({'error': '此工作沒有可下載的檔案'}), 404
+
+    return send_file(
+        job.result_path,
+        mimetype=job.result_mimetype,
+        as_attachment=True,
+        download_name=job.result_name
+    )
+
 # 更新參賽者備註
-@app.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>/notes', methods=['PUT'])
+@bp.route('/api/v1/tournaments/<int:tournament_id>/participants/<int:participant_id>/notes', methods=['PUT'])
 def update_participant_notes(tournament_id, participant_id):
     try:
         print('================== 請求開始 ==================')
@@ -1014,7 +1516,8 @@ def update_participant_notes(tournament_id, participant_id):
             id=participant_id
         ).first_or_404()
 
-        participant.notes = notes
+        operations.set_notes(participant, notes)
+        touch_tournament(tournament_id)
         db.session.commit()
 
         return jsonify({
@@ -1028,7 +1531,61 @@ def update_participant_notes(tournament_id, participant_id):
             'error': True
         }), 400
 
+# 命令列批次匯入：flask import-bulk <zip 檔或資料夾>
+@bp.cli.command('import-bulk')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--map', 'mapping_items', multiple=True, metavar='檔名=賽事編號', help='指定檔案對應的賽事')
+@click.option('--create-missing', is_flag=True, help='找不到賽事時依檔名年月建立')
+@click.option('--dry-run', is_flag=True, help='只解析與對應，不寫入資料庫')
+@click.option('--workers', type=int, default=None, help='解析報名表的程序數')
+def import_bulk_command(source, mapping_items, create_missing, dry_run, workers):
+    """批次匯入資料夾或 zip 檔中的報名表"""
+    mapping = {}
+    for item in mapping_items:
+        filename, _, tournament_id = item.rpartition('=')
+        if not filename or not tournament_id.isdigit():
+            raise click.BadParameter(f'格式應為 檔名=賽事編號：{item}', param_hint='--map')
+        mapping[filename] = int(tournament_id)
+
+    try:
+        sheets = collect_sheets(source)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    report = bulk_import(sheets, mapping=mapping, create_missing=create_missing, dry_run=dry_run,
+                         workers=workers or current_app.config['BULK_IMPORT_WORKERS'])
+    click.echo(format_report(report))
+
+# 命令列檢查分組統計：flask check-group-stats [--tournament 編號] [--rebuild]
+@bp.cli.command('check-group-stats')
+@click.option('--tournament', 'tournament_ids', type=int, multiple=True, help='只檢查指定賽事（預設全部）')
+@click.option('--rebuild', is_flag=True, help='重算不一致的賽事')
+def check_group_stats_command(tournament_ids, rebuild):
+    """比對分組統計與參賽者資料，必要時重算"""
+    tournament_ids = tournament_ids or [tid for tid, in db.session.query(Tournament.id).order_by(Tournament.id)]
+
+    inconsistent = 0
+    for tournament_id in tournament_ids:
+        mismatches = check_group_stats(tournament_id)
+        if not mismatches:
+            continue
+        inconsistent += 1
+        click.echo(f'賽事 {tournament_id}：{len(mismatches)} 組不一致')
+        for mismatch in mismatches:
+            click.echo(f"  {mismatch['group_code']}：統計 {mismatch['stored']}，實際 {mismatch['expected']}")
+        if rebuild:
+            rebuild_group_stats(tournament_id)
+
+    if rebuild and inconsistent:
+        db.session.commit()
+        click.echo(f'已重算 {inconsistent} 場賽事的分組統計')
+    elif not inconsistent:
+        click.echo(f'{len(tournament_ids)} 場賽事的分組統計皆一致')
+    else:
+        raise click.ClickException(f'{inconsistent} 場賽事的分組統計不一致，可加上 --rebuild 重算')
+
 if __name__ == '__main__':
+    app = create_app()
     app.logger.info('應用啟動中...')
     app.logger.info(f'環境: {app.config.get("ENV")}')
     app.logger.info(f'調試模式: {app.config.get("DEBUG")}')
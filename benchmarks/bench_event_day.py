@@ -0,0 +1,240 @@
+"""
+比賽日負載測試
+
+以合成報名資料（synthetic.py）在本機 SQLite 上重現比賽日的流量：
+1. 建立賽事並匯入報名表
+2. 自動分組
+3. 多個報到櫃台同時報到，同時有多個畫面反覆查詢名單
+4. 匯出分組表與分組圖
+
+每個端點統計次數、失敗數、吞吐量與 p50/p95/p99 延遲。
+可將結果存為基準（benchmarks/baselines/<名稱>.json），之後與基準比較，
+p95 延遲或吞吐量退步超過門檻時以結束碼 1 結束。
+
+使用方式（於專案根目錄）：
+    python benchmarks/bench_event_day.py --players 144 --save-baseline local
+    python benchmarks/bench_event_day.py --players 144 --compare local
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import roster_xlsx_bytes  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Recorder:
+    """依端點記錄每次請求的延遲與成敗，以及各端點的執行時段"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.spans = {}
+
+    def call(self, endpoint, method, *args, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        response = method(*args, **kwargs)
+        end = time.perf_counter()
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(((end - start) * 1000, response.status_code in expect))
+            first, last = self.spans.get(endpoint, (start, end))
+            self.spans[endpoint] = (min(first, start), max(last, end))
+        return response
+
+    def summary(self):
+        result = {}
+        for endpoint, samples in self.samples.items():
+            latencies = [elapsed for elapsed, _ in samples]
+            first, last = self.spans[endpoint]
+            result[endpoint] = {
+                'count': len(samples),
+                'errors': sum(1 for _, ok in samples if not ok),
+                'throughput': round(len(samples) / max(last - first, 1e-6), 1),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+            }
+        return result
+
+
+def build_app(db_path):
+    from app import create_app
+    return create_app('development', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+
+
+def check_in_desk(app, recorder, participant_ids):
+    client = app.test_client()
+    for participant_id in participant_ids:
+        recorder.call('PUT check-in', client.put, f'/api/v1/participants/{participant_id}/check-in', json={
+            'check_in_status': 'checked_in',
+            'check_in_time': datetime.datetime.utcnow().isoformat()
+        })
+
+
+def roster_poller(app, recorder, tournament_id, stop, interval):
+    client = app.test_client()
+    while not stop.is_set():
+        recorder.call('GET participants', client.get, f'/api/v1/tournaments/{tournament_id}/participants')
+        stop.wait(interval)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='golf-event-day-')
+    app = build_app(os.path.join(workdir, 'event_day.db'))
+    recorder = Recorder()
+    roster = roster_xlsx_bytes(args.players, args.seed)
+
+    with app.app_context():
+        from extensions import db
+        db.create_all()
+
+    client = app.test_client()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        response = recorder.call('POST tournaments', client.post, '/api/v1/tournaments',
+                                 json={'name': '比賽日測試', 'date': datetime.date.today().isoformat()},
+                                 expect=(201,))
+        tournament_id = response.get_json()['id']
+
+        recorder.call('POST import', client.post, f'/api/v1/tournaments/{tournament_id}/participants/import',
+                      data={'file': (io.BytesIO(roster), '報名表.xlsx')}, content_type='multipart/form-data')
+
+        recorder.call('POST auto-group', client.post, f'/api/v1/tournaments/{tournament_id}/auto-group', json={})
+
+        participants = client.get(f'/api/v1/tournaments/{tournament_id}/participants').get_json()
+        participant_ids = [p['id'] for p in participants]
+
+        # 報到尖峰：各櫃台分配一部分球員，同時有多個畫面輪詢名單
+        stop = threading.Event()
+        pollers = [threading.Thread(target=roster_poller,
+                                    args=(app, recorder, tournament_id, stop, args.poll_interval))
+                   for _ in range(args.pollers)]
+        desks = [threading.Thread(target=check_in_desk,
+                                  args=(app, recorder, participant_ids[i::args.desks]))
+                 for i in range(args.desks)]
+        for thread in pollers + desks:
+            thread.start()
+        for thread in desks:
+            thread.join()
+        stop.set()
+        for thread in pollers:
+            thread.join()
+
+        for _ in range(args.exports):
+            recorder.call('GET export_groups', client.get, f'/api/v1/tournaments/{tournament_id}/export_groups')
+            recorder.call('GET export_groups_diagram', client.get,
+                          f'/api/v1/tournaments/{tournament_id}/export_groups_diagram')
+
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': f'{platform.system()} {platform.machine()} / Python {platform.python_version()}',
+        'params': {key: getattr(args, key) for key in ('players', 'desks', 'pollers', 'poll_interval', 'exports', 'seed')},
+        'total_s': round(time.perf_counter() - started, 2),
+        'endpoints': recorder.summary(),
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"{report['params']['players']} 位球員，{report['params']['desks']} 個報到櫃台，"
+          f"{report['params']['pollers']} 個名單輪詢，總計 {report['total_s']} 秒")
+    header = f"{'端點':<26}{'次數':>7}{'失敗':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'p95 變化':>10}"
+    print(header)
+    for endpoint, stats in report['endpoints'].items():
+        line = (f"{endpoint:<26}{stats['count']:>7}{stats['errors']:>6}{stats['throughput']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        base = (baseline or {}).get('endpoints', {}).get(endpoint)
+        if base and base['p95_ms']:
+            line += f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100:>+9.0f}%"
+        print(line)
+
+
+def regressions(report, baseline, threshold, min_delta_ms):
+    """
+    p95 延遲增加或吞吐量下降超過門檻（比例）的端點，以及新出現錯誤的端點
+
+    p95 增加不到 min_delta_ms 毫秒的不算退步，避免極短請求的量測誤差造成誤判。
+    """
+    found = []
+    for endpoint, stats in report['endpoints'].items():
+        base = baseline['endpoints'].get(endpoint)
+        if not base:
+            continue
+        if stats['errors'] > base['errors']:
+            found.append(f"{endpoint}：失敗 {base['errors']} → {stats['errors']}")
+        if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + threshold) \
+                and stats['p95_ms'] - base['p95_ms'] >= min_delta_ms:
+            found.append(f"{endpoint}：p95 {base['p95_ms']} → {stats['p95_ms']} ms")
+        # 只有單次請求的端點吞吐量沒有意義
+        if base['count'] > 1 and stats['throughput'] < base['throughput'] * (1 - threshold):
+            found.append(f"{endpoint}：吞吐量 {base['throughput']} → {stats['throughput']} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=144)
+    parser.add_argument('--desks', type=int, default=4, help='同時報到的櫃台數')
+    parser.add_argument('--pollers', type=int, default=4, help='輪詢名單的畫面數')
+    parser.add_argument('--poll-interval', type=float, default=0.2, help='名單輪詢間隔（秒）')
+    parser.add_argument('--exports', type=int, default=5, help='分組表與分組圖各匯出幾次')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', metavar='名稱', help='將結果存為基準')
+    parser.add_argument('--compare', metavar='名稱', help='與既有基準比較')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定退步的比例（預設 0.2 = 20%%）')
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='p95 至少增加多少毫秒才算退步')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json'), encoding='utf-8') as f:
+            baseline = json.load(f)
+        # 使用與基準相同的參數，結果才能比較
+        for key, value in baseline['params'].items():
+            setattr(args, key, value)
+
+    report = run(args)
+    print_report(report, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'已儲存基準：{path}')
+
+    if baseline:
+        found = regressions(report, baseline, args.threshold, args.min_delta_ms)
+        if found:
+            print('效能退步：')
+            for item in found:
+                print(f'  {item}')
+            sys.exit(1)
+        print(f"與基準 {args.compare}（{baseline['created_at']}）相比沒有明顯退步")
+
+
+if __name__ == '__main__':
+    main()
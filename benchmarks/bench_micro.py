@@ -0,0 +1,204 @@
+"""
+微基準測試：分組、匯入解析與匯出產生
+
+以 100、1,000、10,000 位球員的合成名單（synthetic.py）測量 CPU 密集的核心函式：
+    sort_and_chunk          auto_group 的排序與每 4 人一組
+    parse_roster            import_participants 的差點、預分組解析（parse_roster_frame）
+    build_groups_workbook   export_groups 的 Excel 產生
+    build_groups_diagram    export_groups_diagram 的 HTML 產生
+
+每個項目先暖身一次，再重複測量取最小值、中位數與平均；另外以 tracemalloc
+單獨執行一次取得記憶體峰值（tracemalloc 會拖慢執行，不與計時混在一起）。
+
+結果可存為 JSON 基準（benchmarks/baselines/micro-<名稱>.json），
+之後比較時中位數時間或記憶體峰值超過門檻即以結束碼 1 結束。
+
+使用方式（於專案根目錄）：
+    python benchmarks/bench_micro.py --save local
+    python benchmarks/bench_micro.py --compare local
+    python benchmarks/bench_micro.py --sizes 100,1000 --only sort_and_chunk,parse_roster
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import generate_roster  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+def _participants(rows):
+    """合成名單轉為具備 Participant 欄位的物件，依序每 4 人一組"""
+    participants = []
+    for index, row in enumerate(rows):
+        participants.append(SimpleNamespace(
+            registration_number=f'A{index + 1:02d}',
+            member_number=row['會員編號'],
+            name=row['姓名'],
+            gender=row['性別'],
+            handicap=float(str(row['差點']).replace('+', '-')),
+            pre_group_code=str(row['預分組編號']) if row['預分組編號'] else None,
+            group_code=str(index // 4 + 1),
+            notes='',
+        ))
+    return participants
+
+
+def case_sort_and_chunk(rows):
+    from grouping import sort_and_chunk
+    participants = _participants(rows)
+    return lambda: sort_and_chunk(participants)
+
+
+def case_parse_roster(rows):
+    import pandas as pd
+    from roster_io import parse_roster_frame
+    df = pd.DataFrame(rows)
+    return lambda: parse_roster_frame(df)
+
+
+def case_build_groups_workbook(rows):
+    from roster_io import build_groups_workbook
+    participants = _participants(rows)
+    return lambda: build_groups_workbook('微基準測試', participants)
+
+
+def case_build_groups_diagram(rows):
+    from roster_io import build_groups_diagram
+    participants = _participants(rows)
+    return lambda: build_groups_diagram(participants)
+
+
+CASES = {
+    'sort_and_chunk': case_sort_and_chunk,
+    'parse_roster': case_parse_roster,
+    'build_groups_workbook': case_build_groups_workbook,
+    'build_groups_diagram': case_build_groups_diagram,
+}
+
+
+def _rounds_for(size, rounds):
+    # 大名單的單次執行已足夠長，減少重複次數
+    return max(3, rounds * 1000 // max(size, 1000))
+
+
+def measure(func, rounds):
+    func()  # 暖身
+
+    times = []
+    for _ in range(rounds):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'rounds': rounds,
+        'min_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'mean_ms': round(statistics.mean(times), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(sizes, names, rounds, seed):
+    results = {}
+    for size in sizes:
+        rows = generate_roster(size, seed)
+        for name in names:
+            result = measure(CASES[name](rows), _rounds_for(size, rounds))
+            results[f'{name}[{size}]'] = result
+            print(f"{name + f'[{size}]':<32}{result['rounds']:>7}{result['min_ms']:>11.2f}"
+                  f"{result['median_ms']:>11.2f}{result['mean_ms']:>11.2f}{result['peak_kb']:>12.1f}",
+                  flush=True)
+    return results
+
+
+def regressions(results, baseline, time_threshold, memory_threshold, min_delta_ms):
+    """中位數時間（且至少慢 min_delta_ms 毫秒）或記憶體峰值超過門檻的項目"""
+    found = []
+    for key, result in results.items():
+        base = baseline['results'].get(key)
+        if not base:
+            continue
+        if result['median_ms'] > base['median_ms'] * (1 + time_threshold) \
+                and result['median_ms'] - base['median_ms'] >= min_delta_ms:
+            found.append(f"{key}：中位數 {base['median_ms']} → {result['median_ms']} ms")
+        if result['peak_kb'] > base['peak_kb'] * (1 + memory_threshold):
+            found.append(f"{key}：記憶體峰值 {base['peak_kb']} → {result['peak_kb']} KiB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help='名單人數，以逗號分隔')
+    parser.add_argument('--only', help='只執行指定項目，以逗號分隔')
+    parser.add_argument('--rounds', type=int, default=10, help='1,000 人以下名單的重複次數')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', metavar='名稱', help='將結果存為基準')
+    parser.add_argument('--compare', metavar='名稱', help='與既有基準比較')
+    parser.add_argument('--time-threshold', type=float, default=0.25, help='中位數時間退步門檻（比例）')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='中位數至少慢多少毫秒才算退步')
+    parser.add_argument('--memory-threshold', type=float, default=0.25, help='記憶體峰值退步門檻（比例）')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    names = args.only.split(',') if args.only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f'未知的項目：{", ".join(unknown)}（可用：{", ".join(CASES)}）')
+
+    print(f"{'項目':<30}{'次數':>7}{'最小 ms':>11}{'中位數 ms':>10}{'平均 ms':>11}{'峰值 KiB':>11}")
+    results = run(sizes, names, args.rounds, args.seed)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': f'{platform.system()} {platform.machine()} / Python {platform.python_version()}',
+        'seed': args.seed,
+        'results': results,
+    }
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'micro-{args.save}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'已儲存基準：{path}')
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'micro-{args.compare}.json'), encoding='utf-8') as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.time_threshold, args.memory_threshold, args.min_delta_ms)
+        if found:
+            print('效能退步：')
+            for item in found:
+                print(f'  {item}')
+            sys.exit(1)
+        print(f"與基準 {args.compare}（{baseline['created_at']}）相比沒有明顯退步")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+連線池效能測試
+
+以 db_engine.engine_options 建立 engine，模擬 gunicorn 單一 worker 中多個執行緒
+同時取得連線並執行短查詢，比較不同連線池大小下取得連線的等待時間與使用率。
+
+預設使用暫存的 SQLite 檔案；設定 DATABASE_URL 時改用該資料庫（例如本機 PostgreSQL）。
+
+使用方式（於專案根目錄）：
+    python benchmarks/bench_pool.py --threads 8 --pool-sizes 2,4,8
+    DATABASE_URL=postgresql://localhost/golf_bench python benchmarks/bench_pool.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from db_engine import engine_options, pool_metrics  # noqa: E402
+
+
+def build_config(uri, pool_size, max_overflow):
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    config.update({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'DB_POOL_SIZE': pool_size,
+        'DB_MAX_OVERFLOW': max_overflow,
+        'SQLITE_POOL_SIZE': pool_size,
+        'SQLITE_MAX_OVERFLOW': max_overflow,
+    })
+    return config
+
+
+def run(uri, threads, pool_size, max_overflow, duration, work_ms):
+    engine = create_engine(uri, **engine_options(build_config(uri, pool_size, max_overflow)))
+    deadline = time.perf_counter() + duration
+    counts = [0] * threads
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1')).scalar()
+                # 模擬請求在持有連線期間的處理時間
+                time.sleep(work_ms / 1000)
+            counts[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    metrics = pool_metrics(engine)
+    engine.dispose()
+    return sum(counts) / duration, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool-sizes', default='2,4,8')
+    parser.add_argument('--max-overflow', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=5.0, help='秒')
+    parser.add_argument('--work-ms', type=float, default=5.0, help='每次持有連線的時間')
+    args = parser.parse_args()
+
+    uri = os.getenv('DATABASE_URL') or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='golf-pool-'), 'pool.db')}"
+    print(f'資料庫：{uri.split("@")[-1]}，{args.threads} 執行緒，每次持有連線 {args.work_ms} ms')
+    print(f"{'pool':>6}{'req/s':>10}{'wait p50':>10}{'wait p95':>10}{'wait max':>10}{'timeouts':>10}")
+    for pool_size in (int(size) for size in args.pool_sizes.split(',')):
+        throughput, metrics = run(uri, args.threads, pool_size, args.max_overflow, args.duration, args.work_ms)
+        wait = metrics['wait_ms']
+        print(f"{pool_size:>6}{throughput:>10.1f}{wait['p50']:>10.2f}{wait['p95']:>10.2f}"
+              f"{wait['max']:>10.2f}{metrics['timeouts']:>10}")
+
+
+if __name__ == '__main__':
+    main()
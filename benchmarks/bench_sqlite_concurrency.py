@@ -0,0 +1,132 @@
+"""
+SQLite 併發效能測試：報到寫入與名單讀取混合
+
+多個執行緒同時對同一場賽事送出報到（PUT check-in）與名單查詢（GET participants），
+統計吞吐量、延遲百分位數與失敗次數（例如 "database is locked"）。
+
+使用方式（於專案根目錄）：
+    python benchmarks/bench_sqlite_concurrency.py
+    python benchmarks/bench_sqlite_concurrency.py --no-tuning   # 關閉 WAL/PRAGMA 調校做比較
+"""
+
+import argparse
+import contextlib
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def build_app(db_path, tuning):
+    from app import create_app
+    return create_app('development', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SQLITE_TUNING': tuning,
+    })
+
+
+def seed(app, players):
+    from extensions import db
+    from models import Tournament, Participant
+    with app.app_context():
+        db.create_all()
+        tournament = Tournament(name='併發測試', date=datetime.date.today())
+        db.session.add(tournament)
+        db.session.flush()
+        for i in range(players):
+            db.session.add(Participant(
+                tournament_id=tournament.id,
+                name=f'球員{i + 1}',
+                gender='F' if i % 5 == 0 else 'M',
+                handicap=round(random.uniform(0, 36), 1),
+                member_number=f'M{i + 1:04d}',
+                registration_number=f'A{i + 1:02d}',
+                group_code=str(i // 4 + 1),
+                display_order=i + 1
+            ))
+        db.session.commit()
+        return tournament.id, [p.id for p in Participant.query.filter_by(tournament_id=tournament.id)]
+
+
+def worker(app, tournament_id, participant_ids, read_ratio, deadline, results, seed_value):
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+        if rng.random() < read_ratio:
+            kind = 'roster_read'
+            start = time.perf_counter()
+            response = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+        else:
+            kind = 'check_in'
+            status = rng.choice(['checked_in', 'not_checked_in'])
+            start = time.perf_counter()
+            response = client.put(
+                f'/api/v1/participants/{rng.choice(participant_ids)}/check-in',
+                json={
+                    'check_in_status': status,
+                    'check_in_time': datetime.datetime.utcnow().isoformat() if status == 'checked_in' else None
+                }
+            )
+        elapsed = (time.perf_counter() - start) * 1000
+        results.append((kind, elapsed, response.status_code == 200))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=120)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='秒')
+    parser.add_argument('--read-ratio', type=float, default=0.8)
+    parser.add_argument('--no-tuning', action='store_true')
+    args = parser.parse_args()
+
+    random.seed(42)
+    workdir = tempfile.mkdtemp(prefix='golf-bench-')
+    app = build_app(os.path.join(workdir, 'bench.db'), tuning=not args.no_tuning)
+    tournament_id, participant_ids = seed(app, args.players)
+
+    results = []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(app, tournament_id, participant_ids, args.read_ratio, deadline, results, i)
+        )
+        for i in range(args.threads)
+    ]
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print(f"SQLite 調校：{'關閉' if args.no_tuning else '開啟'}，"
+          f"{args.threads} 執行緒，{args.players} 位參賽者，{args.duration:.0f} 秒")
+    print(f"{'操作':<12}{'次數':>8}{'失敗':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind in ('roster_read', 'check_in'):
+        latencies = [elapsed for k, elapsed, _ in results if k == kind]
+        failures = sum(1 for k, _, ok in results if k == kind and not ok)
+        print(f"{kind:<12}{len(latencies):>8}{failures:>8}{len(latencies) / args.duration:>10.1f}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}"
+              f"{percentile(latencies, 99):>10.1f}")
+    if results:
+        print(f"平均延遲 {statistics.mean(e for _, e, _ in results):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+啟動時間測試：模組載入時間與第一個 /health 200 的時間
+
+1. 以 python -X importtime 載入 app，列出載入時間最久的模組，
+   並確認 pandas/openpyxl 沒有在啟動時載入
+2. 在子程序中計時 create_app()
+3. 啟動伺服器（有安裝 gunicorn 時使用 gunicorn "app:create_app()"，否則使用
+   Flask 內建伺服器），從啟動到 /health 第一次回應 200 的時間
+
+使用方式（於專案根目錄）：
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 15
+"""
+
+import argparse
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在匯入、匯出時才需要的套件，不應出現在啟動載入的模組中
+HEAVY_MODULES = ('pandas', 'openpyxl', 'numpy')
+
+
+def _env(db_path):
+    env = dict(os.environ)
+    env.update({
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'PYTHONUNBUFFERED': '1',
+    })
+    return env
+
+
+def import_times(env, statement='import app'):
+    """以 -X importtime 載入，回傳 [(累計微秒, 自身微秒, 模組名稱, 層級)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), name.strip(), depth))
+    return rows
+
+
+def time_create_app(env):
+    statement = (
+        'import time; start = time.perf_counter(); '
+        'from app import create_app; create_app(); '
+        'print((time.perf_counter() - start) * 1000)'
+    )
+    result = subprocess.run([sys.executable, '-c', statement], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(port):
+    if importlib.util.find_spec('gunicorn'):
+        return 'gunicorn', [sys.executable, '-m', 'gunicorn', 'app:create_app()',
+                            '--bind', f'127.0.0.1:{port}', '--workers', '1', '--threads', '4']
+    return 'flask', [sys.executable, '-c',
+                     f'from app import create_app; create_app().run(host="127.0.0.1", port={port})']
+
+
+def time_to_first_health(env, timeout=60):
+    """從啟動伺服器到 /health 回應 200 的毫秒數"""
+    port = _free_port()
+    name, command = server_command(port)
+    url = f'http://127.0.0.1:{port}/health'
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'{name} 伺服器啟動失敗（結束碼 {process.returncode}）')
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return name, (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f'{timeout} 秒內 /health 沒有回應 200')
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='啟動時間測試')
+    parser.add_argument('--runs', type=int, default=3, help='每項測試重複次數（取中位數）')
+    parser.add_argument('--top', type=int, default=10, help='列出載入最久的模組數')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = _env(os.path.join(workdir, 'startup.db'))
+
+        rows = import_times(env)
+        loaded = {name for _, _, name, _ in rows}
+        app_us = next(cumulative for cumulative, _, name, _ in rows if name == 'app')
+        print(f'import app：{app_us / 1000:.1f} ms')
+        print(f'{"模組":<40} {"累計ms":>9} {"自身ms":>9}')
+        top_level = sorted((row for row in rows if row[3] <= 1 and row[2] != 'app'), reverse=True)
+        for cumulative, self_us, name, _ in top_level[:args.top]:
+            print(f'{name:<40} {cumulative / 1000:>9.1f} {self_us / 1000:>9.1f}')
+
+        eager = [name for name in HEAVY_MODULES if name in loaded]
+        if eager:
+            print(f'警告：啟動時載入了 {", ".join(eager)}')
+        else:
+            heavy_us = max(c for c, _, n, _ in import_times(env, 'import pandas, openpyxl') if n in HEAVY_MODULES)
+            print(f'pandas/openpyxl 延後載入（首次匯入/匯出時才需 {heavy_us / 1000:.1f} ms）')
+
+        create_ms = [time_create_app(env) for _ in range(args.runs)]
+        print(f'import + create_app()：中位數 {statistics.median(create_ms):.1f} ms')
+
+        results = [time_to_first_health(env) for _ in range(args.runs)]
+        server = results[0][0]
+        health_ms = [ms for _, ms in results]
+        print(f'{server} 啟動到第一個 /health 200：中位數 {statistics.median(health_ms):.1f} ms'
+              f'（最快 {min(health_ms):.1f}，最慢 {max(health_ms):.1f}）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+多檔批次匯入
+
+一次匯入整季的報名表（zip 檔或資料夾），例如：
+    20241月報名表.xlsx、20241月報名表-1.xlsx、20241月報名表-預編組名單.xlsx、202501月報名表.xlsx
+
+檔名以「-預編組名單」（或「-預編組」）結尾的是預編組表，以 apply_pregroups 寫入
+對應賽事的預編組代號；其餘為報名表，以 replace_roster 取代賽事名單。
+同一批中報名表先匯入，預編組表再套用到新的名單上。
+
+每個檔案依下列順序對應到賽事（預編組表以去掉後綴的檔名比對）：
+1. 呼叫端指定的對照（檔名 → 賽事編號）
+2. 賽事名稱與檔名（不含副檔名）相同
+3. 由檔名解析出年月（「20241月」、「202501月」），該月份只有一場賽事
+對應不到的檔案可選擇自動建立賽事（以該月一日為賽事日期），同一個月只建立一場。
+
+同一場賽事對應到多個同類檔案時，依序比較：
+1. 對應方式的優先順序
+2. 不帶複本後綴（「-1」、「(2)」）的檔案優先，例如 20241月報名表.xlsx 勝過 20241月報名表-1.xlsx
+由排序最前的檔案匯入，其餘列為略過並註明由哪個檔案匯入；兩者都相同則視為衝突，
+這些檔案都不匯入。
+
+解析（pandas 讀取 Excel，CPU 密集）在程序池中平行執行；寫入在主程序中
+依賽事逐一進行，每場賽事一個交易，某個檔案失敗不影響其他賽事。
+"""
+
+import io
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from extensions import db
+from models import Tournament
+from roster_io import read_roster, replace_roster, read_pregroups, apply_pregroups
+
+SHEET_EXTENSIONS = ('.xlsx',)
+
+# 對應方式的優先順序（數字小者優先）
+MATCH_PRIORITY = {'mapping': 0, 'name': 1, 'date': 2, 'created': 3}
+
+ROSTER = 'roster'
+PREGROUPS = 'pregroups'
+
+_YEAR_MONTH = re.compile(r'(\d{4})[-_/.]?(\d{1,2})月')
+
+# 預編組表的檔名後綴，例如「20241月報名表-預編組名單」
+_PREGROUP_SUFFIX = re.compile(r'[-_ ]*預編組(名單)?$')
+
+# 複本後綴，例如「20241月報名表-1」、「20241月報名表 (2)」
+_COPY_SUFFIX = re.compile(r'(?:[-_ ]\d{1,2}|\s*[(（]\d{1,2}[)）])$')
+
+# zip 檔內未標示 UTF-8 的檔名，依序嘗試的編碼（Windows 壓縮的中文檔名多為 cp950）
+_ZIP_NAME_ENCODINGS = ('utf-8', 'cp950', 'gbk')
+
+
+def _zip_member_name(info):
+    if info.flag_bits & 0x800:
+        return info.filename
+    raw = info.filename.encode('cp437')
+    for encoding in _ZIP_NAME_ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def _is_sheet(name):
+    base = os.path.basename(name)
+    return base.lower().endswith(SHEET_EXTENSIONS) and not base.startswith(('~$', '.'))
+
+
+def collect_sheets(source):
+    """
+    從 zip 檔（路徑或檔案物件）或資料夾收集報名表，回傳 [(檔名, 內容 bytes)]，依檔名排序
+
+    不支援的來源拋出 ValueError。
+    """
+    sheets = []
+    if isinstance(source, str) and os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in files:
+                if _is_sheet(name):
+                    with open(os.path.join(root, name), 'rb') as f:
+                        sheets.append((name, f.read()))
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(_zip_member_name(info))
+                if not info.is_dir() and _is_sheet(name):
+                    sheets.append((name, archive.read(info)))
+    else:
+        raise ValueError('請提供 zip 檔或資料夾')
+
+    return sorted(sheets, key=lambda sheet: sheet[0])
+
+
+def sheet_month(filename):
+    """由檔名解析出年月，例如「20241月報名表.xlsx」→ (2024, 1)；解析不到時回傳 None"""
+    match = _YEAR_MONTH.search(filename)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return year, month
+
+
+def _stem(filename):
+    return os.path.splitext(filename)[0].strip()
+
+
+def sheet_kind(filename):
+    """檔案類型：預編組表（PREGROUPS）或報名表（ROSTER）"""
+    return PREGROUPS if _PREGROUP_SUFFIX.search(_stem(filename)) else ROSTER
+
+
+def _base_stem(filename):
+    """去掉預編組後綴的檔名（不含副檔名），用於比對賽事名稱與建立賽事"""
+    return _PREGROUP_SUFFIX.sub('', _stem(filename)).strip()
+
+
+def is_copy(filename):
+    """檔名是否帶複本後綴（「-1」、「(2)」）"""
+    return bool(_COPY_SUFFIX.search(_base_stem(filename)))
+
+
+def match_tournaments(filenames, tournaments, mapping=None):
+    """
+    將檔名對應到賽事，回傳 {檔名: (賽事編號或 None, 對應方式或原因)}
+
+    tournaments 為 [(id, name, date)]。
+    """
+    mapping = mapping or {}
+    by_name = {}
+    by_month = {}
+    for tournament_id, name, tournament_date in tournaments:
+        by_name.setdefault(name.strip(), []).append(tournament_id)
+        if tournament_date:
+            by_month.setdefault((tournament_date.year, tournament_date.month), []).append(tournament_id)
+
+    matches = {}
+    for filename in filenames:
+        stem = _base_stem(filename)
+        month = sheet_month(filename)
+        if filename in mapping:
+            matches[filename] = (int(mapping[filename]), 'mapping')
+        elif len(by_name.get(stem, [])) == 1:
+            matches[filename] = (by_name[stem][0], 'name')
+        elif month and len(by_month.get(month, [])) == 1:
+            matches[filename] = (by_month[month][0], 'date')
+        elif month and len(by_month.get(month, [])) > 1:
+            matches[filename] = (None, f'{month[0]} 年 {month[1]} 月有多場賽事，請指定對照')
+        else:
+            matches[filename] = (None, '找不到對應的賽事')
+    return matches
+
+
+def _parse_sheet(filename, content):
+    """在子程序中解析單一報名表或預編組表，回傳 (檔名, 資料列或 None, 錯誤訊息, 耗時毫秒)"""
+    start = time.perf_counter()
+    read = read_pregroups if sheet_kind(filename) == PREGROUPS else read_roster
+    try:
+        rows = read(io.BytesIO(content))
+        error = None
+    except Exception as e:
+        rows, error = None, str(e)
+    return filename, rows, error, round((time.perf_counter() - start) * 1000, 1)
+
+
+def parse_sheets(sheets, workers):
+    """以程序池平行解析報名表，回傳 {檔名: (資料列, 錯誤訊息, 耗時毫秒)}"""
+    if workers <= 1 or len(sheets) <= 1:
+        results = [_parse_sheet(filename, content) for filename, content in sheets]
+    else:
+        # 使用 spawn：請求執行緒所在的程序可能有其他執行緒持有鎖，fork 並不安全
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            results = list(executor.map(
+                _parse_sheet, [filename for filename, _ in sheets], [content for _, content in sheets]
+            ))
+    return {filename: (rows, error, parse_ms) for filename, rows, error, parse_ms in results}
+
+
+def resolve_claims(targets):
+    """
+    決定同一場賽事的同類檔案由哪個匯入
+
+    targets 為 {檔名: (賽事鍵, 對應方式)}，賽事鍵為賽事編號或待建立賽事的 ('new', 年月)，
+    對應不到的檔案不列入。回傳 {檔名: 略過原因}，由它匯入的檔案不在其中。
+    """
+    claims = {}
+    for filename, (target, matched_by) in targets.items():
+        rank = (MATCH_PRIORITY[matched_by], is_copy(filename))
+        claims.setdefault((sheet_kind(filename), target), []).append((rank, filename))
+
+    skipped = {}
+    for claim in claims.values():
+        claim.sort()
+        best_rank, winner = claim[0]
+        tied = [filename for rank, filename in claim if rank == best_rank]
+        for rank, filename in claim:
+            if len(tied) > 1:
+                if filename in tied:
+                    others = '、'.join(name for name in tied if name != filename)
+                    skipped[filename] = f'與 {others} 對應到同一場賽事'
+                else:
+                    skipped[filename] = f'同一場賽事另有優先的檔案：{"、".join(tied)}'
+            elif filename != winner:
+                skipped[filename] = f'賽事已由 {winner} 匯入'
+    return skipped
+
+
+def _create_tournament(filename):
+    year, month = sheet_month(filename)
+    tournament = Tournament(name=_base_stem(filename), date=date(year, month, 1))
+    db.session.add(tournament)
+    db.session.commit()
+    return tournament.id
+
+
+def _write(entry, tournament_id, kind, rows):
+    """將一個檔案寫入賽事（一個交易），結果記錄在 entry"""
+    write_started = time.perf_counter()
+    try:
+        if kind == PREGROUPS:
+            result = apply_pregroups(tournament_id, rows)
+            entry.update(imported=result['updated'], cleared=result['cleared'],
+                         unmatched=len(result['unmatched']), ambiguous=len(result['ambiguous']))
+        else:
+            entry['imported'] = replace_roster(tournament_id, rows)
+        db.session.commit()
+        entry['status'] = 'imported'
+    except Exception as e:
+        db.session.rollback()
+        print(f"批次匯入 {entry['file']} 時發生錯誤：{str(e)}")
+        entry.update(status='failed', error=str(e))
+    entry['write_ms'] = round((time.perf_counter() - write_started) * 1000, 1)
+
+
+def bulk_import(sheets, mapping=None, create_missing=False, dry_run=False, workers=2):
+    """
+    批次匯入報名表與預編組表，回傳匯入報告
+
+    sheets 為 collect_sheets 的結果；mapping 為 {檔名: 賽事編號}。
+    dry_run 時只解析與對應，不寫入資料庫。
+    """
+    started = time.perf_counter()
+    filenames = [filename for filename, _ in sheets]
+
+    tournaments = db.session.query(Tournament.id, Tournament.name, Tournament.date).all()
+    known_ids = {tournament_id for tournament_id, _, _ in tournaments}
+    matches = match_tournaments(filenames, tournaments, mapping)
+
+    # 對應不到但可以自動建立的檔案，同一個月份視為同一場待建立的賽事
+    targets = {}
+    for filename, (tournament_id, matched_by) in matches.items():
+        if tournament_id is not None:
+            targets[filename] = (tournament_id, matched_by)
+        elif create_missing and sheet_month(filename):
+            targets[filename] = (('new', sheet_month(filename)), 'created')
+    skipped = resolve_claims(targets)
+
+    parse_started = time.perf_counter()
+    parsed = parse_sheets(sheets, workers)
+    parse_wall_ms = round((time.perf_counter() - parse_started) * 1000, 1)
+
+    entries = {}
+    for filename in filenames:
+        tournament_id, matched_by = matches[filename]
+        rows, parse_error, parse_ms = parsed[filename]
+        entries[filename] = {
+            'file': filename,
+            'kind': sheet_kind(filename),
+            'tournament_id': tournament_id,
+            'matched_by': matched_by if tournament_id is not None else None,
+            'rows': len(rows) if rows is not None else None,
+            'parse_ms': parse_ms,
+            'write_ms': None,
+        }
+
+    # 報名表先匯入（可能建立賽事），預編組表再套用到新的名單
+    created = {}
+    ordered = sorted(filenames, key=lambda filename: sheet_kind(filename) == PREGROUPS)
+    for filename in ordered:
+        entry = entries[filename]
+        kind = entry['kind']
+        rows, parse_error, _ = parsed[filename]
+        target, matched_by = targets.get(filename, (None, matches[filename][1]))
+
+        if parse_error:
+            entry.update(status='failed', error=f'解析失敗：{parse_error}')
+            continue
+        if target is None:
+            entry.update(status='skipped', error=matched_by)
+            continue
+        if isinstance(target, int) and target not in known_ids:
+            entry.update(status='skipped', error=f'找不到賽事：{target}')
+            continue
+        if filename in skipped:
+            entry.update(status='skipped', error=skipped[filename])
+            continue
+
+        tournament_id = target
+        if isinstance(target, tuple):
+            entry['matched_by'] = 'created'
+            if kind == ROSTER and dry_run:
+                created[target] = None
+                entry['status'] = 'would_create'
+                continue
+            if kind == ROSTER:
+                tournament_id = created[target] = _create_tournament(filename)
+            elif target in created:
+                tournament_id = created[target]
+            else:
+                entry.update(status='skipped', error='找不到對應的賽事（同月份沒有可建立賽事的報名表）')
+                continue
+            entry['tournament_id'] = tournament_id
+
+        if dry_run:
+            entry['status'] = 'would_import'
+            continue
+
+        _write(entry, tournament_id, kind, rows)
+
+    files = [entries[filename] for filename in filenames]
+    summary = {}
+    for entry in files:
+        summary[entry['status']] = summary.get(entry['status'], 0) + 1
+
+    return {
+        'dry_run': dry_run,
+        'workers': workers,
+        'summary': summary,
+        'parse_wall_ms': parse_wall_ms,
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+        'files': files,
+    }
+
+
+def format_report(report):
+    """將匯入報告整理為文字表格（CLI 使用）"""
+    lines = [
+        f"{'檔案':<36} {'賽事':>6} {'對應':<8} {'筆數':>6} {'解析ms':>9} {'寫入ms':>9}  狀態",
+    ]
+    for entry in report['files']:
+        lines.append(
+            f"{entry['file']:<36} {entry['tournament_id'] or '-':>6} {entry['matched_by'] or '-':<8} "
+            f"{entry['rows'] if entry['rows'] is not None else '-':>6} {entry['parse_ms']:>9} "
+            f"{entry['write_ms'] if entry['write_ms'] is not None else '-':>9}  {entry['status']}"
+            + (f"（{entry['error']}）" if entry.get('error') else '')
+        )
+    summary = '，'.join(f'{status} {count}' for status, count in sorted(report['summary'].items()))
+    lines.append(f"共 {len(report['files'])} 個檔案：{summary}；"
+                 f"解析 {report['parse_wall_ms']} ms（{report['workers']} 個程序），總計 {report['total_ms']} ms")
+    return '\n'.join(lines)
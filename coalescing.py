@@ -0,0 +1,187 @@
+"""
+拖曳移動的合併
+
+拖曳時前端會為同一位參賽者連續送出多個移動（經過的組別與最後放下的位置）。每次拖曳開始時
+前端產生一個 drag_id，同一次拖曳內的移動帶遞增的序號 seq；序號只在同一個 drag_id 內比較，
+所以另一台電腦或重新整理後的新拖曳從 seq=1 開始也會被接受。
+
+每個 worker 在記憶體中合併移動，請求執行緒不等待、也不寫入資料庫：
+- 序號不大於同一個 drag_id 已收到的序號：過期，直接拒絕
+- 否則成為該參賽者「等待中」的移動並立即回應 202；已有等待中的移動時直接取代它（合併）
+- 最後一個移動之後 MOVE_COALESCE_MS 毫秒內沒有新的移動（持續拖曳時最多等
+  MOVE_COALESCE_MAX_MS 毫秒），由背景寫入執行緒寫入資料庫，只寫一次
+
+寫入失敗（參賽者資料已被其他人變更、資料庫錯誤）記錄在參賽者的 move_failure，
+前端以 GET .../move?drag_id=&seq= 輪詢結果（applied、failed、pending、superseded），
+任何 worker 都能回答。不同 worker 各自合併，最後仍由資料庫的條件式更新
+（同一個 drag_id 的 move_seq < seq 才寫入）確保舊的序號不會覆蓋新的位置。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from extensions import db
+import operations
+
+STALE = 'stale'
+QUEUED = 'queued'
+
+# 最多記住多少個（參賽者, drag_id）收到的序號
+MAX_TRACKED = 10000
+
+MOVE_FAILED_MESSAGE = '參賽者資料已被其他人變更，移動未寫入，請重新整理'
+
+
+class MoveCoalescer:
+    def __init__(self):
+        self.window = 0.15
+        self.max_wait = 1.0
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._due = {}
+        self._writing = {}
+        self._latest = OrderedDict()
+        self._writer = None
+        self.stats = {'applied': 0, 'coalesced': 0, 'stale': 0, 'failed': 0}
+
+    def init_app(self, app):
+        self.window = app.config['MOVE_COALESCE_MS'] / 1000
+        self.max_wait = max(app.config['MOVE_COALESCE_MAX_MS'] / 1000, self.window)
+        app.extensions['move_coalescer'] = self
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+            self._due.clear()
+            self._latest.clear()
+            self.stats = {'applied': 0, 'coalesced': 0, 'stale': 0, 'failed': 0}
+
+    def submit(self, app, participant_id, move):
+        """
+        登記一個移動（含 tournament_id、drag_id、seq、group_code、prev_id、next_id 的 dict），
+        回傳 STALE 或 QUEUED；QUEUED 的移動由背景寫入執行緒在 app 的應用程式環境中寫入
+        """
+        key = (participant_id, move['drag_id'])
+        now = time.monotonic()
+        with self._condition:
+            if move['seq'] <= self._latest.get(key, 0):
+                self.stats['stale'] += 1
+                return STALE
+
+            self._latest[key] = move['seq']
+            self._latest.move_to_end(key)
+            while len(self._latest) > MAX_TRACKED:
+                self._latest.popitem(last=False)
+
+            if participant_id in self._pending:
+                self.stats['coalesced'] += 1
+            self._pending[participant_id] = dict(move, app=app)
+            # 最後一個移動之後等待 window；從第一個等待中的移動起最多等 max_wait
+            first = self._due[participant_id][1] if participant_id in self._due else now
+            self._due[participant_id] = (min(now + self.window, first + self.max_wait), first)
+
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='move-writer', daemon=True)
+                self._writer.start()
+            self._condition.notify()
+            return QUEUED
+
+    def is_pending(self, participant_id, drag_id):
+        """本 worker 是否還有這次拖曳尚未寫完的移動"""
+        with self._condition:
+            return any(
+                move is not None and move['drag_id'] == drag_id
+                for move in (self._pending.get(participant_id), self._writing.get(participant_id))
+            )
+
+    def flush(self, timeout=5.0):
+        """等待目前所有等待中與寫入中的移動寫完（測試與關閉前使用），回傳是否已清空"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def _take_due(self):
+        """等到有移動到期，取出到期的移動；沒有等待中的移動時回傳 None，寫入執行緒結束"""
+        with self._condition:
+            while True:
+                if not self._due:
+                    self._writer = None
+                    self._condition.notify_all()
+                    return None
+                now = time.monotonic()
+                due = [pid for pid, (at, _) in self._due.items() if at <= now]
+                if due:
+                    batch = []
+                    for participant_id in due:
+                        del self._due[participant_id]
+                        move = self._pending.pop(participant_id)
+                        self._writing[participant_id] = move
+                        batch.append((participant_id, move))
+                    return batch
+                self._condition.wait(min(at for at, _ in self._due.values()) - now)
+
+    def _run(self):
+        while True:
+            batch = self._take_due()
+            if batch is None:
+                return
+            for participant_id, move in batch:
+                applied = write_move(participant_id, move)
+                with self._condition:
+                    self._writing.pop(participant_id, None)
+                    if applied:
+                        self.stats['applied'] += 1
+                    elif applied is not None:
+                        self.stats['failed'] += 1
+                    self._condition.notify_all()
+
+
+def write_move(participant_id, move):
+    """
+    在移動所屬應用程式的環境中寫入並提交，回傳是否寫入
+
+    同一次拖曳已寫入更新的序號時回傳 None（不算失敗）；其他未寫入的情況記錄在參賽者的 move_failure。
+    """
+    with move['app'].app_context():
+        tournament_id = move['tournament_id']
+        try:
+            applied, order_key = operations.move_if_newer(
+                tournament_id, participant_id, move['drag_id'], move['seq'], move['group_code'],
+                prev_id=move['prev_id'],
+                next_id=move['next_id']
+            )
+            if applied:
+                operations.touch_tournament(tournament_id, pairings=True)
+                db.session.commit()
+                operations.schedule_rebalance_if_needed(tournament_id, order_key)
+                return True
+
+            db.session.rollback()
+            if operations.move_superseded(participant_id, move['drag_id'], move['seq']):
+                return None
+            error = MOVE_FAILED_MESSAGE
+        except operations.NotFoundError:
+            # 參賽者已被刪除，沒有可以記錄的地方；輪詢時會得到 404
+            db.session.rollback()
+            return False
+        except Exception as e:
+            db.session.rollback()
+            print(f"寫入拖曳移動時發生錯誤：{str(e)}")
+            error = str(e)
+
+        try:
+            operations.record_move_failure(participant_id, move['drag_id'], move['seq'], error)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"記錄拖曳移動失敗時發生錯誤：{str(e)}")
+        return False
+
+
+move_coalescer = MoveCoalescer()
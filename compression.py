@@ -0,0 +1,147 @@
+"""
+回應壓縮
+
+所有回應在 after_request 統一處理：依 Accept-Encoding 協商 br（有安裝 brotli 時）或 gzip，
+只壓縮 JSON、HTML 等文字類型且大於 COMPRESS_MIN_SIZE 位元組的回應；
+xlsx、zip、圖片本身已經壓縮過，不再處理。
+
+- 一般回應：整個內容壓縮一次，並設定 Content-Encoding、Vary: Accept-Encoding
+- 串流回應（streaming.py）：逐區塊壓縮，不必等整份內容產生
+- 來自賽事快照的回應：端點以 cache_compressed() 標記快取鍵（含版本號），
+  壓縮後的內容保存在 LRU 中，同一版本不再重複壓縮
+"""
+
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:  # 未安裝時只提供 gzip
+    brotli = None
+
+
+def cache_compressed(*key):
+    """標記本次回應的內容在 key 之下不會改變，壓縮結果可以快取（key 須包含版本號）"""
+    g.compression_cache_key = key
+
+
+def _supported_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+class ResponseCompressor:
+    def __init__(self):
+        self.min_size = 1024
+        self.level = 6
+        self.mimetypes = ()
+        self._cache = OrderedDict()
+        self._cache_size = 128
+        self._lock = threading.Lock()
+        self.stats = {'compressed': 0, 'streamed': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+        self.mimetypes = tuple(app.config['COMPRESS_MIMETYPES'])
+        self._cache_size = app.config['COMPRESS_CACHE_SIZE']
+        app.after_request(self.after_request)
+        app.extensions['compression'] = self
+
+    def negotiate(self):
+        """依 Accept-Encoding 的權重選擇編碼，不接受壓縮時回傳 None"""
+        best, best_quality = None, 0
+        for encoding in _supported_encodings():
+            quality = request.accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _should_compress(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or request.method == 'HEAD':
+            return False
+        return response.mimetype in self.mimetypes
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=min(self.level, 11))
+        return gzip.compress(data, compresslevel=self.level)
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=min(self.level, 11))
+            compress, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compress, finish = compressor.compress, compressor.flush
+        try:
+            for chunk in chunks:
+                data = compress(chunk)
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def _cached(self, key, data, encoding):
+        key = key + (encoding,)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return self._cache[key]
+        compressed = self.compress(data, encoding)
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def after_request(self, response):
+        if not self._should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        # send_file 預設直接傳送檔案，不讀入記憶體，也不壓縮
+        if response.direct_passthrough:
+            return response
+
+        key = g.get('compression_cache_key')
+        if response.is_streamed and key is None:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+            self.stats['streamed'] += 1
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressed = self._cached(key, data, encoding) if key else self.compress(data, encoding)
+            response.set_data(compressed)
+            self.stats['compressed'] += 1
+            self.stats['bytes_in'] += len(data)
+            self.stats['bytes_out'] += len(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # 不同編碼的內容不同，強 ETag 改為弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = ResponseCompressor()
@@ -1,4 +1,10 @@
 import os
+import re
+
+def _gunicorn_threads():
+    # 從 GUNICORN_CMD_ARGS（render.yaml）讀取每個 worker 的執行緒數
+    match = re.search(r'--threads[= ](\d+)', os.getenv('GUNICORN_CMD_ARGS', ''))
+    return int(os.getenv('GUNICORN_THREADS', match.group(1) if match else 4))
 
 class Config:
     # 通用配置
@@ -6,6 +12,77 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+    # SQLite 連線調校（見 db_engine.py）
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', '1') != '0'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 8))
+    SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', 8))
+
+    # 連線池（PostgreSQL 等），每個 gunicorn worker 各有一個連線池，
+    # 每個執行緒同時最多使用一條連線
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', _gunicorn_threads()))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 2))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '0') == '1'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+    DB_LOCK_TIMEOUT_MS = int(os.getenv('DB_LOCK_TIMEOUT_MS', 5000))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 60000))
+    DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', 1200))
+
+    # 唯讀副本：設定後，標記為唯讀的端點改由副本查詢
+    # 本機測試可使用第二個 SQLite 檔案，例如 sqlite:////path/to/instance/replica.db
+    SQLALCHEMY_BINDS = {'replica': re.sub(r'^postgres://', 'postgresql://', os.getenv('REPLICA_DATABASE_URL'))} \
+        if os.getenv('REPLICA_DATABASE_URL') else {}
+
+    # 一次最多配發幾個報名序號、批次新增幾位參賽者（配發期間持有計數器的寫入鎖）
+    REGISTRATION_MAX_BLOCK = int(os.getenv('REGISTRATION_MAX_BLOCK', 500))
+
+    # 管理端點（/api/v1/admin/*）使用的權杖，未設定時停用管理端點
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+    # 背景工作（jobs.py）：每個 worker 同時執行的工作數、產出檔案目錄與保留時間
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_DIR = os.getenv('JOB_DIR', os.path.join(BASE_DIR, 'instance', 'jobs'))
+    JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', 24))
+    # 工作心跳間隔（秒）；心跳停止超過 JOB_ORPHAN_SECONDS 的工作視為 worker 重新啟動而中斷
+    JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 30))
+    JOB_ORPHAN_SECONDS = int(os.getenv('JOB_ORPHAN_SECONDS', 180))
+
+    # 就緒檢查（health.py）：資料庫探測結果快取秒數、SQLite 探測讀取的等待上限
+    HEALTH_DB_PROBE_TTL = float(os.getenv('HEALTH_DB_PROBE_TTL', 5))
+    HEALTH_DB_PROBE_TIMEOUT_MS = int(os.getenv('HEALTH_DB_PROBE_TIMEOUT_MS', 500))
+
+    # 單一請求剖析（profiling.py）：保存目錄、最多保留份數、取樣間隔
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'instance', 'profiles'))
+    PROFILE_RING_SIZE = int(os.getenv('PROFILE_RING_SIZE', 50))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 2))
+
+    # 慢查詢紀錄（querylog.py）：超過門檻（毫秒）的陳述式記錄到環狀緩衝，負值停用
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_RING_SIZE = int(os.getenv('SLOW_QUERY_RING_SIZE', 200))
+
+    # 賽事快照快取（snapshots.py）：每個 worker 保留最近使用的幾場賽事
+    SNAPSHOT_CACHE_SIZE = int(os.getenv('SNAPSHOT_CACHE_SIZE', 32))
+
+    # 回應壓縮（compression.py）：大於門檻（位元組）的文字類回應以 br 或 gzip 壓縮
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_MIMETYPES = ['application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript']
+    COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 128))
+
+    # 批次操作 API（POST /api/v1/batch）一次最多幾個子操作
+    BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', 200))
+
+    # 拖曳移動合併（coalescing.py）：同一位參賽者最後一個移動之後等待幾毫秒才寫入，持續拖曳時最多等幾毫秒
+    MOVE_COALESCE_MS = float(os.getenv('MOVE_COALESCE_MS', 150))
+    MOVE_COALESCE_MAX_MS = float(os.getenv('MOVE_COALESCE_MAX_MS', 1000))
+
+    # 批次匯入（bulk_import.py）解析報名表的程序數
+    BULK_IMPORT_WORKERS = int(os.getenv('BULK_IMPORT_WORKERS', min(4, os.cpu_count() or 1)))
+
 class DevelopmentConfig(Config):
     # 本地開發環境
     DEBUG = True
@@ -16,8 +93,8 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     # 雲端生產環境
     DEBUG = False
-    # 這裡的資料庫 URI 會在部署時設置
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///instance/golf.db')
+    # 這裡的資料庫 URI 會在部署時設置（SQLAlchemy 1.4 只接受 postgresql:// 開頭）
+    SQLALCHEMY_DATABASE_URI = re.sub(r'^postgres://', 'postgresql://', os.getenv('DATABASE_URL', 'sqlite:///instance/golf.db'))
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://gold-tawny.vercel.app')
 
 # 環境配置映射
@@ -0,0 +1,197 @@
+"""
+資料庫引擎設定
+
+依資料庫類型產生 SQLAlchemy engine 選項（SQLALCHEMY_ENGINE_OPTIONS）。
+
+SQLite：每條連線建立時套用 WAL、synchronous=NORMAL、busy_timeout、
+較大的 cache_size 與 mmap_size，並以 QueuePool 重複使用連線，
+避免多個 worker/thread 同時寫入時出現 "database is locked"。
+
+PostgreSQL：連線池大小對齊 gunicorn 每個 worker 的執行緒數，設定溢出上限、
+取得連線的等待上限，並在伺服器端設定 statement_timeout 等逾時；
+不使用 pool_pre_ping（每次取得連線都多一次來回），改以 pool_recycle 汰換連線。
+
+所有 QueuePool 都使用 TimedQueuePool，記錄取得連線的等待時間與使用率。
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+
+class PoolMetrics:
+    """連線池取得連線的等待時間與使用率統計"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_wait_ms = 0.0
+        self.total_wait_ms = 0.0
+
+    def record(self, wait_ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._waits.append(wait_ms)
+
+    def snapshot(self, pool):
+        with self._lock:
+            waits = sorted(self._waits)
+            checkouts, timeouts = self.checkouts, self.timeouts
+            max_wait_ms, total_wait_ms = self.max_wait_ms, self.total_wait_ms
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))], 3) if waits else 0.0
+
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        return {
+            'pool_size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': checked_out,
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'utilization': round(checked_out / capacity, 3) if capacity > 0 else None,
+            'checkouts': checkouts,
+            'timeouts': timeouts,
+            'wait_ms': {
+                'avg': round(total_wait_ms / checkouts, 3) if checkouts else 0.0,
+                'p50': pct(50),
+                'p95': pct(95),
+                'p99': pct(99),
+                'max': round(max_wait_ms, 3),
+            },
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """記錄每次取得連線等待時間的 QueuePool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record(0, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - start) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_metrics(engine):
+    """engine 連線池的統計資料；不支援統計的連線池回傳 None"""
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return None
+    return pool.metrics.snapshot(pool)
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def sqlite_pragmas(config):
+    """每條 SQLite 連線要執行的 PRAGMA（依序）"""
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        # 負值代表 KiB
+        ('cache_size', -int(config.get('SQLITE_CACHE_SIZE_KB', 64000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def tuned_connection_factory(pragmas):
+    """產生連線建立後立即套用 PRAGMA 的 sqlite3.Connection 類別"""
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas]
+
+    class TunedConnection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            for statement in statements:
+                self.execute(statement).close()
+
+    return TunedConnection
+
+
+def _sqlite_options(uri, config):
+    url = make_url(uri)
+    connect_args = {'check_same_thread': False}
+
+    if url.database in (None, '', ':memory:'):
+        # 記憶體資料庫只能共用同一條連線
+        return {'poolclass': StaticPool, 'connect_args': connect_args}
+
+    if not config.get('SQLITE_TUNING', True):
+        return {'connect_args': connect_args}
+
+    connect_args['timeout'] = int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000
+    connect_args['factory'] = tuned_connection_factory(sqlite_pragmas(config))
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(config.get('SQLITE_POOL_SIZE', 8)),
+        'max_overflow': int(config.get('SQLITE_MAX_OVERFLOW', 8)),
+        'pool_timeout': int(config.get('SQLITE_POOL_TIMEOUT', 30)),
+        'connect_args': connect_args,
+    }
+
+
+def _server_timeouts(config):
+    """以連線參數設定伺服器端逾時（毫秒），0 代表不限制"""
+    settings = {
+        'statement_timeout': int(config.get('DB_STATEMENT_TIMEOUT_MS', 15000)),
+        'lock_timeout': int(config.get('DB_LOCK_TIMEOUT_MS', 5000)),
+        'idle_in_transaction_session_timeout': int(config.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 60000)),
+    }
+    return ' '.join(f'-c {name}={value}' for name, value in settings.items())
+
+
+def _pooled_options(config):
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(config.get('DB_POOL_SIZE', 4)),
+        'max_overflow': int(config.get('DB_MAX_OVERFLOW', 2)),
+        'pool_timeout': int(config.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(config.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': bool(config.get('DB_POOL_PRE_PING', False)),
+        # 編譯後 SQL 的快取，重複的查詢不必重新編譯
+        'query_cache_size': int(config.get('DB_QUERY_CACHE_SIZE', 1200)),
+    }
+
+
+def engine_options(config):
+    """依 SQLALCHEMY_DATABASE_URI 的資料庫類型產生 engine 選項"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_sqlite(uri):
+        return _sqlite_options(uri, config)
+
+    options = _pooled_options(config)
+    if make_url(uri).get_backend_name() == 'postgresql':
+        options['connect_args'] = {
+            'options': _server_timeouts(config),
+            'application_name': config.get('DB_APPLICATION_NAME', 'gold'),
+            'keepalives': 1,
+            'keepalives_idle': 30,
+        }
+    return options
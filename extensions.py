@@ -1,9 +1,79 @@
-from flask_sqlalchemy import SQLAlchemy
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, _EngineConnector
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+from db_engine import engine_options
+
+# 唯讀副本在 SQLALCHEMY_BINDS 中的名稱
+REPLICA_BIND = 'replica'
+
+
+class _TunedEngineConnector(_EngineConnector):
+    """依每個 bind 自己的資料庫類型產生 engine 選項，明確設定的 SQLALCHEMY_ENGINE_OPTIONS 優先"""
+
+    def get_options(self, sa_url, echo):
+        sa_url, options = super().get_options(sa_url, echo)
+        tuned = engine_options(dict(self._app.config, SQLALCHEMY_DATABASE_URI=self.get_uri()))
+        tuned.update(self._app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        options.update(tuned)
+        return sa_url, options
+
+
+class RoutingSession(SignallingSession):
+    """
+    讀寫分流的 session
+
+    標記為唯讀的請求（read_only）查詢送往 replica；寫入、或本次請求已經寫入過
+    之後的所有查詢都留在主資料庫，確保同一請求內讀得到自己剛寫入的資料。
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if isinstance(clause, UpdateBase) or self.new or self.dirty or self.deleted:
+            self.info['wrote'] = True
+        elif self._use_replica():
+            return self.db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper=mapper, clause=clause)
+
+    def _use_replica(self):
+        return (
+            not self.info.get('wrote')
+            and has_request_context()
+            and g.get('db_read_only', False)
+            and REPLICA_BIND in (self.app.config.get('SQLALCHEMY_BINDS') or {})
+        )
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def make_connector(self, app=None, bind=None):
+        return _TunedEngineConnector(self, self.get_app(app), bind)
+
+
+db = RoutingSQLAlchemy()
+
+
+def read_only(view):
+    """標記唯讀端點：設定 replica 時，本次請求的查詢改由 replica 處理"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
 
-db = SQLAlchemy(engine_options={
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-})
 
 def init_extensions(app):
     db.init_app(app)
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo, useCallback } from 'react';
+import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import {
   Box,
   Button,
@@ -120,6 +120,8 @@ function GroupManagement({ tournament, onSave }) {
   const [isLoading, setIsLoading] = useState(false);
   const [nextGroupNumber, setNextGroupNumber] = useState(1);
   const [ungroupedParticipants, setUngroupedParticipants] = useState([]);
+  // 拖曳工作階段：每次拖曳開始產生新的 drag_id，同一次拖曳內的移動序號遞增
+  const dragSession = useRef({ id: null, seq: 0 });
 
   // 載入參賽者數據
   const loadParticipants = useCallback(async () => {
@@ -535,23 +537,88 @@ function GroupManagement({ tournament, onSave }) {
     }
   };
 
+  // 送出拖曳中的移動：同一次拖曳內的移動以 drag_id + 遞增的 seq 判斷先後，後端合併後只寫入最後一個
+  const sendMove = async (participantId, groupCode) => {
+    const session = dragSession.current;
+    session.seq += 1;
+    session.lastGroup = groupCode;
+    const seq = session.seq;
+    const response = await fetch(
+      `${apiConfig.apiUrl}/tournaments/${tournament.id}/participants/${participantId}/move`,
+      {
+        method: 'PUT',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          drag_id: session.id,
+          seq,
+          group_code: groupCode
+        }),
+      }
+    );
+    const result = await response.json();
+    // 409 且 stale：已有更新的移動，以之後的結果為準
+    if (!response.ok && !(response.status === 409 && result.stale)) {
+      throw new Error(result.error || '更新分組失敗');
+    }
+    return { dragId: session.id, seq };
+  };
+
+  // 等待移動寫入：輪詢結果直到寫入、失敗或被其他拖曳取代
+  const waitForMove = async (participantId, dragId, seq) => {
+    for (let attempt = 0; attempt < 20; attempt += 1) {
+      const response = await fetch(
+        `${apiConfig.apiUrl}/tournaments/${tournament.id}/participants/${participantId}/move?drag_id=${encodeURIComponent(dragId)}&seq=${seq}`
+      );
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || '查詢移動結果失敗');
+      }
+      if (result.state === 'failed') {
+        throw new Error(result.error || '更新分組失敗');
+      }
+      if (result.state !== 'pending') {
+        return result;
+      }
+      await new Promise(resolve => setTimeout(resolve, 100));
+    }
+    return null;
+  };
+
   // 處理拖動開始
   const handleDragStart = (e, participant) => {
     e.dataTransfer.setData('participant', JSON.stringify(participant));
+    dragSession.current = {
+      id: window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+      seq: 0,
+      originGroup: participant.group_code || '未分組',
+      lastGroup: participant.group_code || '未分組',
+      dropped: false
+    };
     setDraggedParticipant(participant);
   };
 
-  // 處理拖動結束
+  // 處理拖動結束：拖到組別外放開時，把拖曳中送出的移動改回原組別
   const handleDragEnd = () => {
+    const session = dragSession.current;
+    if (draggedParticipant && !session.dropped && session.seq > 0 && session.lastGroup !== session.originGroup) {
+      sendMove(draggedParticipant.id, session.originGroup)
+        .catch(error => console.error('還原分組錯誤:', error));
+    }
     setDraggedParticipant(null);
     setDragOverGroup(null);
   };
 
-  // 處理拖動經過
+  // 處理拖動經過：進入新的組別時送出中間移動
   const handleDragOver = (e, groupCode) => {
     e.preventDefault();
     if (groupCode !== dragOverGroup) {
       setDragOverGroup(groupCode);
+      if (draggedParticipant && groupCode !== dragSession.current.lastGroup) {
+        sendMove(draggedParticipant.id, groupCode)
+          .catch(error => console.error('更新分組錯誤:', error));
+      }
     }
     e.dataTransfer.dropEffect = 'move';
   };
@@ -568,6 +635,7 @@ function GroupManagement({ tournament, onSave }) {
     setDragOverGroup(null);
 
     if (!draggedParticipant) return;
+    dragSession.current.dropped = true;
 
     try {
       const sourceGroup = groups[draggedParticipant.group_code];
@@ -575,6 +643,11 @@ function GroupManagement({ tournament, onSave }) {
       
       // 如果是在同一組內拖動，處理排序
       if (draggedParticipant.group_code === targetGroup) {
+        // 拖曳途中經過其他組別時，把送出的移動改回原組別
+        if (dragSession.current.lastGroup !== targetGroup) {
+          await sendMove(draggedParticipant.id, targetGroup);
+        }
+
         // 找到拖放位置的目標元素
         const dropTarget = document.elementFromPoint(e.clientX, e.clientY);
         const participantItem = dropTarget.closest('[data-participant-id]');
@@ -599,25 +672,9 @@ function GroupManagement({ tournament, onSave }) {
         }
       }
 
-      // 處理跨組拖動
-      const response = await fetch(
-        `${apiConfig.apiUrl}/tournaments/${tournament.id}/participants/${draggedParticipant.id}`,
-        {
-          method: 'PUT',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            group_code: targetGroup
-          }),
-        }
-      );
-
-      if (!response.ok) {
-        throw new Error('更新分組失敗');
-      }
-
-      const result = await response.json();
+      // 處理跨組拖動：送出最後的移動並等待寫入結果
+      const { dragId, seq } = await sendMove(draggedParticipant.id, targetGroup);
+      const result = await waitForMove(draggedParticipant.id, dragId, seq);
       console.log('更新結果:', result);
 
       // 重新載入參賽者數據
@@ -631,6 +688,8 @@ function GroupManagement({ tournament, onSave }) {
         message: error.message || '更新分組失敗',
         severity: 'error'
       });
+      // 移動未寫入時以伺服器上的分組為準
+      loadParticipants();
     }
   };
 
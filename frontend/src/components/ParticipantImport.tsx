@@ -89,7 +89,7 @@ const ParticipantImport = () => {
             <input
               type="file"
               hidden
-              accept=".xlsx,.xls"
+              accept=".xlsx"
               onChange={handleParticipantImport}
             />
           </Button>
@@ -882,7 +882,7 @@ function ParticipantManagement({ tournament }) {
           <>
             <input
               type="file"
-              accept=".xlsx,.xls"
+              accept=".xlsx"
               onChange={handleFileChange}
               style={{ display: 'none' }}
               id="file-upload"
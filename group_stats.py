@@ -0,0 +1,234 @@
+"""
+分組統計（group_stats 資料表）
+
+每組的人數、已報到人數、女性人數與差點合計存在 group_stats，讀取時只需讀組數那麼多列，
+不必掃描所有參賽者。
+
+維護方式：
+- 逐筆異動（報到、移動、新增、刪除、修改差點）：session 的 after_flush 事件比對參賽者
+  欄位的新舊值，將每組的增減合併後，在同一個交易中以 INSERT ... ON CONFLICT DO UPDATE
+  SET x = x + :增減 寫入
+- 整批異動（匯入名單取代、組別代碼整批改寫）：不經過 ORM 的逐筆追蹤，由呼叫端改用
+  rebuild_group_stats（以一個 INSERT ... SELECT ... GROUP BY 重算該賽事）或
+  remap_group_stats（只搬動統計列）
+check_group_stats 比對統計與參賽者實際資料，可搭配 flask check-group-stats 修復。
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import case, event, func, inspect, literal
+
+from extensions import db, RoutingSession
+from groups_view import UNASSIGNED
+from models import Participant, GroupStat
+
+STAT_FIELDS = ('headcount', 'checked_in', 'female_count', 'handicap_sum', 'handicap_count')
+
+_TRACKED = ('tournament_id', 'group_code', 'check_in_status', 'gender', 'handicap')
+
+# 報名表的性別欄可能填 F 或 女
+FEMALE = ('F', '女')
+
+
+def _group_key(group_code):
+    return group_code if group_code and group_code != UNASSIGNED else UNASSIGNED
+
+
+def _contribution(values):
+    """一位參賽者對所屬組別統計的貢獻：((賽事, 組別), (人數, 已報到, 女性, 差點合計, 有差點人數))"""
+    handicap = values['handicap']
+    return (values['tournament_id'], _group_key(values['group_code'])), (
+        1,
+        1 if values['check_in_status'] == 'checked_in' else 0,
+        1 if values['gender'] in FEMALE else 0,
+        handicap or 0.0,
+        0 if handicap is None else 1,
+    )
+
+
+def _current_values(participant):
+    return {name: getattr(participant, name) for name in _TRACKED}
+
+
+def _previous_values(participant):
+    state = inspect(participant)
+    values = {}
+    for name in _TRACKED:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = getattr(participant, name)
+    return values
+
+
+def _add(deltas, contribution, sign):
+    key, values = contribution
+    total = deltas[key]
+    for index, value in enumerate(values):
+        total[index] += sign * value
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_participant_changes(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0, 0, 0.0, 0])
+    for obj in session.new:
+        if isinstance(obj, Participant):
+            _add(deltas, _contribution(_current_values(obj)), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Participant):
+            _add(deltas, _contribution(_previous_values(obj)), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Participant) and session.is_modified(obj):
+            before = _contribution(_previous_values(obj))
+            after = _contribution(_current_values(obj))
+            if before != after:
+                _add(deltas, before, -1)
+                _add(deltas, after, 1)
+
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _upsert_insert(dialect_name):
+    """支援 INSERT ... ON CONFLICT DO UPDATE 的方言（PostgreSQL、SQLite ≥ 3.24）所用的 insert"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def apply_deltas(connection, deltas):
+    """
+    將 {(賽事, 組別): [人數, 已報到, 女性, 差點合計, 有差點人數] 的增減} 寫入統計表
+
+    以一個 INSERT ... ON CONFLICT (tournament_id, group_code) DO UPDATE SET x = x + excluded.x
+    寫入所有組別：兩個交易同時寫入新組別的第一位參賽者時，後到的會累加而不會撞主鍵。
+    """
+    table = GroupStat.__table__
+    rows = [
+        dict(tournament_id=tournament_id, group_code=group_code, **dict(zip(STAT_FIELDS, values)))
+        for (tournament_id, group_code), values in deltas.items()
+    ]
+    if not rows:
+        return
+
+    insert = _upsert_insert(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table).values(rows)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.tournament_id, table.c.group_code],
+            set_={name: table.c[name] + statement.excluded[name] for name in STAT_FIELDS}
+        ))
+        return
+
+    # 其他資料庫：先 UPDATE，沒有該列時才 INSERT
+    for row in rows:
+        changes = {name: row[name] for name in STAT_FIELDS}
+        result = connection.execute(table.update().where(
+            (table.c.tournament_id == row['tournament_id']) & (table.c.group_code == row['group_code'])
+        ).values({name: table.c[name] + value for name, value in changes.items()}))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def apply_group_change(values, group_code):
+    """不經 ORM 改變參賽者組別後（values 為改變前的欄位值），將貢獻從舊組別移到新組別"""
+    deltas = defaultdict(lambda: [0, 0, 0, 0.0, 0])
+    _add(deltas, _contribution(values), -1)
+    _add(deltas, _contribution(dict(values, group_code=group_code)), 1)
+    deltas = {key: totals for key, totals in deltas.items() if any(totals)}
+    if deltas:
+        apply_deltas(db.session.connection(), deltas)
+
+
+def _aggregate_query(tournament_id):
+    """以參賽者資料計算各組統計的 SELECT（欄位順序同 group_stats）"""
+    group_key = case(
+        (Participant.group_code.is_(None), literal(UNASSIGNED)),
+        else_=Participant.group_code
+    )
+    return db.session.query(
+        Participant.tournament_id,
+        group_key,
+        func.count(Participant.id),
+        func.coalesce(func.sum(case((Participant.check_in_status == 'checked_in', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Participant.gender.in_(FEMALE), 1), else_=0)), 0),
+        func.coalesce(func.sum(Participant.handicap), 0.0),
+        func.count(Participant.handicap),
+    ).filter(
+        Participant.tournament_id == tournament_id
+    ).group_by(Participant.tournament_id, group_key)
+
+
+def rebuild_group_stats(tournament_id):
+    """依參賽者資料重算賽事的分組統計，不提交交易"""
+    db.session.flush()
+    table = GroupStat.__table__
+    db.session.execute(table.delete().where(table.c.tournament_id == tournament_id))
+    db.session.execute(table.insert().from_select(
+        ['tournament_id', 'group_code'] + list(STAT_FIELDS),
+        _aggregate_query(tournament_id).statement
+    ))
+
+
+def remap_group_stats(tournament_id, mapping):
+    """組別代碼依 mapping（舊代碼 → 新代碼）改寫後，搬動對應的統計列，只讀寫組數那麼多列"""
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return
+    table = GroupStat.__table__
+    moved = table.c.group_code.in_(list(mapping))
+    rows = db.session.execute(
+        table.select().where((table.c.tournament_id == tournament_id) & moved)
+    ).fetchall()
+
+    # 搬到的代碼若原本也有統計（不在 mapping 中的組別），合併而不是覆蓋
+    deltas = defaultdict(lambda: [0, 0, 0, 0.0, 0])
+    for row in rows:
+        _add(deltas, ((tournament_id, mapping[row.group_code]), [getattr(row, name) for name in STAT_FIELDS]), 1)
+    db.session.execute(table.delete().where((table.c.tournament_id == tournament_id) & moved))
+    apply_deltas(db.session.connection(), deltas)
+
+
+def delete_group_stats(tournament_id):
+    GroupStat.query.filter_by(tournament_id=tournament_id).delete(synchronize_session=False)
+
+
+def group_stats(tournament_id):
+    """賽事各組的統計（不含已經沒有人的組別）"""
+    return GroupStat.query.filter(
+        GroupStat.tournament_id == tournament_id,
+        GroupStat.headcount > 0
+    ).all()
+
+
+def check_group_stats(tournament_id):
+    """比對統計表與參賽者實際資料，回傳不一致的組別清單"""
+    expected = {
+        row[1]: row[2:]
+        for row in _aggregate_query(tournament_id)
+    }
+    stored = {
+        row.group_code: tuple(getattr(row, name) for name in STAT_FIELDS)
+        for row in GroupStat.query.filter_by(tournament_id=tournament_id)
+    }
+
+    mismatches = []
+    for group_code in sorted(set(expected) | set(stored)):
+        want = expected.get(group_code, (0, 0, 0, 0.0, 0))
+        have = stored.get(group_code, (0, 0, 0, 0.0, 0))
+        # 差點合計是逐筆加減的浮點數，允許極小的誤差
+        if any(abs((a or 0) - (b or 0)) > 1e-6 for a, b in zip(want, have)):
+            mismatches.append({
+                'group_code': group_code,
+                'expected': dict(zip(STAT_FIELDS, want)),
+                'stored': dict(zip(STAT_FIELDS, have)),
+            })
+    return mismatches
@@ -0,0 +1,106 @@
+"""
+分組演算法
+
+與資料庫無關的分組邏輯，供 auto_group 使用：
+- sort_and_chunk：先按預分組編號、再按差點排序，依序每 4 人一組
+- pairing_aware_groups：在維持差點分層的前提下，盡量避開過去曾經同組的組合
+"""
+
+GROUP_SIZE = 4
+
+# 挑選同組對象時，只在差點最接近的前幾位候選人中選擇，避免分組差點落差過大
+CANDIDATE_WINDOW = 8
+
+# 相鄰兩組互換成員的最大輪數
+MAX_SWAP_PASSES = 3
+
+
+def _sort_key(p):
+    return (
+        p.pre_group_code if p.pre_group_code else 'Z999',  # 沒有預分組的排最後
+        float(p.handicap if p.handicap is not None else 999.0)
+    )
+
+
+def sort_and_chunk(participants, group_size=GROUP_SIZE):
+    """先按預分組編號排序，再按差點排序，依序每 group_size 人一組"""
+    ordered = sorted(participants, key=_sort_key)
+    return [ordered[i:i + group_size] for i in range(0, len(ordered), group_size)]
+
+
+def _cost_to_group(matrix, p, members):
+    return sum(matrix.cost(p.member_number, m.member_number) for m in members)
+
+
+def group_cost(matrix, members):
+    """一組內所有兩兩組合的歷史同組次數總和"""
+    total = 0
+    for i in range(len(members)):
+        for j in range(i + 1, len(members)):
+            total += matrix.cost(members[i].member_number, members[j].member_number)
+    return total
+
+
+def _improve_by_swaps(matrix, groups, start):
+    """在相鄰兩組之間互換成員，只要能降低重複同組次數就接受"""
+    for _ in range(MAX_SWAP_PASSES):
+        improved = False
+        for g in range(start, len(groups) - 1):
+            left, right = groups[g], groups[g + 1]
+            for i in range(len(left)):
+                for j in range(len(right)):
+                    if left[i].pre_group_code or right[j].pre_group_code:
+                        continue
+                    before = group_cost(matrix, left) + group_cost(matrix, right)
+                    left[i], right[j] = right[j], left[i]
+                    after = group_cost(matrix, left) + group_cost(matrix, right)
+                    if after < before:
+                        improved = True
+                    else:
+                        left[i], right[j] = right[j], left[i]
+        if not improved:
+            break
+    return groups
+
+
+def pairing_aware_groups(participants, matrix, group_size=GROUP_SIZE, window=CANDIDATE_WINDOW):
+    """
+    避開重複同組的分組
+
+    有預分組編號的參賽者維持原本的排序與切組方式（預分組是參賽者自己的要求）；
+    其餘參賽者按差點排序後逐組填入，每個空位從差點最接近的 window 位候選人中
+    挑選與本組歷史同組次數最少者，最後再以相鄰兩組互換做局部改善。
+
+    matrix 需提供 cost(member_a, member_b)，回傳兩位會員過去同組的次數。
+    """
+    pre_grouped = sorted((p for p in participants if p.pre_group_code), key=_sort_key)
+    free = sorted(
+        (p for p in participants if not p.pre_group_code),
+        key=lambda p: float(p.handicap if p.handicap is not None else 999.0)
+    )
+
+    groups = [pre_grouped[i:i + group_size] for i in range(0, len(pre_grouped), group_size)]
+
+    # 預分組最後一組若未滿，由一般參賽者補滿
+    current = []
+    if groups and len(groups[-1]) < group_size:
+        current = groups.pop()
+    start = len(groups)
+
+    while free:
+        if not current:
+            current = [free.pop(0)]
+        while len(current) < group_size and free:
+            candidates = free[:window]
+            best = min(
+                range(len(candidates)),
+                key=lambda i: (_cost_to_group(matrix, candidates[i], current), i)
+            )
+            current.append(free.pop(best))
+        groups.append(current)
+        current = []
+
+    if current:
+        groups.append(current)
+
+    return _improve_by_swaps(matrix, groups, start)
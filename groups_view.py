@@ -0,0 +1,125 @@
+"""
+報到畫面的分組檢視（GET /api/v1/tournaments/<id>/groups）
+
+以單一排序查詢（參賽者 LEFT JOIN 組別位置）依序產生各組及組員，並附上每組人數、
+已報到人數、平均差點與報到進度。序列化後的結果放在賽事快照中（snapshots.py），
+賽事版本號改變才重建。
+"""
+
+import json
+
+from sqlalchemy import and_, case
+
+from extensions import db
+from models import Participant, GroupPosition
+
+UNASSIGNED = '未分組'
+
+
+def group_sort_key(group_code):
+    """
+    組別代碼的排序鍵：數字代碼依數值排在前面，其他代碼（例如預編組代碼）依字串排在後面，
+    未分組排最後
+
+    在 Python 中排序，不在 SQL 中把代碼轉為整數（PostgreSQL 遇到非數字代碼會整個查詢失敗）。
+    """
+    if not group_code or group_code == UNASSIGNED:
+        return (2, 0, '')
+    code = str(group_code).strip()
+    if code.isdigit():
+        return (0, int(code), code)
+    return (1, 0, code)
+
+
+def group_order_key(group_code, position_key):
+    """
+    組別在報到畫面與匯出中的順序：依組別位置（使用者拖曳的順序，見 operations.move_group_to），
+    沒有位置的組別接在後面依 group_sort_key 排列，未分組排最後
+    """
+    unassigned = not group_code or group_code == UNASSIGNED
+    return (unassigned, position_key is None, position_key or '', group_sort_key(group_code))
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else None
+
+
+def build_groups(tournament_id):
+    """依組別位置、組內排序鍵排列的分組與組員（未分組排最後）"""
+    unassigned = case(
+        (Participant.group_code.is_(None), 1),
+        (Participant.group_code == UNASSIGNED, 1),
+        else_=0
+    )
+    # SQL 只需讓同一組的組員相鄰並依組內順序排列，組別之間的順序在下面以 Python 排序
+    rows = db.session.query(
+        Participant.id,
+        Participant.registration_number,
+        Participant.member_number,
+        Participant.name,
+        Participant.gender,
+        Participant.handicap,
+        Participant.group_code,
+        Participant.check_in_status,
+        Participant.check_in_time,
+        GroupPosition.order_key.label('position_key'),
+    ).outerjoin(GroupPosition, and_(
+        GroupPosition.tournament_id == Participant.tournament_id,
+        GroupPosition.group_code == Participant.group_code
+    )).filter(
+        Participant.tournament_id == tournament_id
+    ).order_by(
+        unassigned,
+        Participant.group_code,
+        Participant.order_key,
+        Participant.display_order,
+        Participant.id
+    )
+
+    groups = []
+    current = None
+    for row in rows:
+        code = row.group_code if row.group_code and row.group_code != UNASSIGNED else None
+        if current is None or current['group_code'] != code:
+            current = {
+                '_sort_key': group_order_key(code, row.position_key),
+                'group_number': code or UNASSIGNED,
+                'group_code': code,
+                'participants': [],
+                'count': 0,
+                'checked_in': 0,
+                'average_handicap': None,
+                'check_in_progress': 0.0,
+                '_handicap_total': 0.0,
+                '_handicap_count': 0,
+            }
+            groups.append(current)
+
+        current['participants'].append({
+            'id': row.id,
+            'registration_number': row.registration_number,
+            'member_number': row.member_number,
+            'name': row.name,
+            'gender': row.gender,
+            'handicap': row.handicap,
+            'group_number': code or UNASSIGNED,
+            'check_in_status': row.check_in_status,
+            'check_in_time': row.check_in_time.isoformat() if row.check_in_time else None,
+        })
+        current['count'] += 1
+        if row.check_in_status == 'checked_in':
+            current['checked_in'] += 1
+        if row.handicap is not None:
+            current['_handicap_total'] += row.handicap
+            current['_handicap_count'] += 1
+
+    groups.sort(key=lambda group: group.pop('_sort_key'))
+    for group in groups:
+        group['average_handicap'] = _average(group.pop('_handicap_total'), group.pop('_handicap_count'))
+        group['check_in_progress'] = round(group['checked_in'] / group['count'], 3)
+    return groups
+
+
+def groups_json(tournament_id):
+    """分組檢視序列化為 JSON（bytes），供快照快取保存"""
+    return json.dumps(build_groups(tournament_id), ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,134 @@
+"""
+健康檢查
+
+存活（liveness）：行程能回應即可，不碰資料庫。
+就緒（readiness）：資料庫往返一次，結果快取 HEALTH_DB_PROBE_TTL 秒，
+同一時間只有一個執行緒實際探測，負載平衡器頻繁探測也不會增加資料庫負擔。
+探測只做讀取：其他交易長時間持有寫入鎖（大量匯入、重新分配排序鍵）時回報 degraded，
+仍視為就緒，負載平衡器不會因為一次寫入同時撤下所有 worker。
+同時回報連線池使用率，以及本 worker 最後一次成功寫入距今多久。
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from db_engine import is_sqlite, pool_metrics
+from extensions import db, RoutingSession
+
+_last_write = {'at': None}
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_pending_write(session, flush_context):
+    session.info['pending_write'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_write(session):
+    if session.info.pop('pending_write', False):
+        _last_write['at'] = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_pending_write(session):
+    session.info.pop('pending_write', None)
+
+
+def last_write_age():
+    """本 worker 最後一次成功提交寫入距今的秒數，尚未寫入過時回傳 None"""
+    at = _last_write['at']
+    return round(time.time() - at, 1) if at is not None else None
+
+
+def _pool_saturated(pool):
+    return pool is not None and pool['max_overflow'] >= 0 and \
+        pool['checked_out'] >= pool['pool_size'] + pool['max_overflow']
+
+
+class DatabaseProbe:
+    """快取結果的資料庫探測"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked = 0.0
+
+    def check(self, config):
+        ttl = config.get('HEALTH_DB_PROBE_TTL', 5)
+        if self._result is not None and time.monotonic() - self._checked < ttl:
+            return dict(self._result, cached=True)
+
+        # 其他執行緒正在探測時直接使用上一次的結果，不排隊等待
+        if not self._lock.acquire(blocking=self._result is None):
+            return dict(self._result, cached=True)
+        try:
+            self._result = self._probe(config)
+            self._checked = time.monotonic()
+            return dict(self._result, cached=False)
+        finally:
+            self._lock.release()
+
+    def _probe(self, config):
+        start = time.perf_counter()
+        result = {'checked_at': datetime.utcnow().isoformat(), 'write_locked': False}
+        try:
+            with db.engine.connect() as connection:
+                if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+                    result['write_locked'] = self._probe_sqlite(connection, config)
+                else:
+                    connection.execute(text('SELECT 1'))
+            result.update(ok=True, error=None)
+        except Exception as e:
+            result.update(ok=False, error=str(e))
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def _probe_sqlite(self, connection, config):
+        """
+        讀取 sqlite_master 確認資料庫檔案可讀（WAL 模式下讀取不受寫入交易影響），
+        等待上限為 HEALTH_DB_PROBE_TIMEOUT_MS；再以不等待的 BEGIN IMMEDIATE 檢查寫入鎖，
+        回傳寫入鎖是否被其他交易持有。結束後恢復原本的 busy_timeout
+        """
+        raw = connection.connection
+        busy_timeout = raw.execute('PRAGMA busy_timeout').fetchone()[0]
+        raw.execute(f"PRAGMA busy_timeout={int(config.get('HEALTH_DB_PROBE_TIMEOUT_MS', 500))}")
+        try:
+            raw.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            raw.execute('PRAGMA busy_timeout=0')
+            try:
+                raw.execute('BEGIN IMMEDIATE')
+            except sqlite3.OperationalError as e:
+                if 'locked' in str(e) or 'busy' in str(e):
+                    return True
+                raise
+            raw.execute('ROLLBACK')
+            return False
+        finally:
+            raw.execute(f'PRAGMA busy_timeout={busy_timeout}')
+
+
+database_probe = DatabaseProbe()
+
+
+def readiness(config):
+    """回傳 (是否就緒, 檢查結果)"""
+    pool = pool_metrics(db.engine)
+    saturated = _pool_saturated(pool)
+
+    # 連線池已滿時不再取用連線探測（會等到 pool_timeout），直接回報未就緒
+    if saturated:
+        database = {'ok': False, 'error': '連線池已滿', 'cached': False}
+    else:
+        database = database_probe.check(config)
+
+    checks = {
+        'database': database,
+        'degraded': bool(database.get('write_locked')),
+        'pool': dict(pool, saturated=saturated) if pool else None,
+        'last_write_age_seconds': last_write_age(),
+    }
+    return database['ok'] and not saturated, checks
@@ -0,0 +1,303 @@
+"""
+背景工作
+
+大型匯入、匯出改在背景執行緒中執行，請求執行緒立即回傳 202 與工作編號，
+前端以 GET /api/v1/jobs/<id> 輪詢進度，完成後下載產出檔案。
+
+工作狀態與進度寫在 jobs 資料表，同一台主機上的任何 gunicorn worker 都能回應輪詢；
+產出檔案放在 JOB_DIR。每個 worker 同時執行的工作數由 JOB_WORKERS 控制；
+執行緒池屬於各個應用程式（app.extensions['jobs']），不是模組層級的單例。
+
+使用執行緒池而非程序池：工作需要在應用程式內存取資料庫，執行緒池在第一次
+送出工作時才建立執行緒，搭配 gunicorn --preload 也不會在主程序中先產生執行緒。
+
+執行中與排隊中的工作每 JOB_HEARTBEAT_SECONDS 秒更新 heartbeat_at。worker 重新啟動時
+記憶體中的工作隨之消失，心跳停止超過 JOB_ORPHAN_SECONDS 秒的工作視為中斷、標記為失敗：
+每個 worker 啟動後的第一個請求清理一次，輪詢到中斷的工作時也會立即標記，
+前端不會一直等待。
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+from models import Job, Tournament
+from roster_io import read_roster, replace_roster, ordered_for_export, build_groups_workbook
+from bulk_import import collect_sheets, bulk_import
+
+# 進度寫入資料庫的最短間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ORPHANED_MESSAGE = '工作執行中斷（伺服器重新啟動），請重新送出'
+
+
+def _update_job(job_id, **values):
+    """以獨立的短交易更新工作狀態，不影響工作本身 session 中的交易"""
+    with db.engine.begin() as connection:
+        connection.execute(Job.__table__.update().where(Job.__table__.c.id == job_id).values(**values))
+
+
+class JobContext:
+    """傳給工作函式的物件：回報進度、保存產出檔案"""
+
+    def __init__(self, job_id, job_dir):
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.result_file = None
+        self._last_report = 0.0
+
+    def progress(self, done, total, message=None, force=False):
+        """
+        回報進度，依 PROGRESS_INTERVAL 節流
+
+        SQLite 寫入交易進行中時另開連線寫入會互相等待，
+        請只在工作的寫入交易之外回報進度。
+        """
+        now = time.monotonic()
+        if not force and done < total and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        values = {'progress': done, 'total': total}
+        if message is not None:
+            values['message'] = message
+        _update_job(self.job_id, **values)
+
+    def save_file(self, data, download_name, mimetype, suffix=''):
+        """將產出內容（bytes 或檔案物件）寫入 JOB_DIR"""
+        path = os.path.join(self.job_dir, f'{self.job_id}{suffix}')
+        with open(path, 'wb') as f:
+            f.write(data if isinstance(data, bytes) else data.getvalue())
+        self.result_file = (path, download_name, mimetype)
+
+
+class JobRunner:
+    """一個應用程式的背景工作執行器：執行緒池、心跳與產出檔案目錄"""
+
+    def __init__(self, app):
+        self.app = app
+        self.job_dir = app.config['JOB_DIR']
+        self.retention = timedelta(hours=app.config['JOB_RETENTION_HOURS'])
+        self.heartbeat_interval = app.config['JOB_HEARTBEAT_SECONDS']
+        self.orphan_after = timedelta(seconds=app.config['JOB_ORPHAN_SECONDS'])
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job'
+        )
+        self._active = set()
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def shutdown(self):
+        """不再接受新工作；已排入的工作仍會執行完畢"""
+        self.executor.shutdown(wait=False)
+
+    def upload_path(self, job_id, suffix=''):
+        """工作輸入檔案（例如上傳的 Excel）的暫存路徑"""
+        return os.path.join(self.job_dir, f'{job_id}.upload{suffix}')
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def submit(self, kind, func, *args, tournament_id=None, job_id=None):
+        """建立工作紀錄並排入執行緒池，回傳 Job；func(context, *args) 回傳結果 dict"""
+        self.purge_expired()
+
+        job = Job(id=job_id or self.new_job_id(), kind=kind, tournament_id=tournament_id,
+                  status='queued', progress=0, message='等待執行', heartbeat_at=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+
+        with self._lock:
+            self._active.add(job.id)
+        self._start_heartbeat()
+        self.executor.submit(self._run, job.id, func, args)
+        return job
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        """定期更新本 worker 排隊中與執行中工作的心跳，沒有工作時結束"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._heartbeat = None
+                    return
+            try:
+                with self.app.app_context(), db.engine.begin() as connection:
+                    connection.execute(Job.__table__.update().where(
+                        Job.__table__.c.id.in_(active)
+                    ).values(heartbeat_at=datetime.utcnow()))
+            except Exception as e:
+                print(f"更新工作心跳時發生錯誤：{str(e)}")
+
+    def is_orphaned(self, job):
+        """工作是否已中斷：排隊中或執行中，但心跳停止超過 JOB_ORPHAN_SECONDS"""
+        if job.status not in ('queued', 'running'):
+            return False
+        last_seen = job.heartbeat_at or job.created_at
+        return last_seen is not None and last_seen < datetime.utcnow() - self.orphan_after
+
+    def fail_orphaned(self, job_id=None):
+        """將中斷的工作（可只指定一個）標記為失敗，回傳標記的數量"""
+        now = datetime.utcnow()
+        table = Job.__table__
+        cutoff = now - self.orphan_after
+        statement = table.update().where(
+            table.c.status.in_(['queued', 'running']),
+            db.func.coalesce(table.c.heartbeat_at, table.c.created_at) < cutoff
+        )
+        if job_id is not None:
+            statement = statement.where(table.c.id == job_id)
+        try:
+            with db.engine.begin() as connection:
+                failed = connection.execute(statement.values(
+                    status='failed', error=ORPHANED_MESSAGE, message='失敗', finished_at=now
+                )).rowcount
+        except Exception as e:
+            print(f"清理中斷的背景工作時發生錯誤：{str(e)}")
+            return 0
+        if failed and job_id is None:
+            print(f"已將 {failed} 個中斷的背景工作標記為失敗")
+        return failed
+
+    def _run(self, job_id, func, args):
+        with self.app.app_context():
+            context = JobContext(job_id, self.job_dir)
+            try:
+                _update_job(job_id, status='running', started_at=datetime.utcnow(),
+                            heartbeat_at=datetime.utcnow(), message='執行中')
+                result = func(context, *args)
+                db.session.commit()
+
+                values = {'status': 'succeeded', 'result': result, 'message': '完成',
+                          'finished_at': datetime.utcnow()}
+                if context.result_file:
+                    values['result_path'], values['result_name'], values['result_mimetype'] = context.result_file
+                _update_job(job_id, **values)
+            except Exception as e:
+                db.session.rollback()
+                print(f"背景工作 {job_id} 執行失敗：{str(e)}")
+                import traceback
+                print(traceback.format_exc())
+                try:
+                    _update_job(job_id, status='failed', error=str(e), message='失敗',
+                                finished_at=datetime.utcnow())
+                except Exception as update_error:
+                    print(f"更新工作狀態時發生錯誤：{str(update_error)}")
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
+                db.session.remove()
+
+    def discard_tournament_jobs(self, tournament_id):
+        """
+        刪除賽事前處理它的工作：已結束的工作連同產出檔案刪除，
+        排隊中與執行中的工作解除與賽事的關聯（仍可輪詢，結束後依保留時間清除）
+        """
+        finished = Job.query.filter(
+            Job.tournament_id == tournament_id,
+            Job.status.in_(['succeeded', 'failed'])
+        ).all()
+        for job in finished:
+            if job.result_path and os.path.exists(job.result_path):
+                os.remove(job.result_path)
+            db.session.delete(job)
+        db.session.flush()
+        Job.query.filter_by(tournament_id=tournament_id).update(
+            {Job.tournament_id: None}, synchronize_session=False
+        )
+
+    def purge_expired(self):
+        """刪除超過保留時間的已結束工作與其產出檔案"""
+        cutoff = datetime.utcnow() - self.retention
+        expired = Job.query.filter(
+            Job.status.in_(['succeeded', 'failed']),
+            Job.finished_at < cutoff
+        ).all()
+        for job in expired:
+            if job.result_path and os.path.exists(job.result_path):
+                os.remove(job.result_path)
+            db.session.delete(job)
+        if expired:
+            db.session.commit()
+
+
+class Jobs:
+    """
+    背景工作的進入點（模組層級的 jobs）
+
+    每個應用程式在 app.extensions['jobs'] 有自己的 JobRunner，屬性與方法依 current_app 轉給它；
+    同一個應用程式重新初始化時先關閉舊的執行緒池。
+    """
+
+    def init_app(self, app):
+        previous = app.extensions.get('jobs')
+        if previous is not None:
+            previous.shutdown()
+        runner = JobRunner(app)
+        # 建立應用程式時不連線資料庫，啟動後第一個請求才清理中斷的工作
+        app.before_first_request(runner.fail_orphaned)
+        app.extensions['jobs'] = runner
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(current_app.extensions['jobs'], name)
+
+
+jobs = Jobs()
+
+
+def import_participants_job(context, tournament_id, upload_path):
+    """背景匯入參賽者：解析時回報進度，寫入在單一交易中完成"""
+    try:
+        rows = read_roster(upload_path, progress=lambda done, total: context.progress(done, total, '解析名單'))
+    finally:
+        os.remove(upload_path)
+
+    context.progress(len(rows), len(rows), '寫入資料庫', force=True)
+    imported = replace_roster(tournament_id, rows)
+    return {'imported': imported}
+
+
+def export_groups_job(context, tournament_id):
+    """背景產生分組表 Excel"""
+    tournament = Tournament.query.get(tournament_id)
+    if not tournament:
+        raise LookupError('找不到賽事')
+
+    participants = ordered_for_export(tournament_id)
+    workbook = build_groups_workbook(
+        tournament.name, participants,
+        progress=lambda done, total: context.progress(done, total, '產生分組表')
+    )
+    context.save_file(workbook, f'{tournament.name}_分組名單.xlsx', XLSX_MIMETYPE, suffix='.xlsx')
+    return {'participants': len(participants)}
+
+
+def bulk_import_job(context, upload_path, mapping, create_missing, dry_run, workers):
+    """背景批次匯入 zip 檔中的報名表，結果為匯入報告"""
+    try:
+        sheets = collect_sheets(upload_path)
+    finally:
+        os.remove(upload_path)
+
+    context.progress(0, len(sheets), '解析與匯入報名表', force=True)
+    report = bulk_import(sheets, mapping=mapping, create_missing=create_missing,
+                         dry_run=dry_run, workers=workers)
+    context.progress(len(sheets), len(sheets), force=True)
+    return report
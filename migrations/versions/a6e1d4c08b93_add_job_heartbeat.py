@@ -0,0 +1,24 @@
+"""add job heartbeat
+
+Revision ID: a6e1d4c08b93
+Revises: f7c3b9e2a580
+Create Date: 2026-10-19 21:07:12.530184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e1d4c08b93'
+down_revision = 'f7c3b9e2a580'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('jobs', 'heartbeat_at')
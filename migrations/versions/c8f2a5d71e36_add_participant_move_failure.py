@@ -0,0 +1,24 @@
+"""add participant move failure
+
+Revision ID: c8f2a5d71e36
+Revises: a6e1d4c08b93
+Create Date: 2026-10-19 23:42:08.114507
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2a5d71e36'
+down_revision = 'a6e1d4c08b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('participants', sa.Column('move_failure', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('participants', 'move_failure')
@@ -0,0 +1,48 @@
+"""add group stats
+
+Revision ID: d2e8a4f61c37
+Revises: b93a6c2e5f14
+Create Date: 2026-10-19 16:47:12.508231
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8a4f61c37'
+down_revision = 'b93a6c2e5f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('group_stats',
+    sa.Column('tournament_id', sa.Integer(), nullable=False),
+    sa.Column('group_code', sa.String(length=50), nullable=False),
+    sa.Column('headcount', sa.Integer(), nullable=False),
+    sa.Column('checked_in', sa.Integer(), nullable=False),
+    sa.Column('female_count', sa.Integer(), nullable=False),
+    sa.Column('handicap_sum', sa.Float(), nullable=False),
+    sa.Column('handicap_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tournament_id'], ['tournaments.id'], ),
+    sa.PrimaryKeyConstraint('tournament_id', 'group_code')
+    )
+
+    # 依既有的參賽者資料計算各組統計
+    op.execute("""
+        INSERT INTO group_stats (tournament_id, group_code, headcount, checked_in, female_count, handicap_sum, handicap_count)
+        SELECT tournament_id,
+               COALESCE(group_code, '未分組'),
+               COUNT(id),
+               SUM(CASE WHEN check_in_status = 'checked_in' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN gender IN ('F', '女') THEN 1 ELSE 0 END),
+               COALESCE(SUM(handicap), 0),
+               COUNT(handicap)
+        FROM participants
+        GROUP BY tournament_id, COALESCE(group_code, '未分組')
+    """)
+
+
+def downgrade():
+    op.drop_table('group_stats')
@@ -0,0 +1,57 @@
+"""add fractional order keys
+
+Revision ID: e5b7f3c19d08
+Revises: c4d92e61a7b5
+Create Date: 2026-10-19 11:26:05.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from ordering import evenly_spaced_keys
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7f3c19d08'
+down_revision = 'c4d92e61a7b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('participants', sa.Column('order_key', sa.String(length=64), nullable=True))
+    op.create_index('ix_participants_tournament_order_key', 'participants', ['tournament_id', 'order_key'], unique=False)
+    op.create_table('group_positions',
+    sa.Column('tournament_id', sa.Integer(), nullable=False),
+    sa.Column('group_code', sa.String(length=50), nullable=False),
+    sa.Column('order_key', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['tournament_id'], ['tournaments.id'], ),
+    sa.PrimaryKeyConstraint('tournament_id', 'group_code')
+    )
+
+    # 依原本的 display_order 補上排序鍵
+    bind = op.get_bind()
+    participants = sa.table('participants',
+        sa.column('id', sa.Integer), sa.column('tournament_id', sa.Integer),
+        sa.column('display_order', sa.Integer), sa.column('order_key', sa.String))
+    rows = bind.execute(sa.select(
+        participants.c.id, participants.c.tournament_id
+    ).order_by(
+        participants.c.tournament_id, participants.c.display_order, participants.c.id
+    )).fetchall()
+
+    by_tournament = {}
+    for participant_id, tournament_id in rows:
+        by_tournament.setdefault(tournament_id, []).append(participant_id)
+
+    for ids in by_tournament.values():
+        for participant_id, key in zip(ids, evenly_spaced_keys(len(ids))):
+            bind.execute(participants.update().where(
+                participants.c.id == participant_id
+            ).values(order_key=key))
+
+
+def downgrade():
+    op.drop_table('group_positions')
+    op.drop_index('ix_participants_tournament_order_key', table_name='participants')
+    op.drop_column('participants', 'order_key')
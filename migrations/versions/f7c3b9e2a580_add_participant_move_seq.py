@@ -0,0 +1,26 @@
+"""add participant move seq
+
+Revision ID: f7c3b9e2a580
+Revises: d2e8a4f61c37
+Create Date: 2026-10-19 18:21:36.904415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3b9e2a580'
+down_revision = 'd2e8a4f61c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('participants', sa.Column('move_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('participants', sa.Column('move_drag_id', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('participants', 'move_drag_id')
+    op.drop_column('participants', 'move_seq')
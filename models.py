@@ -10,6 +10,8 @@ class Tournament(db.Model):
     location = db.Column(db.String(200))
     description = db.Column(db.Text)
     group_order = db.Column(db.Text)  # 存儲分組順序，以逗號分隔
+    pairings_indexed_at = db.Column(db.DateTime)  # 同組紀錄最後建立索引的時間
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 分組異動版本號
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -23,6 +25,7 @@ class Tournament(db.Model):
             'location': self.location,
             'description': self.description,
             'group_order': self.group_order,
+            'revision': self.revision,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -32,20 +35,28 @@ class Tournament(db.Model):
 
 class Participant(db.Model):
     __tablename__ = 'participants'
+    __table_args__ = (
+        db.Index('ix_participants_tournament_order_key', 'tournament_id', 'order_key'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    gender = db.Column(db.String(1))
-    handicap = db.Column(db.Float)
+    # 影響分組統計的欄位：修改時一併載入舊值，group_stats.py 才能算出增減
+    gender = db.column_property(db.Column(db.String(1)), active_history=True)
+    handicap = db.column_property(db.Column(db.Float), active_history=True)
     member_number = db.Column(db.String(50))
     registration_number = db.Column(db.String(50))
     pre_group_code = db.Column(db.String(50))  # 預分組代碼
-    group_code = db.Column(db.String(50))
+    group_code = db.column_property(db.Column(db.String(50)), active_history=True)
     group_number = db.Column(db.Integer)
     notes = db.Column(db.Text)
     display_order = db.Column(db.Integer)
-    check_in_status = db.Column(db.String(20), default='not_checked_in')
+    order_key = db.Column(db.String(64))  # 分數排序鍵，見 ordering.py
+    move_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 最後寫入的拖曳移動序號，見 coalescing.py
+    move_drag_id = db.Column(db.String(64))  # 最後寫入的拖曳工作階段，move_seq 只在同一個工作階段內比較
+    move_failure = db.Column(db.JSON)  # 最後一次未寫入的拖曳移動 {drag_id, seq, error}，成功寫入時清除
+    check_in_status = db.column_property(db.Column(db.String(20), default='not_checked_in'), active_history=True)
     check_in_time = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -64,6 +75,7 @@ class Participant(db.Model):
             'group_number': self.group_number,
             'notes': self.notes,
             'display_order': self.display_order,
+            'order_key': self.order_key,
             'check_in_status': self.check_in_status,
             'check_in_time': self.check_in_time.isoformat() if self.check_in_time else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -72,3 +84,110 @@ class Participant(db.Model):
 
     def __repr__(self):
         return f'<Participant {self.name}>'
+
+class Pairing(db.Model):
+    """歷史同組紀錄：每場賽事中同組的兩位會員一列（member_a < member_b）"""
+    __tablename__ = 'pairings'
+    __table_args__ = (
+        db.Index('ix_pairings_members', 'member_a', 'member_b'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False, index=True)
+    member_a = db.Column(db.String(50), nullable=False)
+    member_b = db.Column(db.String(50), nullable=False)
+
+    def __repr__(self):
+        return f'<Pairing {self.member_a}-{self.member_b} @ {self.tournament_id}>'
+
+class RegistrationCounter(db.Model):
+    """每場賽事的報名序號計數器，last_number 為已配發的最大序號"""
+    __tablename__ = 'registration_counters'
+
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<RegistrationCounter {self.tournament_id}: {self.last_number}>'
+
+class GroupPosition(db.Model):
+    """組別在賽事中的排列位置（分數排序鍵）"""
+    __tablename__ = 'group_positions'
+
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), primary_key=True)
+    group_code = db.Column(db.String(50), primary_key=True)
+    order_key = db.Column(db.String(64), nullable=False)
+
+    def __repr__(self):
+        return f'<GroupPosition {self.tournament_id}/{self.group_code}: {self.order_key}>'
+
+class GroupStat(db.Model):
+    """
+    每組的統計（人數、已報到、女性人數、差點合計），由 group_stats.py 隨參賽者異動增量維護
+
+    未分組的參賽者記在 group_code = '未分組'。
+    """
+    __tablename__ = 'group_stats'
+
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), primary_key=True)
+    group_code = db.Column(db.String(50), primary_key=True)
+    headcount = db.Column(db.Integer, nullable=False, default=0)
+    checked_in = db.Column(db.Integer, nullable=False, default=0)
+    female_count = db.Column(db.Integer, nullable=False, default=0)
+    handicap_sum = db.Column(db.Float, nullable=False, default=0)
+    handicap_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'group_code': self.group_code,
+            'headcount': self.headcount,
+            'checked_in': self.checked_in,
+            'female_count': self.female_count,
+            'handicap_sum': round(self.handicap_sum, 1),
+            'average_handicap': round(self.handicap_sum / self.handicap_count, 1) if self.handicap_count else None
+        }
+
+    def __repr__(self):
+        return f'<GroupStat {self.tournament_id}/{self.group_code}: {self.headcount}>'
+
+class Job(db.Model):
+    """背景工作（匯入、匯出）的狀態與進度，任何 worker 都能查詢"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued / running / succeeded / failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    result_path = db.Column(db.String(500))  # 產出檔案的路徑（位於 JOB_DIR）
+    result_name = db.Column(db.String(255))
+    result_mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # 排隊中、執行中的工作定期更新，見 jobs.py
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'tournament_id': self.tournament_id,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'percent': round(self.progress * 100 / self.total) if self.total else None,
+            'message': self.message,
+            'error': self.error,
+            'result': self.result,
+            'download_url': f'/api/v1/jobs/{self.id}/download' if self.result_path else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<Job {self.kind} {self.id}: {self.status}>'
@@ -0,0 +1,398 @@
+"""
+分組與排序異動操作
+
+組別代碼以集合式 SQL 改寫，排序使用分數排序鍵（ordering.py），
+單一移動只寫入一列。皆不提交交易，由呼叫端決定提交時機。
+
+check_in、set_notes、move、move_to_position、delete、reorder 為各端點與批次 API（POST /api/v1/batch）
+共用的操作核心：找不到資料時拋出 NotFoundError，資料不合法時拋出 ValueError，
+相鄰順序已被其他人變更時拋出 StaleOrderError。
+"""
+
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, func
+
+from extensions import db
+from group_stats import remap_group_stats, apply_group_change
+from models import Tournament, Participant, GroupPosition
+from ordering import key_between, evenly_spaced_keys, needs_rebalance
+
+UNASSIGNED = '未分組'
+
+
+class NotFoundError(LookupError):
+    """找不到參賽者或組別（端點回應 404）；與 KeyError 等其他 LookupError 區分"""
+
+
+class StaleOrderError(ValueError):
+    """相鄰參賽者或組別的順序已被變更，用戶端需要重新整理"""
+
+
+def touch_tournament(tournament_id, pairings=False):
+    """
+    賽事版本號加一；pairings=True 時同時標記同組索引需要重建
+
+    所有異動賽事參賽者、分組或排序的操作都要在同一個交易中呼叫，
+    依版本號快取的賽事快照（snapshots.py）才會失效。
+    只有會改變「誰和誰同組」的異動（組別或會員編號變動、名單匯入、刪除參賽者）才傳入
+    pairings=True，下次 refresh_pairing_index（pairing.py）會重新建立該賽事的同組紀錄；
+    報到、備註、排序與組別代碼整批改寫不影響同組紀錄，不需要重建。
+    """
+    values = {Tournament.revision: Tournament.revision + 1}
+    if pairings:
+        values[Tournament.pairings_indexed_at] = None
+    Tournament.query.filter_by(id=tournament_id).update(values, synchronize_session=False)
+
+
+def bump_revision(tournament_id, pairings=False):
+    """賽事版本號加一，回傳新的版本號"""
+    touch_tournament(tournament_id, pairings=pairings)
+    return db.session.query(Tournament.revision).filter_by(id=tournament_id).scalar()
+
+
+def remap_group_codes(tournament_id, mapping):
+    """
+    以單一 UPDATE ... CASE 將組別代碼依 mapping（舊代碼 → 新代碼）改寫
+
+    不論搬動多少組都只有一個 UPDATE 陳述式，不會與其他儲存交錯成一半的狀態。
+    回傳更新的參賽者數量。
+    """
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return 0
+
+    return Participant.query.filter(
+        Participant.tournament_id == tournament_id,
+        Participant.group_code.in_(list(mapping))
+    ).update(
+        {Participant.group_code: case(mapping, value=Participant.group_code)},
+        synchronize_session=False
+    )
+
+
+def group_sizes(tournament_id):
+    """賽事各組別（不含未分組）的人數"""
+    rows = db.session.query(Participant.group_code, func.count(Participant.id)).filter(
+        Participant.tournament_id == tournament_id,
+        Participant.group_code.isnot(None),
+        Participant.group_code != UNASSIGNED
+    ).group_by(Participant.group_code)
+    return dict(rows)
+
+
+def group_codes(tournament_id):
+    """賽事目前使用中的組別代碼（不含未分組）"""
+    rows = db.session.query(Participant.group_code).filter(
+        Participant.tournament_id == tournament_id,
+        Participant.group_code.isnot(None),
+        Participant.group_code != UNASSIGNED
+    ).distinct()
+    return {code for code, in rows}
+
+
+def reorder_mapping(order):
+    """依新的組別順序產生代碼對照：order[i] 的組別改為第 i+1 組"""
+    return {code: str(position) for position, code in enumerate(order, start=1)}
+
+
+def assign_order_keys(participants):
+    """依清單順序重新指定平均分布的排序鍵（只有鍵有變動的參賽者會被寫入）"""
+    for participant, key in zip(participants, evenly_spaced_keys(len(participants))):
+        participant.order_key = key
+
+
+def next_order_key(tournament_id):
+    """排在賽事名單最後面的新排序鍵"""
+    last_key = db.session.query(func.max(Participant.order_key)).filter(
+        Participant.tournament_id == tournament_id
+    ).scalar()
+    return key_between(last_key, None)
+
+
+def set_group_positions(tournament_id, codes):
+    """依組別順序重建組別位置"""
+    GroupPosition.query.filter_by(tournament_id=tournament_id).delete(synchronize_session=False)
+    for code, key in zip(codes, evenly_spaced_keys(len(codes))):
+        db.session.add(GroupPosition(tournament_id=tournament_id, group_code=code, order_key=key))
+
+
+def _numeric_first(code):
+    return (0, int(code), code) if code.isdigit() else (1, 0, code)
+
+
+def ensure_group_positions(tournament_id):
+    """為尚未有位置的組別補上位置，接在既有組別之後（依組別號碼排序）"""
+    positions = {
+        gp.group_code: gp.order_key
+        for gp in GroupPosition.query.filter_by(tournament_id=tournament_id)
+    }
+    missing = sorted(group_codes(tournament_id) - set(positions), key=_numeric_first)
+    last_key = max(positions.values(), default=None)
+    for code in missing:
+        last_key = key_between(last_key, None)
+        db.session.add(GroupPosition(tournament_id=tournament_id, group_code=code, order_key=last_key))
+        positions[code] = last_key
+    return positions
+
+
+def ordered_group_codes(tournament_id):
+    """依組別位置排列的組別代碼"""
+    positions = ensure_group_positions(tournament_id)
+    return sorted(positions, key=lambda code: positions[code])
+
+
+def _participant_key(tournament_id, participant_id):
+    if participant_id is None:
+        return None
+    row = db.session.query(Participant.order_key).filter_by(
+        id=participant_id, tournament_id=tournament_id
+    ).first()
+    if row is None:
+        raise NotFoundError(f'找不到參賽者：{participant_id}')
+    return row[0]
+
+
+def move_participant_to(participant, group_code, prev_id=None, next_id=None):
+    """
+    將參賽者移到 group_code，排在 prev_id 之後、next_id 之前
+
+    只讀取相鄰兩位的排序鍵，並只寫入被移動的這一列。
+    """
+    prev_key = _participant_key(participant.tournament_id, prev_id)
+    next_key = _participant_key(participant.tournament_id, next_id)
+
+    participant.group_code = group_code
+    participant.order_key = key_between(prev_key, next_key)
+    return participant.order_key
+
+
+def move_group_to(tournament_id, group_code, prev_code=None, next_code=None):
+    """將組別移到 prev_code 之後、next_code 之前，只寫入該組別的位置"""
+    positions = ensure_group_positions(tournament_id)
+    if group_code not in positions:
+        raise NotFoundError(f'找不到組別：{group_code}')
+    for code in (prev_code, next_code):
+        if code is not None and code not in positions:
+            raise NotFoundError(f'找不到組別：{code}')
+
+    key = key_between(
+        positions[prev_code] if prev_code is not None else None,
+        positions[next_code] if next_code is not None else None
+    )
+    GroupPosition.query.filter_by(tournament_id=tournament_id, group_code=group_code).update(
+        {GroupPosition.order_key: key}, synchronize_session=False
+    )
+    return key
+
+
+def rebalance_order_keys(tournament_id):
+    """排序鍵過長時，依目前順序重新平均分配參賽者與組別的排序鍵"""
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(
+        Participant.order_key, Participant.display_order, Participant.id
+    ).all()
+    assign_order_keys(participants)
+    set_group_positions(tournament_id, ordered_group_codes(tournament_id))
+    touch_tournament(tournament_id)
+
+
+def _rebalance_in_background(app, tournament_id):
+    with app.app_context():
+        try:
+            rebalance_order_keys(tournament_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"重新分配排序鍵時發生錯誤：{str(e)}")
+
+
+def schedule_rebalance_if_needed(tournament_id, key):
+    """新的排序鍵過長時，在背景執行緒中重新分配（請在提交交易後呼叫）"""
+    if not needs_rebalance(key):
+        return False
+    app = current_app._get_current_object()
+    threading.Thread(target=_rebalance_in_background, args=(app, tournament_id), daemon=True).start()
+    return True
+
+
+def get_participant(tournament_id, participant_id):
+    """取得賽事中的參賽者；tournament_id 為 None 時不檢查所屬賽事"""
+    if not isinstance(participant_id, int) or isinstance(participant_id, bool):
+        raise ValueError('參賽者編號必須是整數')
+    participant = Participant.query.get(participant_id)
+    if not participant:
+        raise NotFoundError('找不到指定的參賽者')
+    if tournament_id is not None and participant.tournament_id != tournament_id:
+        raise ValueError('參賽者不屬於指定的賽事')
+    return participant
+
+
+def check_in(participant, status, check_in_time=None):
+    """更新報到狀態；check_in_time 為 ISO 格式字串，省略時清除報到時間"""
+    if check_in_time is not None and not isinstance(check_in_time, str):
+        raise ValueError('報到時間必須是 ISO 格式字串')
+    participant.check_in_status = status
+    if check_in_time:
+        participant.check_in_time = datetime.fromisoformat(check_in_time.replace('Z', '+00:00'))
+    else:
+        participant.check_in_time = None
+
+
+def set_notes(participant, notes):
+    participant.notes = notes
+
+
+def delete(participant):
+    if participant.check_in_status == 'checked_in':
+        raise ValueError('已報到的參賽者不能刪除')
+    db.session.delete(participant)
+
+
+def move(participant, group_code):
+    """只改參賽者的組別（'未分組' 視為未分組），不變更排序鍵"""
+    participant.group_code = None if group_code == UNASSIGNED else group_code
+
+
+def move_to_position(participant, group_code, prev_id=None, next_id=None):
+    """將參賽者移到 group_code 中 prev_id 與 next_id 之間，回傳新的排序鍵"""
+    if group_code == UNASSIGNED:
+        group_code = None
+    try:
+        return move_participant_to(participant, group_code, prev_id=prev_id, next_id=next_id)
+    except NotFoundError:
+        raise
+    except ValueError:
+        raise StaleOrderError('相鄰參賽者順序已變更，請重新整理')
+
+
+def reorder(tournament_id, order=None, group1=None, group2=None):
+    """
+    改寫組別代碼：order 為完整的新組別順序（order[i] 的組別改為第 i+1 組），
+    或交換 group1 與 group2 兩組。回傳更新的參賽者數量。
+
+    組別位置依新的組別號碼重新排列。檢查與改寫之間有其他人變更了分組時
+    （改寫的人數或改寫後的組別與檢查時不同）拋出 StaleOrderError，由呼叫端回滾。
+    """
+    sizes = group_sizes(tournament_id)
+    if order is not None:
+        if not isinstance(order, list):
+            raise ValueError('組別順序必須是清單')
+        order = [str(code) for code in order]
+        if len(set(order)) != len(order) or set(order) != set(sizes):
+            raise ValueError('組別順序必須包含所有組別且不可重複')
+        mapping = reorder_mapping(order)
+    elif group1 and group2:
+        mapping = {str(group1): str(group2), str(group2): str(group1)}
+    else:
+        raise ValueError('缺少組別資訊')
+
+    # 單一 UPDATE ... CASE 完成所有組別的改寫
+    updated = remap_group_codes(tournament_id, mapping)
+    expected_codes = {mapping.get(code, code) for code in sizes}
+    if updated != sum(sizes.get(old, 0) for old, new in mapping.items() if old != new) \
+            or group_codes(tournament_id) != expected_codes:
+        raise StaleOrderError('分組已被其他人變更，請重新整理')
+
+    remap_group_stats(tournament_id, mapping)
+    set_group_positions(tournament_id, sorted(expected_codes, key=_numeric_first))
+    return updated
+
+
+def move_if_newer(tournament_id, participant_id, drag_id, seq, group_code, prev_id=None, next_id=None):
+    """
+    以單一條件式 UPDATE 移動參賽者
+
+    序號只在同一個拖曳工作階段（drag_id）內比較：同一個 drag_id 只有 seq 大於已寫入的
+    move_seq 才生效；不同的 drag_id（另一個用戶端或重新整理後的新拖曳）一律寫入，以最後寫入為準。
+    條件同時比對讀取時影響分組統計的欄位，期間被其他請求改過就不寫入。
+    有指定 prev_id 或 next_id 時同時決定組內位置。
+    回傳 (是否寫入, 排序鍵)；序號過期或資料已變更時不寫入。找不到參賽者時拋出 NotFoundError。
+    """
+    if group_code == UNASSIGNED:
+        group_code = None
+    row = db.session.query(
+        Participant.tournament_id, Participant.group_code, Participant.check_in_status,
+        Participant.gender, Participant.handicap, Participant.order_key,
+        Participant.move_drag_id, Participant.move_seq
+    ).filter_by(id=participant_id, tournament_id=tournament_id).first()
+    if row is None:
+        raise NotFoundError('找不到指定的參賽者')
+    if row.move_drag_id == drag_id and row.move_seq is not None and row.move_seq >= seq:
+        return False, row.order_key
+
+    if prev_id is None and next_id is None:
+        order_key = row.order_key
+    else:
+        try:
+            order_key = key_between(
+                _participant_key(tournament_id, prev_id),
+                _participant_key(tournament_id, next_id)
+            )
+        except ValueError:
+            raise StaleOrderError('相鄰參賽者順序已變更，請重新整理')
+
+    values = dict(row._mapping)
+    unchanged = [
+        getattr(Participant, name).is_(None) if values[name] is None else getattr(Participant, name) == values[name]
+        for name in ('group_code', 'check_in_status', 'gender', 'handicap')
+    ]
+    updated = Participant.query.filter(
+        Participant.id == participant_id,
+        db.or_(
+            Participant.move_drag_id.is_(None),
+            Participant.move_drag_id != drag_id,
+            Participant.move_seq.is_(None),
+            Participant.move_seq < seq
+        ),
+        *unchanged
+    ).update({
+        Participant.group_code: group_code,
+        Participant.order_key: order_key,
+        Participant.move_drag_id: drag_id,
+        Participant.move_seq: seq,
+        Participant.move_failure: None
+    }, synchronize_session=False)
+    if not updated:
+        return False, row.order_key
+
+    apply_group_change(values, group_code)
+    return True, order_key
+
+
+def move_superseded(participant_id, drag_id, seq):
+    """同一次拖曳是否已寫入相同或更新的序號（此時未寫入不算失敗）"""
+    return db.session.query(Participant.id).filter(
+        Participant.id == participant_id,
+        Participant.move_drag_id == drag_id,
+        Participant.move_seq >= seq
+    ).first() is not None
+
+
+def record_move_failure(participant_id, drag_id, seq, error):
+    """記錄未寫入的拖曳移動，供前端輪詢；同一次拖曳已記錄更新序號的失敗時不覆蓋"""
+    failure = db.session.query(Participant.move_failure).filter_by(id=participant_id).scalar()
+    if failure and failure.get('drag_id') == drag_id and failure.get('seq', 0) > seq:
+        return
+    Participant.query.filter_by(id=participant_id).update({
+        Participant.move_failure: {'drag_id': drag_id, 'seq': seq, 'error': error}
+    }, synchronize_session=False)
+
+
+def move_status(participant, drag_id, seq, pending):
+    """
+    某次拖曳移動（drag_id 的第 seq 個移動）的結果：
+    applied（已寫入相同或更新的序號）、failed（未寫入，附 error）、
+    pending（尚在等待寫入）、superseded（已被其他拖曳取代）
+    """
+    failure = participant.move_failure
+    if failure and failure.get('drag_id') == drag_id and failure.get('seq', 0) >= seq:
+        return {'state': 'failed', 'error': failure.get('error')}
+    if participant.move_drag_id == drag_id:
+        if participant.move_seq >= seq:
+            return {'state': 'applied'}
+        return {'state': 'pending'}
+    if pending:
+        return {'state': 'pending'}
+    return {'state': 'superseded'}
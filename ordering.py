@@ -0,0 +1,69 @@
+"""
+分數排序鍵
+
+以字串表示 0 與 1 之間的小數（36 進位，0-9a-z），字串比較即為大小比較。
+在任兩個鍵之間一定能產生新的鍵，因此拖曳移動一位參賽者（或一個組別）
+只需要寫入被移動的那一列，不必重新編號整份名單。
+
+鍵不以 '0' 結尾，確保每個數值只有一種表示法。只使用數字與小寫字母，
+在 SQLite（BINARY）與 PostgreSQL 常見的定序下排序結果一致。
+"""
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# 鍵長度超過此值時，在背景重新平均分配整個賽事的鍵
+MAX_KEY_LENGTH = 12
+
+
+def _midpoint(a, b):
+    """a < b 之間的鍵；a 為空字串代表 0，b 為 None 代表 1"""
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else '0') == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def key_between(before, after):
+    """
+    產生介於 before 與 after 之間的鍵
+
+    before 為 None 代表放在最前面，after 為 None 代表放在最後面。
+    """
+    before = before or ''
+    if after is not None and before >= after:
+        raise ValueError(f'排序鍵順序錯誤：{before!r} >= {after!r}')
+    return _midpoint(before, after)
+
+
+def _to_key(value, width):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        chars.append(DIGITS[digit])
+    return ''.join(reversed(chars)).rstrip('0')
+
+
+def evenly_spaced_keys(count):
+    """產生 count 個平均分布的鍵，用於整份名單重新排序或匯入"""
+    if count <= 0:
+        return []
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+    return [_to_key(step * (i + 1), width) for i in range(count)]
+
+
+def needs_rebalance(key):
+    return key is not None and len(key) > MAX_KEY_LENGTH
@@ -0,0 +1,110 @@
+"""
+歷史同組索引
+
+將過去賽事的分組（Participant.group_code）整理成 pairings 表：每場賽事中同組的
+兩位會員存一列。索引以賽事為單位增量建立，已建立過的賽事不會重複計算；
+分組時只載入本場參賽會員之間的紀錄，組成稀疏的同組次數矩陣。
+"""
+
+from datetime import datetime
+from itertools import combinations
+
+from sqlalchemy import func
+
+from extensions import db
+from models import Tournament, Participant, Pairing
+
+_EMPTY_MEMBER_NUMBERS = {'', 'nan', 'none'}
+
+
+def normalize_member_number(member_number):
+    """統一會員編號格式，無效的編號回傳 None"""
+    if member_number is None:
+        return None
+    value = str(member_number).strip().upper()
+    if value.lower() in _EMPTY_MEMBER_NUMBERS:
+        return None
+    return value
+
+
+class PairingMatrix:
+    """以 (member_a, member_b) 為鍵的稀疏同組次數矩陣，member_a < member_b"""
+
+    def __init__(self, counts=None):
+        self.counts = counts or {}
+
+    def cost(self, member_a, member_b):
+        a = normalize_member_number(member_a)
+        b = normalize_member_number(member_b)
+        if a is None or b is None or a == b:
+            return 0
+        if a > b:
+            a, b = b, a
+        return self.counts.get((a, b), 0)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+def index_tournament(tournament):
+    """重建單一賽事的同組紀錄（先刪除舊紀錄再寫入），不提交交易"""
+    Pairing.query.filter_by(tournament_id=tournament.id).delete(synchronize_session=False)
+
+    rows = db.session.query(Participant.group_code, Participant.member_number).filter(
+        Participant.tournament_id == tournament.id,
+        Participant.group_code.isnot(None),
+        Participant.group_code != '未分組'
+    ).all()
+
+    groups = {}
+    for group_code, member_number in rows:
+        member = normalize_member_number(member_number)
+        if member:
+            groups.setdefault(group_code, set()).add(member)
+
+    pairings = [
+        {'tournament_id': tournament.id, 'member_a': a, 'member_b': b}
+        for members in groups.values()
+        for a, b in combinations(sorted(members), 2)
+    ]
+    if pairings:
+        db.session.execute(Pairing.__table__.insert(), pairings)
+
+    tournament.pairings_indexed_at = datetime.utcnow()
+    return len(pairings)
+
+
+def refresh_pairing_index(before_date=None, force=False):
+    """
+    增量建立同組索引
+
+    只處理日期早於 before_date 且尚未建立索引的賽事；force=True 時全部重建。
+    回傳本次處理的賽事數量，不提交交易。
+    """
+    query = Tournament.query
+    if before_date is not None:
+        query = query.filter(Tournament.date < before_date)
+    if not force:
+        query = query.filter(Tournament.pairings_indexed_at.is_(None))
+
+    tournaments = query.all()
+    for tournament in tournaments:
+        index_tournament(tournament)
+    return len(tournaments)
+
+
+def load_pairing_matrix(member_numbers, exclude_tournament_id=None):
+    """載入指定會員之間的同組次數，只查詢本場參賽者相關的紀錄"""
+    members = sorted({m for m in map(normalize_member_number, member_numbers) if m})
+    if len(members) < 2:
+        return PairingMatrix()
+
+    query = db.session.query(Pairing.member_a, Pairing.member_b, func.count(Pairing.id)).filter(
+        Pairing.member_a.in_(members),
+        Pairing.member_b.in_(members)
+    )
+    if exclude_tournament_id is not None:
+        query = query.filter(Pairing.tournament_id != exclude_tournament_id)
+
+    rows = query.group_by(Pairing.member_a, Pairing.member_b).all()
+    return PairingMatrix({(a, b): count for a, b, count in rows})
@@ -0,0 +1,195 @@
+"""
+單一請求的效能剖析
+
+管理員在請求帶上 X-Profile 標頭（或 ?_profile= 查詢參數）與 X-Admin-Token 時，
+以剖析器包住這一次請求，結果存到 PROFILE_DIR：
+    X-Profile: cprofile   決定性剖析（cProfile），存成 .prof，可用 snakeviz 或
+                          python -m pstats 檢視
+    X-Profile: sample     取樣剖析，每 PROFILE_SAMPLE_INTERVAL_MS 毫秒記錄一次
+                          呼叫堆疊，存成 .folded（collapsed stacks），可直接交給
+                          flamegraph.pl 或 speedscope 產生火焰圖
+回應帶有 X-Profile-Id 標頭。目錄中最多保留 PROFILE_RING_SIZE 份，超過時刪除最舊的。
+
+以 WSGI 中介層實作：沒有帶剖析標頭或參數的請求只多一次字典查詢，幾乎沒有額外負擔。
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from admin import token_matches
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+_PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-z_]+$')
+
+
+def _slug(path):
+    return re.sub(r'[^0-9a-z]+', '_', path.lower()).strip('_')[:60] or 'root'
+
+
+class StackSampler:
+    """在背景執行緒中定期取樣目標執行緒的呼叫堆疊"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """包住 app.wsgi_app 的剖析中介層"""
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.directory = app.config['PROFILE_DIR']
+        self.ring_size = app.config['PROFILE_RING_SIZE']
+        self.sample_interval = app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000
+        self._lock = threading.Lock()
+        app.wsgi_app = self
+        app.extensions['profiler'] = self
+
+    def _requested_mode(self, environ):
+        mode = environ.get('HTTP_X_PROFILE')
+        if mode is None:
+            query = environ.get('QUERY_STRING', '')
+            if '_profile=' not in query:
+                return None
+            mode = parse_qs(query).get('_profile', [''])[0]
+        mode = mode.strip().lower()
+        if mode in ('1', 'true', ''):
+            mode = 'cprofile'
+        if mode not in PROFILE_MODES:
+            return None
+        if not token_matches(self.app.config, environ.get('HTTP_X_ADMIN_TOKEN')):
+            return None
+        return mode
+
+    def __call__(self, environ, start_response):
+        mode = self._requested_mode(environ)
+        if mode is None:
+            return self.wsgi_app(environ, start_response)
+
+        method = environ.get('REQUEST_METHOD', 'GET')
+        path = environ.get('PATH_INFO', '/')
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}_{_slug(path)}"
+        status = {}
+
+        def profiled_start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            return start_response(status_line, headers + [('X-Profile-Id', profile_id)], exc_info)
+
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        start = time.perf_counter()
+        try:
+            # 讀完整個回應，串流產生的時間也計入剖析
+            body = self.wsgi_app(environ, profiled_start_response)
+            try:
+                chunks = list(body)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+            try:
+                self._save(profile_id, mode, profiler, {
+                    'id': profile_id,
+                    'mode': mode,
+                    'method': method,
+                    'path': path,
+                    'query': environ.get('QUERY_STRING', ''),
+                    'status': status.get('code'),
+                    'duration_ms': round(elapsed_ms, 2),
+                    'created_at': datetime.utcnow().isoformat(),
+                })
+            except Exception as e:
+                print(f"儲存剖析結果時發生錯誤：{str(e)}")
+        return chunks
+
+    def _save(self, profile_id, mode, profiler, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        if mode == 'cprofile':
+            filename = f'{profile_id}.prof'
+            profiler.dump_stats(os.path.join(self.directory, filename))
+        else:
+            filename = f'{profile_id}.folded'
+            with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as f:
+                f.write(profiler.folded())
+            meta['samples'] = sum(profiler.stacks.values())
+        meta['file'] = filename
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._prune()
+
+    def _prune(self):
+        """只保留最新的 ring_size 份剖析結果"""
+        with self._lock:
+            for meta in self.list_profiles()[self.ring_size:]:
+                for name in (f"{meta['id']}.json", meta.get('file')):
+                    if name and os.path.exists(os.path.join(self.directory, name)):
+                        os.remove(os.path.join(self.directory, name))
+
+    def list_profiles(self):
+        """已保存的剖析結果（新的在前）"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def profile_path(self, profile_id):
+        """剖析結果檔案的路徑；編號不合法或不存在時回傳 None"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        for extension in ('.prof', '.folded'):
+            path = os.path.join(self.directory, profile_id + extension)
+            if os.path.exists(path):
+                return path
+        return None
@@ -0,0 +1,133 @@
+"""
+慢查詢紀錄
+
+以 SQLAlchemy 的 cursor 事件計時每個 SQL 陳述式，超過 SLOW_QUERY_MS 毫秒的記錄到
+固定大小的環狀緩衝（SLOW_QUERY_RING_SIZE 筆），內容包括：
+- 陳述式與參數的形狀（只記錄型別，不記錄值，避免個資進入紀錄）
+- 發出查詢的路由（背景工作則為執行緒名稱）
+- 執行計畫：每個不同的陳述式只取一次（SQLite 用 EXPLAIN QUERY PLAN，其他用 EXPLAIN），
+  例如匯出時 ORDER BY CAST(group_code AS INTEGER) 無法使用索引、需要另外排序
+
+只對 SELECT 取執行計畫：PostgreSQL 上 EXPLAIN 失敗會讓整個交易中止，
+而已經成功執行過的 SELECT 不會有這個問題。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 最多快取多少個不同陳述式的執行計畫
+MAX_PLANS = 500
+
+
+def _value_shape(value):
+    return type(value).__name__
+
+
+def parameter_shape(parameters, executemany):
+    """參數的形狀：dict 記錄每個鍵的型別，序列記錄每個位置的型別"""
+    if executemany:
+        rows = list(parameters)
+        return {'executemany': len(rows), 'row': parameter_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _origin():
+    if has_request_context():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        return f'{request.method} {rule}'
+    return threading.current_thread().name
+
+
+def _is_select(statement):
+    return statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'WITH')
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.threshold_ms = None
+        self.entries = deque(maxlen=200)
+        self.plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        threshold = app.config.get('SLOW_QUERY_MS')
+        self.threshold_ms = float(threshold) if threshold is not None and float(threshold) >= 0 else None
+        self.entries = deque(self.entries, maxlen=app.config.get('SLOW_QUERY_RING_SIZE', 200))
+        app.extensions['slow_query_log'] = self
+
+        if self.threshold_ms is not None and not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before)
+            event.listen(Engine, 'after_cursor_execute', self._after)
+            self._listening = True
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        if self.threshold_ms is None or elapsed_ms < self.threshold_ms:
+            return
+
+        params = parameters[0] if executemany and parameters else parameters
+        self.entries.append({
+            'at': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed_ms, 2),
+            'statement': statement,
+            'parameters': parameter_shape(parameters, executemany),
+            'origin': _origin(),
+            'plan': self._plan(conn, statement, params),
+        })
+
+    def _plan(self, conn, statement, parameters):
+        """取得陳述式的執行計畫，同一個陳述式只取一次"""
+        with self._lock:
+            if statement in self.plans:
+                self.plans.move_to_end(statement)
+                return self.plans[statement]
+
+        if not _is_select(statement):
+            plan = None
+        else:
+            prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+            # 直接使用 DBAPI cursor，不觸發 SQLAlchemy 事件（也不會被自己計時）
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+            except Exception as e:
+                plan = [f'無法取得執行計畫：{str(e)}']
+            finally:
+                cursor.close()
+
+        with self._lock:
+            self.plans[statement] = plan
+            if len(self.plans) > MAX_PLANS:
+                self.plans.popitem(last=False)
+        return plan
+
+    def recent(self, limit=None):
+        """最近的慢查詢（新的在前）"""
+        entries = list(self.entries)[::-1]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        self.entries.clear()
+        with self._lock:
+            self.plans.clear()
+
+
+slow_query_log = SlowQueryLog()
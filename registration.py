@@ -0,0 +1,102 @@
+"""
+報名序號配發
+
+每場賽事在 registration_counters 表中有一列計數器，配發序號只需一個
+UPDATE ... SET last_number = last_number + N：
+- PostgreSQL 直接使用 UPDATE ... RETURNING，資料列鎖確保同時配發不會重複
+- SQLite 不支援 RETURNING（SQLAlchemy 1.4），UPDATE 會先取得資料庫寫入鎖，
+  同一交易內再讀回 last_number，其他寫入者必須等待本交易結束
+計數器第一次使用時，才以既有參賽者的最大序號初始化。
+"""
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Participant, RegistrationCounter
+
+PREFIX = 'A'
+
+
+def format_registration_number(number):
+    return f'{PREFIX}{number:02d}'
+
+
+def _parse_registration_number(value):
+    if value and value.startswith(PREFIX):
+        try:
+            return int(value[len(PREFIX):])
+        except ValueError:
+            return None
+    return None
+
+
+def _max_registration_number(tournament_id):
+    """既有參賽者的最大報名序號（沒有時為 0）"""
+    numbers = db.session.query(Participant.registration_number).filter(
+        Participant.tournament_id == tournament_id,
+        Participant.registration_number.like(f'{PREFIX}%')
+    )
+    return max(
+        (n for n in (_parse_registration_number(r) for r, in numbers) if n is not None),
+        default=0
+    )
+
+
+def _seed_counter(tournament_id):
+    """以既有參賽者的最大報名序號建立計數器（每場賽事只會執行一次）"""
+    max_number = _max_registration_number(tournament_id)
+    try:
+        with db.session.begin_nested():
+            db.session.add(RegistrationCounter(tournament_id=tournament_id, last_number=max_number))
+    except IntegrityError:
+        # 其他請求已同時建立計數器
+        pass
+
+
+def _increment(tournament_id, count):
+    table = RegistrationCounter.__table__
+    stmt = table.update().where(
+        table.c.tournament_id == tournament_id
+    ).values(last_number=table.c.last_number + count)
+
+    if getattr(db.engine.dialect, 'full_returning', False):
+        return db.session.execute(stmt.returning(table.c.last_number)).scalar()
+
+    if db.session.execute(stmt).rowcount == 0:
+        return None
+    return db.session.execute(
+        db.select(table.c.last_number).where(table.c.tournament_id == tournament_id)
+    ).scalar()
+
+
+def allocate_registration_numbers(tournament_id, count=1):
+    """
+    配發 count 個連續的報名序號，回傳序號字串清單
+
+    配發在目前的交易中進行，由呼叫端提交；交易回滾時序號也一併作廢。
+    """
+    if count < 1:
+        raise ValueError('配發數量必須大於 0')
+
+    last_number = _increment(tournament_id, count)
+    if last_number is None:
+        _seed_counter(tournament_id)
+        last_number = _increment(tournament_id, count)
+
+    return [format_registration_number(n) for n in range(last_number - count + 1, last_number + 1)]
+
+
+def peek_next_registration_number(tournament_id):
+    """預覽下一個報名序號（不配發，也不建立計數器）"""
+    counter = RegistrationCounter.query.get(tournament_id)
+    last_number = counter.last_number if counter is not None else _max_registration_number(tournament_id)
+    return format_registration_number(last_number + 1)
+
+
+def reset_registration_counter(tournament_id, last_number):
+    """重新匯入名單後，將計數器設為新的最大序號"""
+    counter = RegistrationCounter.query.get(tournament_id)
+    if counter is None:
+        db.session.add(RegistrationCounter(tournament_id=tournament_id, last_number=last_number))
+    else:
+        counter.last_number = last_number
@@ -0,0 +1,508 @@
+"""
+名單匯入與分組匯出
+
+Excel 名單解析、寫入參賽者，以及分組表（Excel）與分組圖（HTML）的產生。
+供 API 端點與背景工作（jobs.py）共用；progress 參數為 progress(done, total)
+形式的回呼，可省略。
+
+pandas 與 openpyxl 載入很慢，只在實際匯入、匯出時才載入，
+不拖慢 worker 啟動。
+"""
+
+import re
+from io import BytesIO
+
+from sqlalchemy import case
+
+from extensions import db
+from group_stats import rebuild_group_stats
+from groups_view import group_order_key
+from models import Participant, GroupPosition
+from operations import assign_order_keys, touch_tournament
+from registration import format_registration_number, reset_registration_counter
+
+REQUIRED_COLUMNS = ['姓名', '差點']
+
+PRE_GROUP_CODE_COLUMN = '預編組代號'
+PRE_GROUP_MEMBER_COLUMNS = ['名單1', '名單2', '名單3', '名單4']
+
+# 每處理多少筆回報一次進度
+PROGRESS_STEP = 50
+
+_INVISIBLE_CHARS = re.compile('[​-‏﻿]')
+
+
+def _is_blank(value):
+    """None 或 NaN（pandas 讀到的空白儲存格）"""
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def clean_text(value):
+    """去除前後空白、全形空白與不可見字元，內部連續空白合併為一個"""
+    text = _INVISIBLE_CHARS.sub('', str(value)).replace('　', ' ')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def parse_handicap(value):
+    """解析差點；空白或無法解析時回傳 None，'+2' 這類正差點以負數表示"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = clean_text(value)
+    if not text:
+        return None
+    if text.startswith('+'):
+        text = '-' + text[1:]
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_pre_group_code(value):
+    """預分組編號：數字轉為整數字串，空白視為沒有預分組"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, (int, float)):
+        return str(int(value))
+    code = str(value).strip()
+    if code == '' or code.lower() == 'nan':
+        return None
+    return code
+
+
+def _cell_text(value, default=''):
+    if _is_blank(value):
+        return default
+    text = str(value).strip()
+    return text if text else default
+
+
+def read_roster(file, progress=None):
+    """
+    讀取報名表，回傳參賽者資料（dict）清單
+
+    缺少必要欄位時拋出 ValueError。
+    """
+    import pandas as pd
+
+    df = pd.read_excel(file)
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f'缺少必要欄位：{", ".join(missing_columns)}')
+
+    return parse_roster_frame(df, progress)
+
+
+def parse_roster_frame(df, progress=None):
+    """將報名表 DataFrame 轉換為參賽者資料清單"""
+    has_gender = '性別' in df.columns
+    has_member_number = '會員編號' in df.columns
+    has_pre_group = '預分組編號' in df.columns
+
+    total = len(df)
+    rows = []
+    for position, record in enumerate(df.to_dict('records')):
+        rows.append({
+            'name': clean_text(record['姓名']),
+            'gender': _cell_text(record.get('性別'), '男') if has_gender else '男',
+            'handicap': parse_handicap(record['差點']),
+            'member_number': _cell_text(record.get('會員編號')) if has_member_number else '',
+            'pre_group_code': parse_pre_group_code(record.get('預分組編號')) if has_pre_group else None,
+        })
+        if progress and (position + 1) % PROGRESS_STEP == 0:
+            progress(position + 1, total)
+
+    if progress:
+        progress(total, total)
+    return rows
+
+
+def replace_roster(tournament_id, rows):
+    """以匯入的資料取代賽事的參賽者名單，不提交交易；回傳新增人數"""
+    # 清除既有的參賽者資料
+    Participant.query.filter_by(tournament_id=tournament_id).delete()
+
+    participants = []
+    for index, row in enumerate(rows):
+        participant = Participant(
+            tournament_id=tournament_id,
+            registration_number=format_registration_number(index + 1),
+            display_order=index,
+            **row
+        )
+        db.session.add(participant)
+        participants.append(participant)
+
+    assign_order_keys(participants)
+
+    # 報名序號計數器從匯入的最後一號接續
+    reset_registration_counter(tournament_id, len(rows))
+    # 整份名單取代（含整批刪除），分組統計直接重算
+    rebuild_group_stats(tournament_id)
+    touch_tournament(tournament_id, pairings=True)
+    return len(participants)
+
+
+def read_pregroups(file):
+    """
+    讀取預編組表，回傳 (預編組代號, [成員]) 清單
+
+    支援兩種格式：
+    - 每列一個預編組：預編組代號、名單1–名單4，成員可以填姓名或會員編號
+    - 每列一位球員（與報名表相同）：姓名、會員編號（可省略）、預分組編號，
+      例如「20241月報名表-預編組名單.xlsx」；成員以會員編號表示，沒有會員編號時用姓名
+    空白儲存格略過。兩種格式的必要欄位都缺少時拋出 ValueError。
+    """
+    import pandas as pd
+
+    df = pd.read_excel(file)
+
+    if PRE_GROUP_CODE_COLUMN not in df.columns and '預分組編號' in df.columns and '姓名' in df.columns:
+        return _pregroups_from_roster(df)
+
+    required_columns = [PRE_GROUP_CODE_COLUMN] + PRE_GROUP_MEMBER_COLUMNS
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f'缺少必要欄位：{", ".join(missing_columns)}')
+
+    pregroups = []
+    for record in df.to_dict('records'):
+        code = parse_pre_group_code(record[PRE_GROUP_CODE_COLUMN])
+        if code is None:
+            continue
+        members = [clean_text(record[col]) for col in PRE_GROUP_MEMBER_COLUMNS if not _is_blank(record[col])]
+        pregroups.append((code, [member for member in members if member]))
+    return pregroups
+
+
+def _pregroups_from_roster(df):
+    """每列一位球員的預編組表，依預分組編號合併為 (預編組代號, [成員]) 清單"""
+    has_member_number = '會員編號' in df.columns
+    pregroups = {}
+    for record in df.to_dict('records'):
+        code = parse_pre_group_code(record['預分組編號'])
+        if code is None:
+            continue
+        member = clean_text(_cell_text(record.get('會員編號'))) if has_member_number else ''
+        member = member or clean_text(_cell_text(record['姓名']))
+        if member:
+            pregroups.setdefault(code, []).append(member)
+    return list(pregroups.items())
+
+
+def apply_pregroups(tournament_id, pregroups):
+    """
+    將預編組代號寫入參賽者，不提交交易
+
+    先以一次查詢建立會員編號、姓名 → 參賽者的對照，在記憶體中比對所有成員
+    （會員編號優先），再以單一 UPDATE ... CASE 寫入，執行時間不隨預編組列數增加。
+    預編組表是完整的名單：不在表中（或無法確定預編組）的參賽者，原有的預編組代號在同一個 UPDATE 中清除。
+    回傳比對結果：
+        updated    更新的參賽者數量
+        cleared    清除舊預編組代號的參賽者數量
+        unmatched  找不到的成員
+        ambiguous  同名多人，或同一人出現在不同預編組的成員（皆不寫入）
+    """
+    by_member_number = {}
+    by_name = {}
+    assigned = set()
+    rows = db.session.query(
+        Participant.id, Participant.name, Participant.member_number, Participant.pre_group_code
+    ).filter(Participant.tournament_id == tournament_id)
+    for participant_id, name, member_number, pre_group_code in rows:
+        if member_number:
+            by_member_number.setdefault(clean_text(member_number), []).append(participant_id)
+        by_name.setdefault(clean_text(name), []).append(participant_id)
+        if pre_group_code:
+            assigned.add(participant_id)
+
+    codes = {}
+    conflicts = set()
+    unmatched = []
+    ambiguous = []
+    for code, members in pregroups:
+        for member in members:
+            candidates = by_member_number.get(member) or by_name.get(member) or []
+            if not candidates:
+                unmatched.append({'pre_group_code': code, 'member': member})
+            elif len(candidates) > 1:
+                ambiguous.append({'pre_group_code': code, 'member': member, 'reason': '同名參賽者不只一位'})
+            elif codes.setdefault(candidates[0], code) != code:
+                ambiguous.append({'pre_group_code': code, 'member': member, 'reason': '出現在多個預編組'})
+                conflicts.add(candidates[0])
+
+    mapping = {participant_id: code for participant_id, code in codes.items() if participant_id not in conflicts}
+    cleared = assigned - set(mapping)
+    if mapping or cleared:
+        Participant.query.filter(
+            Participant.tournament_id == tournament_id,
+            Participant.id.in_(list(mapping) + list(cleared))
+        ).update(
+            {Participant.pre_group_code: case(mapping, value=Participant.id, else_=None) if mapping else None},
+            synchronize_session=False
+        )
+        touch_tournament(tournament_id)
+
+    return {'updated': len(mapping), 'cleared': len(cleared), 'unmatched': unmatched, 'ambiguous': ambiguous}
+
+
+def ordered_for_export(tournament_id):
+    """依組別順序（與報到畫面相同，含拖曳的組別位置）、排序鍵排列的參賽者，供匯出使用"""
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(
+        Participant.order_key.asc(),
+        Participant.display_order.asc(),
+        Participant.registration_number.asc()
+    ).all()
+    positions = dict(db.session.query(GroupPosition.group_code, GroupPosition.order_key).filter(
+        GroupPosition.tournament_id == tournament_id
+    ))
+    # 組別順序在 Python 中排序（穩定排序保留組內順序），非數字代碼不會讓查詢失敗
+    return sorted(participants, key=lambda p: group_order_key(p.group_code, positions.get(p.group_code)))
+
+
+def build_groups_workbook(tournament_name, participants, progress=None):
+    """產生分組表 Excel，回傳 BytesIO"""
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+
+    female_fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
+    group_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+
+    total = len(participants) * 2
+    done = 0
+
+    # 創建一個新的 Excel 工作簿
+    wb = openpyxl.Workbook()
+
+    # 創建分組名單工作表（放在最前面）
+    ws_list = wb.active
+    ws_list.title = "分組名單"
+
+    # 設置標題
+    ws_list.append([f"{tournament_name} 分組名單"])
+    ws_list.append(["姓名", "性別", "備註"])
+
+    # 設置標題樣式
+    title_font = Font(name='微軟正黑體', size=14, bold=True)
+    header_font = Font(name='微軟正黑體', size=12, bold=True)
+    ws_list['A1'].font = title_font
+    ws_list.merge_cells('A1:C1')
+    ws_list['A1'].alignment = Alignment(horizontal='center')
+
+    for cell in ws_list[2]:
+        cell.font = header_font
+
+    # 按組別分類參賽者
+    current_group = None
+    row_idx = 3
+
+    for p in participants:
+        if p.group_code != current_group:
+            current_group = p.group_code
+            group_name = f"第 {current_group} 組" if current_group else "未分組"
+            ws_list.append([group_name])
+            ws_list.merge_cells(f'A{row_idx}:C{row_idx}')
+            ws_list[f'A{row_idx}'].font = Font(name='微軟正黑體', size=12, bold=True)
+            ws_list[f'A{row_idx}'].fill = group_fill
+            row_idx += 1
+
+        # 添加參賽者資料
+        gender = "女" if p.gender == "F" else "男"
+        ws_list.append([p.name, gender, p.notes or ''])
+
+        # 如果是女生，設置粉紅色背景（以 cell() 直接取儲存格，ws[列] 與 max_row 每次都要掃描整張表）
+        if p.gender == "F":
+            for column in range(1, 4):
+                ws_list.cell(row=row_idx, column=column).fill = female_fill
+
+        row_idx += 1
+        done += 1
+        if progress and done % PROGRESS_STEP == 0:
+            progress(done, total)
+
+    # 調整欄寬
+    ws_list.column_dimensions['A'].width = 20
+    ws_list.column_dimensions['B'].width = 10
+    ws_list.column_dimensions['C'].width = 30
+
+    # 創建詳細資料工作表
+    ws_detail = wb.create_sheet("詳細資料")
+
+    # 設置標題
+    ws_detail.append([f"{tournament_name} 分組詳細資料"])
+    ws_detail.append(["報名序號", "會員編號", "姓名", "差點", "預分組", "分組", "性別", "備註"])
+
+    # 設置標題樣式
+    ws_detail['A1'].font = title_font
+    ws_detail.merge_cells('A1:H1')
+    ws_detail['A1'].alignment = Alignment(horizontal='center')
+
+    for cell in ws_detail[2]:
+        cell.font = header_font
+
+    # 添加參賽者資料
+    for detail_row, p in enumerate(participants, start=3):
+        gender = "女" if p.gender == "F" else "男"
+        ws_detail.append([
+            p.registration_number,
+            p.member_number,
+            p.name,
+            p.handicap,
+            p.pre_group_code or '',
+            p.group_code or '',
+            gender,
+            p.notes or ''
+        ])
+
+        # 如果是女生，設置粉紅色背景
+        if p.gender == "F":
+            for column in range(1, 9):
+                ws_detail.cell(row=detail_row, column=column).fill = female_fill
+
+        done += 1
+        if progress and done % PROGRESS_STEP == 0:
+            progress(done, total)
+
+    # 調整欄寬
+    ws_detail.column_dimensions['A'].width = 15
+    ws_detail.column_dimensions['B'].width = 15
+    ws_detail.column_dimensions['C'].width = 20
+    ws_detail.column_dimensions['D'].width = 10
+    ws_detail.column_dimensions['E'].width = 10
+    ws_detail.column_dimensions['F'].width = 10
+    ws_detail.column_dimensions['G'].width = 10
+    ws_detail.column_dimensions['H'].width = 30
+
+    # 保存到 BytesIO
+    excel_file = BytesIO()
+    wb.save(excel_file)
+    excel_file.seek(0)
+
+    if progress:
+        progress(total, total)
+    return excel_file
+
+
+DIAGRAM_HEAD = '''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>分組圖</title>
+            <style>
+                body {
+                    font-family: Arial, "Microsoft JhengHei", sans-serif;
+                    padding: 20px;
+                    background-color: #f5f5f5;
+                }
+                .group-container {
+                    display: flex;
+                    flex-wrap: wrap;
+                    gap: 20px;
+                    margin-bottom: 20px;
+                }
+                .group-card {
+                    background: white;
+                    border-radius: 8px;
+                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+                    padding: 16px;
+                    width: 300px;
+                }
+                .group-header {
+                    margin-bottom: 16px;
+                    color: #1976d2;
+                    font-size: 1.2em;
+                    font-weight: bold;
+                }
+                .group-code {
+                    color: #666;
+                    font-size: 0.9em;
+                }
+                .participant {
+                    display: flex;
+                    align-items: center;
+                    padding: 8px 0;
+                    border-bottom: 1px solid #eee;
+                }
+                .participant:last-child {
+                    border-bottom: none;
+                }
+                .gender-icon {
+                    margin: 0 8px;
+                    color: #2196f3;
+                }
+                .gender-icon.female {
+                    color: #f06292;
+                }
+                .handicap {
+                    margin-left: auto;
+                    color: #666;
+                }
+                .drag-handle {
+                    color: #ccc;
+                    margin-right: 8px;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="group-container">
+        '''
+
+DIAGRAM_TAIL = '''
+            </div>
+        </body>
+        </html>
+        '''
+
+
+def build_groups_diagram(participants):
+    """
+    產生分組圖 HTML；沒有已分組的參賽者時回傳 None
+
+    participants 須已依組別順序排列（ordered_for_export），分組卡片依此順序產生。
+    """
+    # 按組別分組（依第一次出現的順序）
+    groups = {}
+    for p in participants:
+        if p.group_code and p.group_code != '未分組':
+            if p.group_code not in groups:
+                groups[p.group_code] = []
+            groups[p.group_code].append(p)
+
+    if not groups:
+        return None
+
+    parts = [DIAGRAM_HEAD]
+
+    # 添加每個分組的卡片
+    for group_code in groups:
+        group = groups[group_code]
+        label = f'G{int(group_code):02d}' if group_code.isdigit() else group_code
+        parts.append(f'''
+                <div class="group-card">
+                    <div class="group-header">
+                        第 {group_code} 組 {len(group)} 人
+                        <div class="group-code">預分組: {label}</div>
+                    </div>
+            ''')
+
+        # 添加組內的參賽者
+        for p in group:
+            gender_icon = '♀' if p.gender == "F" else '♂'
+            gender_class = 'female' if p.gender == "F" else ''
+            parts.append(f'''
+                    <div class="participant">
+                        <span class="drag-handle">≡</span>
+                        <span>{p.name}</span>
+                        <span class="gender-icon {gender_class}">{gender_icon}</span>
+                        <span class="handicap">差點: {p.handicap}</span>
+                    </div>
+                ''')
+
+        parts.append('</div>')
+
+    parts.append(DIAGRAM_TAIL)
+    return ''.join(parts)
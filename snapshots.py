@@ -0,0 +1,123 @@
+"""
+賽事快照快取
+
+讀取（名單、分組、匯出）約為寫入的 20 倍，而兩次寫入之間同一份名單會被反覆查詢、
+反覆 to_dict()。每個 worker 行程以 LRU 保留最近使用的 SNAPSHOT_CACHE_SIZE 場賽事的快照：
+快照屬於賽事的某個版本（Tournament.revision），內含各種檢視（名單 JSON、分組 JSON、
+分組表 Excel、分組圖 HTML），每種檢視在該版本第一次被讀取時產生，之後不再改變。
+
+每次讀取只以主鍵查一次賽事的版本號，版本號改變才丟棄舊快照重建。所有異動都會在
+同一個交易中遞增版本號（operations.touch_tournament），其他 worker 的寫入因此也會
+讓本行程的快照失效，不需要行程間通訊。
+
+命中、未命中與重建時間可由 GET /api/v1/admin/metrics/snapshots 查詢。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from extensions import db
+from models import Tournament
+
+
+class TournamentSnapshot:
+    """賽事某一版本的快照"""
+
+    def __init__(self, tournament_id, revision):
+        self.tournament_id = tournament_id
+        self.revision = revision
+        self.views = {}
+        self.lock = threading.Lock()
+
+
+class SnapshotCache:
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._evictions = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('SNAPSHOT_CACHE_SIZE', self.max_entries)
+        app.extensions['snapshot_cache'] = self
+
+    def current(self, tournament_id):
+        """賽事目前版本的快照（必要時建立新的空快照）；找不到賽事時回傳 None"""
+        revision = db.session.query(Tournament.revision).filter_by(id=tournament_id).scalar()
+        with self._lock:
+            snapshot = self._snapshots.get(tournament_id)
+            if revision is None:
+                self._snapshots.pop(tournament_id, None)
+                return None
+            if snapshot is None or snapshot.revision != revision:
+                snapshot = TournamentSnapshot(tournament_id, revision)
+                self._snapshots[tournament_id] = snapshot
+            self._snapshots.move_to_end(tournament_id)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+                self._evictions += 1
+        return snapshot
+
+    def view(self, tournament_id, name, builder):
+        """
+        取得賽事目前版本的檢視，回傳 (版本號, 內容)；找不到賽事時回傳 None
+
+        builder 不帶參數，回傳的內容必須不可變（bytes、str 或 tuple），會被多個請求共用。
+        """
+        snapshot = self.current(tournament_id)
+        if snapshot is None:
+            return None
+
+        with snapshot.lock:
+            if name in snapshot.views:
+                self._record(name, hit=True)
+                return snapshot.revision, snapshot.views[name]
+
+            start = time.perf_counter()
+            value = builder()
+            self._record(name, hit=False, elapsed_ms=(time.perf_counter() - start) * 1000)
+            snapshot.views[name] = value
+            return snapshot.revision, value
+
+    def _record(self, name, hit, elapsed_ms=0.0):
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'hits': 0, 'misses': 0, 'rebuild_ms_total': 0.0, 'rebuild_ms_max': 0.0
+            })
+            if hit:
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+                stats['rebuild_ms_total'] += elapsed_ms
+                stats['rebuild_ms_max'] = max(stats['rebuild_ms_max'], elapsed_ms)
+
+    def stats(self):
+        """各檢視的命中率與重建時間"""
+        with self._lock:
+            views = {}
+            for name, stats in self._stats.items():
+                requests = stats['hits'] + stats['misses']
+                views[name] = {
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'hit_ratio': round(stats['hits'] / requests, 3) if requests else None,
+                    'rebuild_ms_avg': round(stats['rebuild_ms_total'] / stats['misses'], 2) if stats['misses'] else None,
+                    'rebuild_ms_max': round(stats['rebuild_ms_max'], 2),
+                }
+            return {
+                'entries': len(self._snapshots),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'views': views,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._stats.clear()
+            self._evictions = 0
+
+
+snapshot_cache = SnapshotCache()
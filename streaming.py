@@ -0,0 +1,53 @@
+"""
+串流 JSON 回應
+
+大型名單（整季、多場賽事）若先載入所有 ORM 物件、組成完整的 dict 清單再 jsonify，
+記憶體峰值會是回應大小的好幾倍。這裡以 yield_per 分批讀取（PostgreSQL 上搭配
+stream_results 使用伺服器端游標），逐筆序列化並累積成固定大小的區塊送出，
+記憶體用量只與批次大小有關，與總筆數無關。
+
+同一個 session 的 identity map 只以弱參照保存物件，已送出的物件會被回收。
+"""
+
+import json
+
+from flask import Response, stream_with_context
+
+# 每次從資料庫讀取的筆數
+BATCH_SIZE = 500
+
+# 累積到多少位元組送出一個區塊
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(items, serialize):
+    """將 items 逐筆以 serialize 轉為 dict，產生 JSON 陣列的 bytes 區塊"""
+    buffer = ['[']
+    size = 1
+    first = True
+    for item in items:
+        text = json.dumps(serialize(item), ensure_ascii=False)
+        if not first:
+            text = ',' + text
+        first = False
+        buffer.append(text)
+        size += len(text)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    buffer.append(']')
+    yield ''.join(buffer).encode('utf-8')
+
+
+def stream_query(query, batch_size=BATCH_SIZE):
+    """以伺服器端游標（支援時）分批讀取查詢結果"""
+    return query.execution_options(stream_results=True).yield_per(batch_size)
+
+
+def json_stream_response(query, serialize, batch_size=BATCH_SIZE):
+    """將查詢結果以串流 JSON 陣列回應；產生過程中保留請求與資料庫 session"""
+    return Response(
+        stream_with_context(iter_json_array(stream_query(query, batch_size), serialize)),
+        mimetype='application/json'
+    )
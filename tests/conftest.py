@@ -0,0 +1,79 @@
+"""
+測試共用設定
+
+每個測試使用獨立的暫存 SQLite 資料庫；行程內的快取（賽事快照、壓縮結果、拖曳移動序號）在測試之間清空，
+避免不同資料庫中相同的賽事 ID 互相影響。
+
+執行方式（於專案根目錄）：
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Tournament, Participant  # noqa: E402
+from compression import compressor  # noqa: E402
+from snapshots import snapshot_cache  # noqa: E402
+from coalescing import move_coalescer  # noqa: E402
+
+ADMIN_TOKEN = 'test-admin-token'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('development', test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'golf.db'}",
+        'ADMIN_TOKEN': ADMIN_TOKEN,
+        'JOB_DIR': str(tmp_path / 'jobs'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+    })
+    snapshot_cache.clear()
+    compressor.clear()
+    move_coalescer.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        move_coalescer.flush()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers():
+    return {'X-Admin-Token': ADMIN_TOKEN}
+
+
+@pytest.fixture
+def make_tournament(app):
+    """建立賽事與 players 位參賽者，依序每 group_size 人一組（group_size=None 時不分組）"""
+    def make(players=8, group_size=4, day=date(2026, 1, 1), name='測試賽事'):
+        tournament = Tournament(name=name, date=day)
+        db.session.add(tournament)
+        db.session.flush()
+        for i in range(players):
+            db.session.add(Participant(
+                tournament_id=tournament.id,
+                name=f'球員{i + 1}',
+                member_number=f'M{i + 1:03d}',
+                gender='F' if i % 4 == 3 else 'M',
+                handicap=float(10 + i),
+                group_code=str(i // group_size + 1) if group_size else None,
+                display_order=i + 1,
+                order_key=f'a{i:03d}',
+            ))
+        db.session.commit()
+        return tournament.id
+    return make
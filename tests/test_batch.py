@@ -0,0 +1,100 @@
+import pytest
+
+from extensions import db
+from group_stats import check_group_stats
+from models import Tournament, Participant
+
+
+def _batch(client, tournament_id, operations):
+    return client.post('/api/v1/batch', json={'tournament_id': tournament_id, 'operations': operations})
+
+
+def _participants(tournament_id):
+    db.session.expire_all()
+    return Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.id).all()
+
+
+def _revision(tournament_id):
+    return db.session.query(Tournament.revision).filter_by(id=tournament_id).scalar()
+
+
+def test_batch_applies_all_operations_with_one_revision(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    a, b, c, d = _participants(tournament_id)[:4]
+    revision = _revision(tournament_id)
+
+    response = _batch(client, tournament_id, [
+        {'op': 'check_in', 'participant_id': a.id, 'check_in_status': 'checked_in',
+         'check_in_time': '2026-01-01T08:00:00Z'},
+        {'op': 'move', 'participant_id': b.id, 'group_code': '2'},
+        {'op': 'notes', 'participant_id': c.id, 'notes': '早到'},
+        {'op': 'delete', 'participant_id': d.id},
+        {'op': 'reorder', 'group1': '1', 'group2': '2'},
+    ])
+
+    assert response.status_code == 200
+    assert response.get_json()['revision'] == revision + 1
+    a, b, c = _participants(tournament_id)[:3]
+    assert (a.check_in_status, a.group_code) == ('checked_in', '2')
+    assert b.group_code == '1'
+    assert c.notes == '早到'
+    assert len(_participants(tournament_id)) == 7
+    assert check_group_stats(tournament_id) == []
+
+
+@pytest.mark.parametrize('bad, status', [
+    ({'op': 'check_in', 'participant_id': 9999, 'check_in_status': 'checked_in'}, 404),
+    ({'op': 'check_in', 'check_in_status': 'checked_in'}, 400),
+    ({'op': 'check_in', 'participant_id': 'x', 'check_in_status': 'checked_in'}, 400),
+    ({'op': 'fly'}, 400),
+    ({'op': 'reorder', 'order': 5}, 400),
+])
+def test_failed_operation_rolls_back_whole_batch(client, make_tournament, bad, status):
+    tournament_id = make_tournament(players=8, group_size=4)
+    first = _participants(tournament_id)[0]
+    revision = _revision(tournament_id)
+
+    response = _batch(client, tournament_id, [
+        {'op': 'notes', 'participant_id': first.id, 'notes': '不應保存'},
+        {'op': 'move', 'participant_id': first.id, 'group_code': '2'},
+        bad,
+    ])
+
+    assert response.status_code == status
+    assert response.get_json()['index'] == 2
+    first = _participants(tournament_id)[0]
+    assert (first.notes, first.group_code) == (None, '1')
+    assert _revision(tournament_id) == revision
+    assert check_group_stats(tournament_id) == []
+
+
+def test_missing_field_is_reported_as_bad_request(client, make_tournament):
+    tournament_id = make_tournament(players=4)
+    participant = _participants(tournament_id)[0]
+
+    response = _batch(client, tournament_id, [{'op': 'check_in', 'participant_id': participant.id}])
+
+    assert response.status_code == 400
+    assert 'check_in_status' in response.get_json()['error']
+
+
+def test_stale_neighbours_conflict(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participants = _participants(tournament_id)
+
+    # prev 排在 next 之後：相鄰順序已被其他人變更
+    response = _batch(client, tournament_id, [{
+        'op': 'move', 'participant_id': participants[0].id, 'group_code': '2',
+        'prev_id': participants[7].id, 'next_id': participants[4].id,
+    }])
+
+    assert response.status_code == 409
+
+
+def test_request_validation(client, make_tournament, app):
+    tournament_id = make_tournament(players=2)
+    assert client.post('/api/v1/batch', json={}).status_code == 400
+    assert _batch(client, 999, [{'op': 'notes', 'participant_id': 1}]).status_code == 404
+
+    app.config['BATCH_MAX_OPERATIONS'] = 1
+    assert _batch(client, tournament_id, [{'op': 'fly'}] * 2).status_code == 400
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import shutil
+import zipfile
+from datetime import date
+
+import pytest
+
+from bulk_import import bulk_import, collect_sheets, sheet_kind, is_copy, PREGROUPS, ROSTER
+from extensions import db
+from models import Tournament, Participant
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ROSTER_FILE = '20241月報名表.xlsx'
+COPY_FILE = '20241月報名表-1.xlsx'
+PREGROUP_FILE = '20241月報名表-預編組名單.xlsx'
+
+
+@pytest.fixture
+def season(tmp_path):
+    """模組說明中的三個範例檔：報名表、報名表複本、預編組名單"""
+    for name in (ROSTER_FILE, COPY_FILE, PREGROUP_FILE):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    return collect_sheets(str(tmp_path))
+
+
+def _by_file(report):
+    return {entry['file']: entry for entry in report['files']}
+
+
+def test_sheet_kind_and_copy_suffix():
+    assert sheet_kind(PREGROUP_FILE) == PREGROUPS
+    assert sheet_kind(ROSTER_FILE) == ROSTER
+    assert sheet_kind(COPY_FILE) == ROSTER
+    assert is_copy(COPY_FILE)
+    assert is_copy('20241月報名表 (2).xlsx')
+    assert not is_copy(ROSTER_FILE)
+    assert not is_copy(PREGROUP_FILE)
+    assert not is_copy('202501月報名表.xlsx')
+
+
+def test_same_month_files_import_roster_and_pregroups(app, season):
+    tournament = Tournament(name='一月例賽', date=date(2024, 1, 20))
+    db.session.add(tournament)
+    db.session.commit()
+
+    files = _by_file(bulk_import(season, workers=1))
+
+    assert files[ROSTER_FILE]['status'] == 'imported'
+    assert files[ROSTER_FILE]['imported'] == 68
+    assert files[COPY_FILE]['status'] == 'skipped'
+    assert ROSTER_FILE in files[COPY_FILE]['error']
+    assert files[PREGROUP_FILE]['status'] == 'imported'
+    assert files[PREGROUP_FILE]['tournament_id'] == tournament.id
+    assert files[PREGROUP_FILE]['imported'] == 6
+    assert files[PREGROUP_FILE]['unmatched'] == 0
+
+    codes = dict(db.session.query(Participant.member_number, Participant.pre_group_code).filter(
+        Participant.tournament_id == tournament.id, Participant.pre_group_code.isnot(None)
+    ))
+    assert codes == {'M273': '1203190440', 'M272': '1203190440',
+                     'F40': '122222442', 'M356': '122222442', 'C325': '122222442', 'C318': '122222442'}
+
+
+def test_create_missing_creates_one_tournament_per_month(app, season):
+    files = _by_file(bulk_import(season, create_missing=True, workers=1))
+
+    tournaments = Tournament.query.all()
+    assert [(t.name, t.date) for t in tournaments] == [('20241月報名表', date(2024, 1, 1))]
+    assert files[ROSTER_FILE]['status'] == 'imported'
+    assert files[ROSTER_FILE]['matched_by'] == 'created'
+    assert files[COPY_FILE]['status'] == 'skipped'
+    assert files[PREGROUP_FILE]['status'] == 'imported'
+    assert files[PREGROUP_FILE]['tournament_id'] == tournaments[0].id
+
+
+def test_dry_run_reports_plan_without_writing(app, season):
+    files = _by_file(bulk_import(season, create_missing=True, dry_run=True, workers=1))
+
+    assert files[ROSTER_FILE]['status'] == 'would_create'
+    assert files[COPY_FILE]['status'] == 'skipped'
+    assert files[PREGROUP_FILE]['status'] == 'would_import'
+    assert Tournament.query.count() == 0
+
+
+def test_equal_files_still_conflict(app, tmp_path):
+    tournament = Tournament(name='一月例賽', date=date(2024, 1, 20))
+    db.session.add(tournament)
+    db.session.commit()
+    shutil.copy(os.path.join(ROOT, ROSTER_FILE), tmp_path / ROSTER_FILE)
+    shutil.copy(os.path.join(ROOT, ROSTER_FILE), tmp_path / '2024-1月報名表.xlsx')
+
+    report = bulk_import(collect_sheets(str(tmp_path)), workers=1)
+
+    assert [entry['status'] for entry in report['files']] == ['skipped', 'skipped']
+    assert Participant.query.count() == 0
+
+
+def test_parsing_in_worker_processes(app, season):
+    tournament = Tournament(name='一月例賽', date=date(2024, 1, 20))
+    db.session.add(tournament)
+    db.session.commit()
+
+    report = bulk_import(season, workers=2)
+    files = _by_file(report)
+
+    assert report['workers'] == 2
+    assert files[ROSTER_FILE]['status'] == 'imported'
+    assert files[ROSTER_FILE]['imported'] == 68
+    assert files[COPY_FILE]['status'] == 'skipped'
+    assert files[PREGROUP_FILE]['imported'] == 6
+
+
+def _zip(*names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in names:
+            archive.write(os.path.join(ROOT, name), name)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('mapping', ['[1, 2]', json.dumps({ROSTER_FILE: 'one'}), json.dumps({ROSTER_FILE: True}), '3'])
+def test_malformed_mapping_is_bad_request(client, mapping):
+    response = client.post('/api/v1/tournaments/import-bulk', data={
+        'file': (_zip(ROSTER_FILE), 'season.zip'), 'mapping': mapping
+    }, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert 'mapping' in response.get_json()['error']
+
+
+def test_mapping_routes_file_to_tournament(app, client):
+    tournament = Tournament(name='春季賽', date=date(2024, 3, 1))
+    db.session.add(tournament)
+    db.session.commit()
+
+    response = client.post('/api/v1/tournaments/import-bulk', data={
+        'file': (_zip(ROSTER_FILE), 'season.zip'), 'mapping': json.dumps({ROSTER_FILE: tournament.id})
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    files = _by_file(response.get_json())
+    assert files[ROSTER_FILE]['matched_by'] == 'mapping'
+    assert files[ROSTER_FILE]['tournament_id'] == tournament.id
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+import compression
+from compression import compressor
+
+
+@pytest.fixture
+def roster_url(make_tournament):
+    tournament_id = make_tournament(players=40)
+    return f'/api/v1/tournaments/{tournament_id}/participants'
+
+
+def _get(client, url, accept=None):
+    return client.get(url, headers={'Accept-Encoding': accept} if accept else {})
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('br', 'br'),
+    ('gzip, deflate, br', 'br'),
+    ('gzip;q=0.5, br;q=0.9', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=1.0, br;q=0.2', 'gzip'),
+])
+def test_negotiates_encoding(client, roster_url, accept, expected):
+    plain = _get(client, roster_url).get_data()
+    response = _get(client, roster_url, accept)
+
+    assert response.headers.get('Content-Encoding') == expected
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = response.get_data()
+    if expected == 'gzip':
+        body = gzip.decompress(body)
+    elif expected == 'br':
+        body = brotli.decompress(body)
+    assert body == plain
+
+
+def test_gzip_only_without_brotli(client, roster_url, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert _get(client, roster_url, 'br, gzip').headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in _get(client, roster_url, 'br').headers
+
+
+def test_small_and_binary_responses_are_untouched(client, make_tournament):
+    tournament_id = make_tournament(players=4)
+    small = _get(client, '/health', 'gzip')
+    assert 'Content-Encoding' not in small.headers
+
+    export = _get(client, f'/api/v1/tournaments/{tournament_id}/export_groups', 'gzip')
+    assert export.status_code == 200
+    assert 'Content-Encoding' not in export.headers
+
+
+def test_streamed_response_is_compressed_per_chunk(client, roster_url):
+    response = _get(client, roster_url + '?stream=1', 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert json.loads(gzip.decompress(response.get_data())) == _get(client, roster_url).get_json()
+    assert compressor.stats['streamed'] == 1
+
+
+def test_snapshot_responses_reuse_compressed_bytes(client, roster_url):
+    first = _get(client, roster_url, 'gzip').get_data()
+    second = _get(client, roster_url, 'gzip').get_data()
+    assert first == second
+    assert compressor.stats['cache_hits'] == 1
+
+
+def test_compressed_etag_is_weak_and_conditional(client, make_tournament):
+    tournament_id = make_tournament(players=40)
+    url = f'/api/v1/tournaments/{tournament_id}/groups'
+    response = _get(client, url, 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].startswith('W/')
+
+    cached = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
@@ -0,0 +1,105 @@
+from sqlalchemy import event
+
+from extensions import db
+from group_stats import apply_deltas, check_group_stats, group_stats, rebuild_group_stats, remap_group_stats
+from groups_view import UNASSIGNED
+from models import Participant, GroupStat
+
+
+def _stats(tournament_id):
+    return {stat.group_code: stat.to_dict() for stat in group_stats(tournament_id)}
+
+
+def test_stats_follow_each_flush(make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    stats = _stats(tournament_id)
+    assert stats['1']['headcount'] == 4
+    assert stats['1']['female_count'] == 1
+    assert stats['1']['handicap_sum'] == 10 + 11 + 12 + 13
+
+    moved, checked, deleted = Participant.query.filter_by(tournament_id=tournament_id, group_code='1').limit(3)
+    moved.group_code = '2'
+    checked.check_in_status = 'checked_in'
+    checked.handicap = None
+    db.session.delete(deleted)
+    db.session.add(Participant(tournament_id=tournament_id, name='新球員', gender='女',
+                               handicap=5.0, group_code='3'))
+    db.session.flush()
+
+    # flush 後、提交前，統計已在同一個交易中更新
+    assert check_group_stats(tournament_id) == []
+    stats = _stats(tournament_id)
+    assert stats['1']['headcount'] == 2
+    assert stats['1']['checked_in'] == 1
+    assert stats['1']['average_handicap'] == 13.0
+    assert stats['2']['headcount'] == 5
+    assert stats['3']['female_count'] == 1
+
+    db.session.rollback()
+    assert check_group_stats(tournament_id) == []
+    assert _stats(tournament_id)['1']['headcount'] == 4
+    assert '3' not in _stats(tournament_id)
+
+
+def test_unassigning_counts_under_unassigned(make_tournament):
+    tournament_id = make_tournament(players=4, group_size=4)
+    participant = Participant.query.filter_by(tournament_id=tournament_id).first()
+    participant.group_code = None
+    db.session.commit()
+
+    stats = _stats(tournament_id)
+    assert stats['1']['headcount'] == 3
+    assert stats[UNASSIGNED]['headcount'] == 1
+    assert check_group_stats(tournament_id) == []
+
+
+def test_remap_moves_stats_with_group_codes(make_tournament):
+    tournament_id = make_tournament(players=12, group_size=4)
+    Participant.query.filter_by(tournament_id=tournament_id, group_code='1').update(
+        {Participant.group_code: '9'}, synchronize_session=False
+    )
+    remap_group_stats(tournament_id, {'1': '9'})
+    db.session.commit()
+
+    assert check_group_stats(tournament_id) == []
+    assert '1' not in _stats(tournament_id)
+
+
+def test_check_and_rebuild_repair_drift(app, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    GroupStat.query.filter_by(tournament_id=tournament_id, group_code='1').update({GroupStat.headcount: 99})
+    db.session.commit()
+
+    mismatches = check_group_stats(tournament_id)
+    assert [mismatch['group_code'] for mismatch in mismatches] == ['1']
+
+    result = app.test_cli_runner().invoke(args=['check-group-stats'])
+    assert result.exit_code != 0
+
+    rebuild_group_stats(tournament_id)
+    db.session.commit()
+    assert check_group_stats(tournament_id) == []
+
+
+def test_deltas_upsert_in_one_statement(make_tournament):
+    tournament_id = make_tournament(players=4, group_size=4)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # 另一個交易已經先寫入第 9 組的第一位參賽者：第二筆同樣的增量要累加，不會撞主鍵
+    deltas = {(tournament_id, '9'): [1, 0, 1, 12.5, 1], (tournament_id, '1'): [-1, 0, 0, -10.0, -1]}
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        apply_deltas(db.session.connection(), deltas)
+        apply_deltas(db.session.connection(), deltas)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    db.session.commit()
+
+    assert len(statements) == 2
+    assert all('ON CONFLICT' in statement.upper() for statement in statements)
+    stats = _stats(tournament_id)
+    assert (stats['9']['headcount'], stats['9']['female_count']) == (2, 2)
+    assert stats['1']['headcount'] == 2
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import event
+
+import operations
+from extensions import db
+from groups_view import build_groups, group_sort_key, UNASSIGNED
+from models import Participant, GroupPosition
+from ordering import key_between
+from roster_io import ordered_for_export, build_groups_diagram
+from snapshots import snapshot_cache
+
+
+def _regroup(tournament_id, codes):
+    """依序將參賽者改到 codes 指定的組別"""
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.id).all()
+    for participant, code in zip(participants, codes):
+        participant.group_code = code
+    db.session.commit()
+
+
+def test_group_sort_key_orders_numeric_then_text_then_unassigned():
+    codes = ['A', None, '10', UNASSIGNED, '2', 'B7', '1']
+    assert sorted(codes, key=group_sort_key) == ['1', '2', '10', 'A', 'B7', None, UNASSIGNED]
+
+
+def test_non_numeric_codes_do_not_break_group_queries(client, make_tournament):
+    tournament_id = make_tournament(players=6, group_size=None)
+    _regroup(tournament_id, ['10', 'A', '2', 'A', None, '2'])
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        groups = build_groups(tournament_id)
+        exported = ordered_for_export(tournament_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert [group['group_number'] for group in groups] == ['2', '10', 'A', UNASSIGNED]
+    assert [group['count'] for group in groups] == [2, 1, 2, 1]
+    assert [p.group_code for p in exported] == ['2', '2', '10', 'A', 'A', None]
+    assert not any('CAST' in statement.upper() for statement in statements)
+
+    assert client.get(f'/api/v1/tournaments/{tournament_id}/groups').status_code == 200
+    assert client.get(f'/api/v1/tournaments/{tournament_id}/export_groups').status_code == 200
+    diagram = client.get(f'/api/v1/tournaments/{tournament_id}/export_groups_diagram')
+    assert diagram.status_code == 200
+    assert '預分組: A' in diagram.get_data(as_text=True)
+
+
+def test_group_positions_come_before_code_order(make_tournament):
+    tournament_id = make_tournament(players=12, group_size=4)
+    first = key_between(None, None)
+    db.session.add(GroupPosition(tournament_id=tournament_id, group_code='3', order_key=first))
+    db.session.add(GroupPosition(tournament_id=tournament_id, group_code='1', order_key=key_between(first, None)))
+    db.session.commit()
+
+    assert [group['group_code'] for group in build_groups(tournament_id)] == ['3', '1', '2']
+
+
+def test_exports_follow_dragged_group_order(client, make_tournament):
+    tournament_id = make_tournament(players=12, group_size=4)
+    operations.move_group_to(tournament_id, '3', next_code='1')
+    db.session.commit()
+
+    exported = ordered_for_export(tournament_id)
+    assert [p.group_code for p in exported[::4]] == ['3', '1', '2']
+    assert [p.member_number for p in exported[:4]] == ['M009', 'M010', 'M011', 'M012']
+
+    html = build_groups_diagram(exported)
+    assert html.index('G03') < html.index('G01') < html.index('G02')
+    diagram = client.get(f'/api/v1/tournaments/{tournament_id}/export_groups_diagram').get_data(as_text=True)
+    assert diagram.index('G03') < diagram.index('G01')
+
+
+@pytest.mark.parametrize('url', ['export_groups', 'export_groups_diagram'])
+def test_export_of_tournament_deleted_mid_request_is_not_found(client, make_tournament, monkeypatch, url):
+    tournament_id = make_tournament(players=8, group_size=4)
+    # 賽事在 get_or_404 之後、取得快照之前被刪除
+    monkeypatch.setattr(snapshot_cache, 'current', lambda tid: None)
+
+    assert client.get(f'/api/v1/tournaments/{tournament_id}/{url}').status_code == 404
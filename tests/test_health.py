@@ -0,0 +1,35 @@
+import sqlite3
+
+
+def _ready(app, client):
+    app.config['HEALTH_DB_PROBE_TTL'] = 0
+    response = client.get('/health/ready')
+    return response.status_code, response.get_json()
+
+
+def test_ready_when_database_is_idle(app, client):
+    status, data = _ready(app, client)
+    assert status == 200
+    assert data['status'] == 'ready'
+    assert data['checks']['database']['write_locked'] is False
+
+
+def test_long_write_degrades_without_failing_readiness(app, client):
+    client.get('/health')  # 啟動後第一個請求會清理中斷的背景工作（寫入），先完成
+    path = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        status, data = _ready(app, client)
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+
+    assert status == 200
+    assert data['status'] == 'degraded'
+    assert data['checks']['database']['ok'] is True
+    assert data['checks']['database']['write_locked'] is True
+    assert data['checks']['database']['latency_ms'] < 400
+
+    status, data = _ready(app, client)
+    assert (status, data['status']) == (200, 'ready')
@@ -0,0 +1,99 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from extensions import db
+from app import create_app
+from jobs import jobs, ORPHANED_MESSAGE
+from models import Job, Tournament
+
+
+def _job(job_id, status, age_seconds):
+    seen = datetime.utcnow() - timedelta(seconds=age_seconds)
+    db.session.add(Job(id=job_id, kind='export_groups', status=status, progress=0,
+                       created_at=seen, heartbeat_at=seen))
+    db.session.commit()
+
+
+def test_first_request_fails_orphaned_jobs(client):
+    _job('orphan', 'running', age_seconds=3600)
+    _job('queued', 'queued', age_seconds=3600)
+    _job('alive', 'running', age_seconds=5)
+
+    client.get('/health')
+
+    db.session.expire_all()
+    assert Job.query.get('orphan').status == 'failed'
+    assert Job.query.get('orphan').error == ORPHANED_MESSAGE
+    assert Job.query.get('queued').status == 'failed'
+    assert Job.query.get('alive').status == 'running'
+
+
+def test_polling_an_orphaned_job_reports_failure(app, client):
+    client.get('/health')
+    _job('stuck', 'running', age_seconds=3600)
+
+    data = client.get('/api/v1/jobs/stuck').get_json()
+    assert data['status'] == 'failed'
+    assert data['error'] == ORPHANED_MESSAGE
+    assert data['finished_at'] is not None
+
+
+def test_finished_jobs_are_not_orphaned(app):
+    job = Job(id='done', kind='export_groups', status='succeeded',
+              heartbeat_at=datetime.utcnow() - timedelta(days=1))
+    assert not jobs.is_orphaned(job)
+
+
+def test_completed_job_leaves_heartbeat(client, make_tournament):
+    tournament_id = make_tournament(players=8)
+
+    response = client.get(f'/api/v1/tournaments/{tournament_id}/export_groups?async=1')
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+
+    for _ in range(200):
+        data = client.get(f'/api/v1/jobs/{job_id}').get_json()
+        if data['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.01)
+    assert data['status'] == 'succeeded'
+    assert Job.query.get(job_id).heartbeat_at is not None
+    assert job_id not in jobs._active
+
+
+def test_deleting_tournament_handles_its_jobs(app, client, make_tournament):
+    tournament_id = make_tournament(players=4)
+    result_path = os.path.join(app.config['JOB_DIR'], 'done.xlsx')
+    with open(result_path, 'wb') as f:
+        f.write(b'xlsx')
+    db.session.add(Job(id='done', kind='export_groups', status='succeeded', tournament_id=tournament_id,
+                       result_path=result_path))
+    db.session.add(Job(id='busy', kind='import_participants', status='running', tournament_id=tournament_id))
+    db.session.commit()
+
+    assert client.delete(f'/api/v1/tournaments/{tournament_id}').status_code == 204
+
+    db.session.expire_all()
+    assert Tournament.query.get(tournament_id) is None
+    assert Job.query.get('done') is None
+    assert not os.path.exists(result_path)
+    assert Job.query.get('busy').tournament_id is None
+
+
+def test_each_app_has_its_own_executor(app, tmp_path):
+    runner = app.extensions['jobs']
+    other = create_app('development', test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'other.db'}",
+        'JOB_DIR': str(tmp_path / 'other-jobs'),
+    })
+    assert other.extensions['jobs'] is not runner
+    assert other.extensions['jobs'].app is other
+    assert runner.app is app
+    assert jobs.job_dir == app.config['JOB_DIR']
+
+    # 同一個應用程式重新初始化時關閉舊的執行緒池
+    jobs.init_app(app)
+    assert app.extensions['jobs'] is not runner
+    assert runner.executor._shutdown
@@ -0,0 +1,96 @@
+"""
+舊版應用程式（app-HOD00003320.py）分組與報到列表的查詢次數
+
+以 before_cursor_execute 計算每個請求送出的 SQL 陳述式數量：不論有幾組、幾位參賽者，
+次數都應該固定（組員以 JOIN 一次載入，不會每組再查一次）。
+"""
+
+import importlib.util
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+LEGACY_APP = 'app-HOD00003320.py'
+
+
+@pytest.fixture
+def legacy(tmp_path, monkeypatch):
+    """將舊版應用程式複製到暫存目錄後載入：載入時會重建 golf.db，只影響暫存目錄"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    path = tmp_path / 'legacy_app.py'
+    shutil.copy(os.path.join(root, LEGACY_APP), path)
+
+    spec = importlib.util.spec_from_file_location('legacy_app', path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, 'legacy_app', module)
+    spec.loader.exec_module(module)
+    with module.app.app_context():
+        yield module
+        module.db.session.remove()
+        module.db.engine.dispose()
+
+
+def _seed(legacy, groups):
+    tournament = legacy.Tournament(name='測試', date=datetime(2026, 1, 1))
+    legacy.db.session.add(tournament)
+    legacy.db.session.flush()
+    for g in range(groups):
+        group = legacy.Group(tournament_id=tournament.id, group_name=f'A{g + 1:02d}')
+        legacy.db.session.add(group)
+        legacy.db.session.flush()
+        for i in range(3):
+            legacy.db.session.add(legacy.Participant(
+                tournament_id=tournament.id, group_id=group.id,
+                name=f'球員{g}-{i}', handicap=float(10 + i)
+            ))
+    legacy.db.session.commit()
+    return tournament.id
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _queries(legacy, method, url, **kwargs):
+    client = legacy.app.test_client()
+    legacy.db.session.remove()
+    with count_queries(legacy.db.engine) as statements:
+        response = getattr(client, method)(url, **kwargs)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+@pytest.mark.parametrize('path', ['groups', 'check-in'])
+def test_group_listing_query_count_is_constant(legacy, path):
+    counts = []
+    for groups in (2, 20):
+        tournament_id = _seed(legacy, groups)
+        counts.append(_queries(legacy, 'get', f'/api/tournaments/{tournament_id}/{path}'))
+    assert counts[0] == counts[1] == 1
+
+
+def test_move_participant_query_count_is_constant(legacy):
+    counts = []
+    for groups in (2, 20):
+        tournament_id = _seed(legacy, groups)
+        first, second = legacy.Group.query.filter_by(tournament_id=tournament_id).order_by(legacy.Group.id).limit(2)
+        participant = legacy.Participant.query.filter_by(group_id=first.id).first()
+        counts.append(_queries(
+            legacy, 'post', f'/api/participants/{participant.id}/move', json={'group_id': second.id}
+        ))
+    assert counts[0] == counts[1]
@@ -0,0 +1,142 @@
+import operations
+from coalescing import move_coalescer
+from extensions import db
+from group_stats import check_group_stats
+from models import Participant, Tournament
+
+
+def _move(client, tournament_id, participant_id, drag_id, seq, group_code):
+    return client.put(
+        f'/api/v1/tournaments/{tournament_id}/participants/{participant_id}/move',
+        json={'drag_id': drag_id, 'seq': seq, 'group_code': group_code}
+    )
+
+
+def _status(client, tournament_id, participant_id, drag_id, seq):
+    return client.get(
+        f'/api/v1/tournaments/{tournament_id}/participants/{participant_id}/move',
+        query_string={'drag_id': drag_id, 'seq': seq}
+    )
+
+
+def _group_code(participant_id):
+    db.session.expire_all()
+    return Participant.query.get(participant_id).group_code
+
+
+def _revision(tournament_id):
+    db.session.expire_all()
+    return Tournament.query.get(tournament_id).revision
+
+
+def _first_participant(tournament_id):
+    return Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.id).first().id
+
+
+def test_move_is_queued_without_writing(client, make_tournament, monkeypatch):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+    monkeypatch.setattr(move_coalescer, 'window', 0.5)
+
+    response = _move(client, tournament_id, participant_id, 'drag', 1, '2')
+    assert response.status_code == 202
+    assert response.get_json()['queued'] is True
+    assert _group_code(participant_id) == '1'
+    assert _status(client, tournament_id, participant_id, 'drag', 1).get_json()['state'] == 'pending'
+
+    assert move_coalescer.flush()
+    assert _group_code(participant_id) == '2'
+    status = _status(client, tournament_id, participant_id, 'drag', 1).get_json()
+    assert (status['state'], status['group_code']) == ('applied', '2')
+
+
+def test_moves_in_window_are_written_once(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+    revision = _revision(tournament_id)
+
+    # 拖曳經過的組別只保留最後一個
+    for seq, code in enumerate(['2', '未分組', '2', '1'], start=1):
+        assert _move(client, tournament_id, participant_id, 'drag', seq, code).status_code == 202
+    assert move_coalescer.flush()
+
+    assert _group_code(participant_id) == '1'
+    assert _revision(tournament_id) == revision + 1
+    assert move_coalescer.stats == {'applied': 1, 'coalesced': 3, 'stale': 0, 'failed': 0}
+    assert _status(client, tournament_id, participant_id, 'drag', 4).get_json()['state'] == 'applied'
+    assert check_group_stats(tournament_id) == []
+
+
+def test_independent_clients_can_both_move(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+
+    assert _move(client, tournament_id, participant_id, 'desk-a', 1, '2').status_code == 202
+    assert move_coalescer.flush()
+    assert _move(client, tournament_id, participant_id, 'desk-b', 1, '1').status_code == 202
+    assert move_coalescer.flush()
+
+    assert _group_code(participant_id) == '1'
+    assert _status(client, tournament_id, participant_id, 'desk-a', 1).get_json()['state'] == 'superseded'
+    assert _status(client, tournament_id, participant_id, 'desk-b', 1).get_json()['state'] == 'applied'
+    assert check_group_stats(tournament_id) == []
+
+
+def test_stale_move_in_same_drag_is_rejected(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+
+    assert _move(client, tournament_id, participant_id, 'drag', 2, '2').status_code == 202
+    response = _move(client, tournament_id, participant_id, 'drag', 1, '1')
+    assert response.status_code == 409
+    assert response.get_json()['stale'] is True
+    assert move_coalescer.flush()
+
+    # 另一個 worker 沒有這個 drag_id 的記錄時，由資料庫的條件式更新拒絕，不算失敗
+    move_coalescer.clear()
+    assert _move(client, tournament_id, participant_id, 'drag', 2, '1').status_code == 202
+    assert move_coalescer.flush()
+    assert _group_code(participant_id) == '2'
+    assert move_coalescer.stats['failed'] == 0
+    assert _status(client, tournament_id, participant_id, 'drag', 2).get_json()['state'] == 'applied'
+    assert check_group_stats(tournament_id) == []
+
+
+def test_failed_write_is_recorded_on_participant(client, make_tournament, monkeypatch):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+
+    def failing_move_if_newer(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(operations, 'move_if_newer', failing_move_if_newer)
+    assert _move(client, tournament_id, participant_id, 'drag', 1, '2').status_code == 202
+    assert move_coalescer.flush()
+
+    status = _status(client, tournament_id, participant_id, 'drag', 1).get_json()
+    assert status['state'] == 'failed'
+    assert 'database is locked' in status['error']
+    assert status['group_code'] == '1'
+    assert move_coalescer.stats['failed'] == 1
+
+    # 同一次拖曳之後的移動寫入成功時清除失敗記錄
+    monkeypatch.undo()
+    assert _move(client, tournament_id, participant_id, 'drag', 2, '2').status_code == 202
+    assert move_coalescer.flush()
+    assert _status(client, tournament_id, participant_id, 'drag', 2).get_json()['state'] == 'applied'
+    db.session.expire_all()
+    assert Participant.query.get(participant_id).move_failure is None
+
+
+def test_move_requires_drag_id(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    participant_id = _first_participant(tournament_id)
+
+    response = client.put(
+        f'/api/v1/tournaments/{tournament_id}/participants/{participant_id}/move',
+        json={'seq': 1, 'group_code': '2'}
+    )
+    assert response.status_code == 400
+    assert client.get(f'/api/v1/tournaments/{tournament_id}/participants/{participant_id}/move').status_code == 400
+    assert _status(client, tournament_id, 9999, 'drag', 1).status_code == 404
+    assert _group_code(participant_id) == '1'
@@ -0,0 +1,65 @@
+from datetime import date
+
+from extensions import db
+from models import Tournament, Participant
+from pairing import refresh_pairing_index
+
+
+def test_rebuild_requires_admin_token(client, admin_headers):
+    assert client.post('/api/v1/pairing-history/rebuild', json={}).status_code == 403
+
+    response = client.post('/api/v1/pairing-history/rebuild', json={}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['indexed_tournaments'] == 0
+
+
+def test_editing_past_groups_invalidates_index(client, make_tournament):
+    tournament_id = make_tournament(players=8, day=date(2025, 1, 1))
+    assert refresh_pairing_index() == 1
+    db.session.commit()
+    assert Tournament.query.get(tournament_id).pairings_indexed_at is not None
+
+    participant = Participant.query.filter_by(tournament_id=tournament_id, group_code='1').first()
+    response = client.put(
+        f'/api/v1/tournaments/{tournament_id}/participants/{participant.id}/position',
+        json={'group_code': '2'}
+    )
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert Tournament.query.get(tournament_id).pairings_indexed_at is None
+    assert refresh_pairing_index() == 1
+
+
+def test_deleting_participant_invalidates_index(client, make_tournament):
+    tournament_id = make_tournament(players=8, day=date(2025, 1, 1))
+    refresh_pairing_index()
+    db.session.commit()
+
+    participant = Participant.query.filter_by(tournament_id=tournament_id).first()
+    assert client.delete(f'/api/v1/tournaments/{tournament_id}/participants/{participant.id}').status_code == 200
+
+    db.session.expire_all()
+    assert Tournament.query.get(tournament_id).pairings_indexed_at is None
+
+
+def test_check_in_and_notes_keep_index(client, make_tournament):
+    tournament_id = make_tournament(players=8, day=date(2025, 1, 1))
+    refresh_pairing_index()
+    db.session.commit()
+
+    participant = Participant.query.filter_by(tournament_id=tournament_id).first()
+    response = client.put(
+        f'/api/v1/participants/{participant.id}/check-in',
+        json={'check_in_status': 'checked_in', 'check_in_time': '2025-01-01T07:30:00Z'}
+    )
+    assert response.status_code == 200
+    response = client.post('/api/v1/batch', json={'tournament_id': tournament_id, 'operations': [
+        {'op': 'notes', 'participant_id': participant.id, 'notes': '遲到'},
+        {'op': 'reorder', 'group1': '1', 'group2': '2'},
+    ]})
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert Tournament.query.get(tournament_id).pairings_indexed_at is not None
+    assert refresh_pairing_index() == 0
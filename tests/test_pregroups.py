@@ -0,0 +1,97 @@
+import io
+
+import pandas as pd
+import pytest
+
+from extensions import db
+from models import Participant
+
+
+def _xlsx(frame):
+    buffer = io.BytesIO()
+    frame.to_excel(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+def _upload(client, tournament_id, data, filename='預編組.xlsx'):
+    return client.post(
+        f'/api/v1/tournaments/{tournament_id}/pregroups/import',
+        data={'file': (data, filename)}, content_type='multipart/form-data'
+    )
+
+
+def test_import_matches_member_numbers_and_names(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=None)
+    db.session.add(Participant(tournament_id=tournament_id, name='球員1', member_number='M999'))
+    db.session.commit()
+    sheet = pd.DataFrame([
+        {'預編組代號': 7, '名單1': 'M002', '名單2': '球員3', '名單3': None, '名單4': None},
+        {'預編組代號': 8, '名單1': '球員1', '名單2': '無此人', '名單3': None, '名單4': None},
+    ])
+
+    response = _upload(client, tournament_id, _xlsx(sheet))
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['updated'] == 2
+    assert [item['member'] for item in result['unmatched']] == ['無此人']
+    assert [item['member'] for item in result['ambiguous']] == ['球員1']
+    codes = dict(db.session.query(Participant.member_number, Participant.pre_group_code).filter(
+        Participant.pre_group_code.isnot(None)
+    ))
+    assert codes == {'M002': '7', 'M003': '7'}
+
+
+def test_reimport_clears_members_no_longer_listed(client, make_tournament):
+    tournament_id = make_tournament(players=6, group_size=None)
+    first = pd.DataFrame([
+        {'預編組代號': 1, '名單1': 'M001', '名單2': 'M002', '名單3': None, '名單4': None},
+        {'預編組代號': 2, '名單1': 'M003', '名單2': 'M004', '名單3': None, '名單4': None},
+    ])
+    assert _upload(client, tournament_id, _xlsx(first)).status_code == 200
+
+    second = pd.DataFrame([
+        {'預編組代號': 3, '名單1': 'M001', '名單2': 'M005', '名單3': None, '名單4': None},
+    ])
+    response = _upload(client, tournament_id, _xlsx(second))
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+    assert response.get_json()['cleared'] == 3
+    db.session.expire_all()
+    codes = dict(db.session.query(Participant.member_number, Participant.pre_group_code).filter(
+        Participant.tournament_id == tournament_id
+    ))
+    assert codes == {'M001': '3', 'M002': None, 'M003': None, 'M004': None, 'M005': '3', 'M006': None}
+
+
+def test_import_accepts_one_player_per_row(client, make_tournament):
+    tournament_id = make_tournament(players=4, group_size=None)
+    sheet = pd.DataFrame([
+        {'會員編號': 'M001', '姓名': '球員1', '預分組編號': 12.0},
+        {'會員編號': 'M004', '姓名': '球員4', '預分組編號': 12.0},
+        {'會員編號': 'M002', '姓名': '球員2', '預分組編號': None},
+    ])
+
+    response = _upload(client, tournament_id, _xlsx(sheet))
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+
+
+@pytest.mark.parametrize('url', ['pregroups/import', 'participants/import'])
+def test_legacy_xls_is_rejected(client, make_tournament, url):
+    tournament_id = make_tournament(players=2)
+    response = client.post(
+        f'/api/v1/tournaments/{tournament_id}/{url}',
+        data={'file': (io.BytesIO(b'\xd0\xcf\x11\xe0'), '名單.XLS')}, content_type='multipart/form-data'
+    )
+    assert response.status_code == 400
+    assert '.xls' in response.get_json()['error']
+
+
+def test_missing_columns_is_bad_request(client, make_tournament):
+    tournament_id = make_tournament(players=2)
+    response = _upload(client, tournament_id, _xlsx(pd.DataFrame([{'其他': 1}])))
+    assert response.status_code == 400
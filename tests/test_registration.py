@@ -0,0 +1,40 @@
+from extensions import db
+from models import RegistrationCounter
+
+
+def test_block_allocation_is_capped(app, client, make_tournament):
+    tournament_id = make_tournament(players=0)
+    app.config['REGISTRATION_MAX_BLOCK'] = 5
+    url = f'/api/v1/tournaments/{tournament_id}/registration-numbers'
+
+    assert client.post(url, json={'count': 6}).status_code == 400
+    assert client.post(url, json={'count': 'many'}).status_code == 400
+
+    response = client.post(url, json={'count': 5})
+    assert response.status_code == 201
+    assert response.get_json()['registration_numbers'] == ['A01', 'A02', 'A03', 'A04', 'A05']
+
+
+def test_batch_create_is_capped(app, client, make_tournament):
+    tournament_id = make_tournament(players=0)
+    app.config['REGISTRATION_MAX_BLOCK'] = 2
+    url = f'/api/v1/tournaments/{tournament_id}/participants'
+
+    players = [{'name': f'球員{i}'} for i in range(3)]
+    assert client.post(url, json={'participants': players}).status_code == 400
+    assert client.post(url, json={'participants': 'x'}).status_code == 400
+    assert client.post(url, json={'participants': players[:2]}).status_code == 201
+
+
+def test_peek_does_not_create_counter(client, make_tournament):
+    tournament_id = make_tournament(players=0)
+    url = f'/api/v1/tournaments/{tournament_id}/next-registration-number'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json()['next_number'] == 'A01'
+    db.session.expire_all()
+    assert RegistrationCounter.query.get(tournament_id) is None
+
+    client.post(f'/api/v1/tournaments/{tournament_id}/registration-numbers', json={'count': 3})
+    assert client.get(url).get_json()['next_number'] == 'A04'
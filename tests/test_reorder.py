@@ -0,0 +1,63 @@
+import operations
+from extensions import db
+from groups_view import build_groups
+from models import Participant
+
+
+def _members(tournament_id):
+    """各組（依畫面順序）的會員編號"""
+    db.session.expire_all()
+    return [
+        (group['group_code'], sorted(p['member_number'] for p in group['participants']))
+        for group in build_groups(tournament_id)
+    ]
+
+
+def _reorder(client, tournament_id, **body):
+    return client.put(f'/api/v1/tournaments/{tournament_id}/groups/reorder', json=body)
+
+
+def test_reorder_resets_dragged_group_positions(client, make_tournament):
+    tournament_id = make_tournament(players=12, group_size=4)
+    operations.move_group_to(tournament_id, '3', next_code='1')
+    db.session.commit()
+    assert [code for code, _ in _members(tournament_id)] == ['3', '1', '2']
+
+    assert _reorder(client, tournament_id, order=['2', '3', '1']).status_code == 200
+
+    assert _members(tournament_id) == [
+        ('1', ['M005', 'M006', 'M007', 'M008']),
+        ('2', ['M009', 'M010', 'M011', 'M012']),
+        ('3', ['M001', 'M002', 'M003', 'M004']),
+    ]
+
+
+def test_swap_shows_groups_in_number_order(client, make_tournament):
+    tournament_id = make_tournament(players=8, group_size=4)
+    operations.move_group_to(tournament_id, '2', next_code='1')
+    db.session.commit()
+
+    assert _reorder(client, tournament_id, group1='1', group2='2').status_code == 200
+
+    assert _members(tournament_id) == [
+        ('1', ['M005', 'M006', 'M007', 'M008']),
+        ('2', ['M001', 'M002', 'M003', 'M004']),
+    ]
+
+
+def test_concurrent_group_change_is_rejected(client, make_tournament, monkeypatch):
+    tournament_id = make_tournament(players=8, group_size=4)
+    sizes = operations.group_sizes
+
+    # 模擬檢查之後才有一位參賽者被移進第 1 組：檢查時看到的人數比實際改寫的少
+    def stale_sizes(tid):
+        result = sizes(tid)
+        result['1'] -= 1
+        return result
+
+    monkeypatch.setattr(operations, 'group_sizes', stale_sizes)
+
+    response = _reorder(client, tournament_id, order=['2', '1'])
+    assert response.status_code == 409
+    assert Participant.query.filter_by(tournament_id=tournament_id, group_code='1').count() == 4
+    assert _members(tournament_id)[0] == ('1', ['M001', 'M002', 'M003', 'M004'])
@@ -0,0 +1,74 @@
+from extensions import db
+from models import Tournament, Participant
+from snapshots import SnapshotCache, snapshot_cache
+
+
+def _views(name):
+    return snapshot_cache.stats()['views'][name]
+
+
+def test_roster_is_built_once_per_revision(client, make_tournament):
+    tournament_id = make_tournament(players=4)
+
+    first = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+    second = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+
+    assert first.get_data() == second.get_data()
+    assert first.headers['X-Revision'] == second.headers['X-Revision']
+    assert (_views('participants')['misses'], _views('participants')['hits']) == (1, 1)
+
+
+def test_mutation_invalidates_snapshot(client, make_tournament):
+    tournament_id = make_tournament(players=4)
+    before = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+    participant_id = before.get_json()[0]['id']
+
+    response = client.put(f'/api/v1/participants/{participant_id}/check-in', json={'check_in_status': 'checked_in'})
+    assert response.status_code == 200
+
+    after = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+    assert int(after.headers['X-Revision']) == int(before.headers['X-Revision']) + 1
+    assert after.get_json()[0]['check_in_status'] == 'checked_in'
+
+
+def test_revision_bumped_elsewhere_invalidates_snapshot(client, make_tournament):
+    """其他 worker 的寫入只會改變資料庫中的版本號，本行程的快照也要失效"""
+    tournament_id = make_tournament(players=4)
+    client.get(f'/api/v1/tournaments/{tournament_id}/groups')
+
+    Participant.query.filter_by(tournament_id=tournament_id).update(
+        {Participant.check_in_status: 'checked_in'}, synchronize_session=False
+    )
+    Tournament.query.filter_by(id=tournament_id).update({Tournament.revision: Tournament.revision + 1})
+    db.session.commit()
+
+    groups = client.get(f'/api/v1/tournaments/{tournament_id}/groups').get_json()
+    assert groups[0]['checked_in'] == 4
+    assert _views('groups')['misses'] == 2
+
+
+def test_groups_etag_returns_not_modified(client, make_tournament):
+    tournament_id = make_tournament(players=4)
+    response = client.get(f'/api/v1/tournaments/{tournament_id}/groups')
+    etag = response.headers['ETag']
+
+    cached = client.get(f'/api/v1/tournaments/{tournament_id}/groups', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+
+def test_missing_tournament(client):
+    assert client.get('/api/v1/tournaments/999/groups').status_code == 404
+    assert client.get('/api/v1/tournaments/999/participants').get_json() == []
+
+
+def test_least_recently_used_tournament_is_evicted(make_tournament):
+    cache = SnapshotCache(max_entries=2)
+    ids = [make_tournament(players=1) for _ in range(3)]
+    for tournament_id in ids:
+        cache.view(tournament_id, 'x', lambda: b'1')
+    cache.view(ids[1], 'x', lambda: b'2')
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert stats['views']['x']['hits'] == 1
@@ -0,0 +1,45 @@
+import json
+from datetime import date
+
+import streaming
+from streaming import iter_json_array
+
+
+def test_iter_json_array_emits_valid_json_in_chunks(monkeypatch):
+    monkeypatch.setattr(streaming, 'CHUNK_SIZE', 64)
+    items = [{'name': f'球員{i}', 'id': i} for i in range(50)]
+
+    chunks = list(iter_json_array(items, lambda item: item))
+
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks).decode('utf-8')) == items
+
+
+def test_iter_json_array_empty():
+    assert b''.join(iter_json_array([], dict)) == b'[]'
+
+
+def test_roster_stream_matches_snapshot(client, make_tournament):
+    tournament_id = make_tournament(players=6)
+
+    streamed = client.get(f'/api/v1/tournaments/{tournament_id}/participants?stream=1')
+    snapshot = client.get(f'/api/v1/tournaments/{tournament_id}/participants')
+
+    assert streamed.is_streamed
+    assert streamed.get_json() == snapshot.get_json()
+
+
+def test_cross_tournament_stream_filters(client, make_tournament):
+    first = make_tournament(players=3, day=date(2026, 1, 5))
+    second = make_tournament(players=2, day=date(2026, 2, 5))
+
+    everyone = client.get('/api/v1/participants').get_json()
+    assert [p['tournament_id'] for p in everyone] == [first] * 3 + [second] * 2
+
+    february = client.get('/api/v1/participants?from=2026-02-01').get_json()
+    assert {p['tournament_id'] for p in february} == {second}
+
+    selected = client.get(f'/api/v1/participants?tournament_id={first}').get_json()
+    assert len(selected) == 3
+
+    assert client.get('/api/v1/participants?to=2026/02/01').status_code == 400